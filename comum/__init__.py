@@ -0,0 +1,28 @@
+"""
+Pacote compartilhado pelos scripts de 'velha/' e 'detecta/pega/'.
+
+Os scripts continuam sendo executados diretamente (python gameplaysupremo.py);
+cada um acrescenta a raiz do repositório ao sys.path para importar 'comum'.
+
+Importar o pacote (ou um script) não abre câmera, não conecta ao robô e não
+lê calibração: cv2 e pycomm3 são carregados no primeiro uso
+(importar_sob_demanda) e a calibração da célula por comum.calibracao.Calibracao.
+Assim o jogo e o detector entram em testes, benchmarks e processos de
+trabalho em milissegundos.
+"""
+import importlib.util
+import sys
+
+
+def importar_sob_demanda(nome):
+    """
+    Módulo 'nome' que só é de fato importado no primeiro acesso a um atributo.
+    Se ele já foi importado, devolve o próprio módulo.
+    """
+    if nome in sys.modules: return sys.modules[nome]
+    spec = importlib.util.find_spec(nome)
+    if spec is None: raise ImportError(f"Módulo '{nome}' não encontrado.", name=nome)
+    carregador = importlib.util.LazyLoader(spec.loader); spec.loader = carregador
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nome] = modulo; carregador.exec_module(modulo)
+    return modulo
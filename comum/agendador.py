@@ -0,0 +1,59 @@
+"""
+Agendador do loop de visão: taxa e trabalho por frame conforme o estado da célula.
+
+Com um waitKey fixo o loop captura, segmenta e desenha na taxa cheia em
+todos os estados, inclusive com o braço sobre o tabuleiro, quando a
+detecção não serve para nada. Aqui cada estado tem um ritmo
+(fps, detectar): por exemplo 5 fps só com o portão enquanto o robô
+trabalha, taxa cheia na conferência da limpeza e taxa baixa esperando o
+humano. O tempo vem do relógio monotônico; entre um frame e outro o loop
+só atende teclas e cliques, em fatias de no máximo FATIA_ESPERA, de modo
+que uma mudança de estado vale em até 20 ms, mesmo vinda de outra thread.
+
+    agendador = AgendadorQuadros({OCUPADO: (5, False)}, padrao=(30, True))
+    while True:
+        if not agendador.vencido(estado):
+            tecla = display.ler_tecla(agendador.espera(estado)); continue
+        detectar = agendador.iniciar(estado)
+        ...
+"""
+import time
+
+# --- Padrões ---
+RITMO_PADRAO = (30, True) # (fps, detectar) dos estados sem ritmo próprio
+FATIA_ESPERA = 0.02       # s: maior espera contínua entre duas checagens do estado
+ALFA_FPS = 0.1            # Suavização do fps medido (HUD)
+# ---------------
+
+
+class AgendadorQuadros:
+    def __init__(self, ritmos, padrao=RITMO_PADRAO, fatia=FATIA_ESPERA):
+        self.ritmos = dict(ritmos) # estado -> (fps, detectar)
+        self.padrao = padrao; self.fatia = fatia
+        self._inicio = None # Início do último frame processado (time.monotonic)
+        self.fps_medido = 0.0
+
+    def ritmo(self, estado):
+        return self.ritmos.get(estado, self.padrao)
+
+    def _periodo(self, estado):
+        fps = self.ritmo(estado)[0]
+        return 1.0 / fps if fps > 0 else 0.0
+
+    def vencido(self, estado):
+        """True se já é hora de processar o próximo frame no ritmo do estado atual."""
+        return self._inicio is None or time.monotonic() - self._inicio >= self._periodo(estado)
+
+    def espera(self, estado):
+        """Quanto esperar (teclas) antes de checar de novo: até o próximo frame, no máximo uma fatia."""
+        if self._inicio is None: return 0.0
+        return max(0.0, min(self.fatia, self._inicio + self._periodo(estado) - time.monotonic()))
+
+    def iniciar(self, estado):
+        """Marca o início de um frame; retorna se este estado faz detecção."""
+        agora = time.monotonic()
+        if self._inicio is not None and agora > self._inicio:
+            fps = 1.0 / (agora - self._inicio)
+            self.fps_medido = fps if self.fps_medido == 0.0 else (1 - ALFA_FPS) * self.fps_medido + ALFA_FPS * fps
+        self._inicio = agora
+        return self.ritmo(estado)[1]
@@ -0,0 +1,75 @@
+"""
+Pool de buffers pré-alocados para o pipeline de detecção.
+
+Em 1080p cada imagem intermediária (HSV, máscaras, resultado da erosão...)
+tem de 2 a 6 MB; alocar todas de novo a cada frame custa alocador e cache.
+As etapas pedem os buffers ao pool por nome e escrevem neles com o dst= do
+OpenCV. Um buffer só é (re)alocado na primeira vez ou quando a forma muda
+(outra resolução, outro ROI); em regime, zero alocações por frame.
+
+O pool é por thread (pool_da_thread): o loop de vídeo, cada thread de
+célula e cada processo de segmentação têm o seu, sem locks. Um buffer do
+pool vale até a próxima chamada da mesma etapa na mesma thread; quem
+precisa guardá-lo por mais tempo copia.
+
+    pool = pool_da_thread()
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=pool.obter("hsv", frame.shape))
+    ...
+    pool.fim_do_quadro() # Uma vez por frame, no loop
+
+Com DEBUG_ALOCACOES = True, fim_do_quadro() imprime os frames que alocaram.
+"""
+import threading
+
+import numpy as np
+
+# --- Padrões ---
+DEBUG_ALOCACOES = False # Imprime as alocações de cada frame que alocou algo
+# ---------------
+
+
+class PoolBuffers:
+    def __init__(self, nome="pool"):
+        self.nome = nome
+        self._buffers = {}
+        self.alocacoes = 0          # Total desde a criação
+        self.alocacoes_quadro = 0   # Do frame atual (zerado por fim_do_quadro)
+        self.ultimo_quadro = 0      # Do último frame fechado
+        self.quadros = 0
+
+    def obter(self, chave, forma, dtype=np.uint8):
+        """Buffer 'chave' com a forma e o tipo pedidos; conteúdo indefinido."""
+        buf = self._buffers.get(chave)
+        forma = tuple(forma)
+        if buf is None or buf.shape != forma or buf.dtype != dtype:
+            buf = np.empty(forma, dtype); self._buffers[chave] = buf
+            self.alocacoes += 1; self.alocacoes_quadro += 1
+        return buf
+
+    @property
+    def bytes(self):
+        return sum(b.nbytes for b in self._buffers.values())
+
+    def fim_do_quadro(self):
+        """Fecha o frame: guarda e zera a contagem de alocações dele."""
+        self.ultimo_quadro = self.alocacoes_quadro; self.alocacoes_quadro = 0
+        self.quadros += 1
+        if DEBUG_ALOCACOES and self.ultimo_quadro:
+            print(f"[DEBUG] {self.nome}: {self.ultimo_quadro} alocação(ões) no frame {self.quadros} "
+                  f"({len(self._buffers)} buffers, {self.bytes / 1e6:.1f} MB)")
+        return self.ultimo_quadro
+
+    def resumo(self):
+        return (f"{self.nome}: {len(self._buffers)} buffers, {self.bytes / 1e6:.1f} MB, "
+                f"{self.alocacoes} alocações em {self.quadros} frames (último: {self.ultimo_quadro})")
+
+
+_local = threading.local()
+
+
+def pool_da_thread():
+    """O PoolBuffers desta thread (criado no primeiro uso)."""
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = _local.pool = PoolBuffers(f"pool[{threading.current_thread().name}]")
+    return pool
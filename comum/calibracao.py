@@ -0,0 +1,226 @@
+"""
+Calibração da célula: pontos de homografia, grade, marcador e carga sob demanda.
+
+Arquivos (na pasta de calibração de cada célula, o diretório atual dos scripts):
+  * pontos_calibracao.txt: pares pixel -> mm do robô, gravados por
+    calibrauto.py / calibrarobo.py (salvar_pontos) no formato "copiar e colar"
+    de arrays numpy que carregar_pontos_do_arquivo() lê;
+  * grid_calibracao.txt: JSON com os 9 centros da grade em pixels (camera.py);
+  * lente_calibracao.npz e perfil_cor.json: comum.lente e comum.perfilcor.
+
+Calibracao junta tudo isso sem ler nada no construtor: a correção da lente,
+a homografia e o perfil de cor são carregados no primeiro acesso. Instanciar
+o jogo ou o detector não toca no disco (replay, testes, processos de
+trabalho); o ponto de entrada chama carregar() para falhar cedo.
+
+    calib = Calibracao(modo_lente="pontos")
+    if not calib.carregar(): sys.exit(1)
+    mm = calib.pixels_para_robo([(960, 540), (100, 200)])  # array (N, 2)
+"""
+import json
+import threading
+
+import numpy as np
+
+from comum import importar_sob_demanda
+from comum.lente import NOME_ARQUIVO_LENTE, carregar_corretor
+from comum.perfilcor import NOME_ARQUIVO_PERFIL_COR, carregar_perfil_cor, faixas_do_perfil
+from comum.segmentacao import mascara_faixas, extrair_blobs
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- NOMES DOS ARQUIVOS ---
+NOME_ARQUIVO_PONTOS = "pontos_calibracao.txt"
+NOME_ARQUIVO_GRID = "grid_calibracao.txt" # Coordenadas em pixels dos 9 centros
+# --------------------------
+
+# O marcador dos calibradores é uma peça AZUL; sem perfil de cor vale esta faixa
+FAIXA_MARCADOR_PADRAO = [(np.array([80, 120, 70]), np.array([150, 255, 255]))]
+AREA_MINIMA_MARCADOR = 100 # px²
+
+
+class CalibracaoAusente(RuntimeError):
+    """Homografia pedida sem pontos de calibração válidos."""
+
+
+# =========================================================
+# --- PONTOS DE HOMOGRAFIA ---
+# =========================================================
+def carregar_pontos_do_arquivo(filename=NOME_ARQUIVO_PONTOS):
+    """
+    Lê o arquivo de calibração gerado e extrai os arrays p_camera e p_robot.
+    Retorna (p_camera, p_robot) float32 N x 2 ou (None, None) em caso de erro.
+    """
+    p_camera_list = []; p_robot_list = []
+    try:
+        with open(filename, 'r', encoding='utf-8', errors='replace') as f: content = f.read()
+    except FileNotFoundError:
+        print(f"ERRO: Arquivo de calibração '{filename}' não encontrado."); return None, None
+    except Exception as e:
+        print(f"ERRO ao ler o arquivo '{filename}': {e}"); return None, None
+
+    lendo_camera = False; lendo_robot = False # Bloco de dados sendo lido
+    for line in content.splitlines():
+        line = line.strip()
+        if "p_camera = np.array([" in line: lendo_camera = True; lendo_robot = False; continue
+        elif "p_robot = np.array([" in line: lendo_camera = False; lendo_robot = True; continue
+        elif "], dtype=np.float32)" in line: lendo_camera = False; lendo_robot = False; continue
+        # Um par de números entre colchetes, ignorando o resto da linha (comentários)
+        if (lendo_camera or lendo_robot) and line.startswith('[') and ']' in line:
+            try:
+                x, y = map(float, line.split(']')[0].strip('[').split(','))
+                (p_camera_list if lendo_camera else p_robot_list).append([x, y]) # Arquivos antigos têm inteiros
+            except ValueError as e:
+                print(f"Aviso: Linha de dados inválida no arquivo: '{line}'. Erro: {e}")
+
+    if not p_camera_list or not p_robot_list or len(p_camera_list) != len(p_robot_list):
+        print(f"ERRO: Dados de calibração incompletos ou incompatíveis. Câmera: {len(p_camera_list)} pontos, Robô: {len(p_robot_list)} pontos.")
+        return None, None
+    print(f"\n[SUCESSO] Carregados {len(p_camera_list)} pontos de calibração de '{filename}'.")
+    return np.array(p_camera_list, dtype=np.float32), np.array(p_robot_list, dtype=np.float32)
+
+
+def formatar_pontos(lista_camera, lista_robo):
+    """Texto "copiar e colar" (arrays numpy) com os pontos coletados, com 2 decimais; é o formato de pontos_calibracao.txt."""
+    linhas = ["", "=" * 50, "--- CÓDIGO DE CALIBRAÇÃO PARA COPIAR E COLAR ---", "=" * 50,
+              "# --- PONTOS DE CALIBRAÇÃO DE HOMOGRAFIA ---", "# Os pontos que a CÂMERA viu (em pixels brutos)", "p_camera = np.array(["]
+    linhas += [f"    [{p[0]:.2f}, {p[1]:.2f}]" + ("," if i < len(lista_camera) - 1 else "") for i, p in enumerate(lista_camera)]
+    linhas += ["], dtype=np.float32)", "", "# Os pontos REAIS do ROBÔ (em milímetros)", "p_robot = np.array(["]
+    linhas += [f"    [{p[0]:.2f}, {p[1]:.2f}]" + ("," if i < len(lista_robo) - 1 else "") + f"  # Ponto {i+1}" for i, p in enumerate(lista_robo)]
+    linhas += ["], dtype=np.float32)", "=" * 50, "--- FIM DO CÓDIGO ---", "=" * 50, ""]
+    return "\n".join(linhas)
+
+
+def salvar_pontos(lista_camera, lista_robo, filename=NOME_ARQUIVO_PONTOS):
+    """Salva os pontos em 'filename' (None = só imprime) e imprime o texto no console."""
+    texto = formatar_pontos(lista_camera, lista_robo)
+    ok = filename is None
+    if filename is not None:
+        try:
+            with open(filename, "w", encoding="utf-8") as f: f.write(texto)
+            print(f"\n[SUCESSO] Pontos salvos em '{filename}'!"); ok = True
+        except Exception as e:
+            print(f"\n[ERRO] Falha ao salvar em '{filename}': {e}")
+    print(texto)
+    return ok
+
+
+# =========================================================
+# --- GRADE DO JOGO DA VELHA ---
+# =========================================================
+def carregar_centros_grid_pixels(filename=NOME_ARQUIVO_GRID):
+    """Os 9 centros da grade [(x, y), ...] em pixels, ou None."""
+    try:
+        with open(filename, 'r') as f: centros_pixels = json.load(f)
+        if isinstance(centros_pixels, list) and len(centros_pixels) == 9:
+            centros = [(int(p[0]), int(p[1])) for p in centros_pixels]
+            print(f"[SUCESSO] Carregados {len(centros)} centros da grade (pixels) de '{filename}'.")
+            return centros
+        print(f"[ERRO] Arquivo '{filename}' não contém lista válida de 9 pontos."); return None
+    except FileNotFoundError: print(f"[ERRO] Arquivo '{filename}' não encontrado."); return None
+    except json.JSONDecodeError: print(f"[ERRO] Arquivo '{filename}' não é JSON válido."); return None
+    except Exception as e: print(f"[ERRO] Falha inesperada ao ler '{filename}': {e}."); return None
+
+
+# =========================================================
+# --- MARCADOR DOS CALIBRADORES ---
+# =========================================================
+def faixas_marcador(filename=NOME_ARQUIVO_PERFIL_COR):
+    """Faixas HSV do marcador: as do Azul no perfil de cor (calibradorcor.py) ou FAIXA_MARCADOR_PADRAO."""
+    perfil = carregar_perfil_cor(filename)
+    return perfil.faixas[1] if perfil is not None and 1 in perfil.faixas else FAIXA_MARCADOR_PADRAO
+
+
+def detectar_marcador(frame, faixas=FAIXA_MARCADOR_PADRAO):
+    """Detecta o marcador (maior blob da cor) e desenha no frame. Retorna ((x, y) ou None, frame, mascara)."""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    mascara = mascara_faixas(hsv, faixas)
+    mascara = cv2.erode(mascara, None, iterations=2)
+    mascara = cv2.dilate(mascara, None, iterations=2)
+    blobs = extrair_blobs(mascara, area_minima=AREA_MINIMA_MARCADOR)
+    if not blobs: return None, frame, mascara
+    c, _ = max(blobs, key=lambda b: b[1]) # Maior blob
+    (x_pixel, y_pixel), raio = cv2.minEnclosingCircle(c)
+    cv2.circle(frame, (int(x_pixel), int(y_pixel)), int(raio), (0, 255, 0), 2)
+    cv2.circle(frame, (int(x_pixel), int(y_pixel)), 5, (0, 0, 255), -1)
+    return (x_pixel, y_pixel), frame, mascara
+
+
+# =========================================================
+# --- CALIBRAÇÃO DA CÉLULA (SOB DEMANDA) ---
+# =========================================================
+_NAO_LIDO = object()
+
+
+class Calibracao:
+    """
+    Homografia pixel -> mm, correção da lente e perfil de cor de uma célula.
+    modo_lente: 'pontos' (corrige só os pontos), 'frame' (remap do frame inteiro) ou None.
+    """
+
+    def __init__(self, arquivo_pontos=NOME_ARQUIVO_PONTOS, modo_lente="pontos", arquivo_lente=NOME_ARQUIVO_LENTE,
+                 arquivo_perfil_cor=NOME_ARQUIVO_PERFIL_COR):
+        self.arquivo_pontos = arquivo_pontos; self.modo_lente = modo_lente
+        self.arquivo_lente = arquivo_lente; self.arquivo_perfil_cor = arquivo_perfil_cor
+        self._trava = threading.RLock() # Loop de vídeo e controlador podem pedir a mesma parte ao mesmo tempo
+        self._corretor = _NAO_LIDO; self._H = _NAO_LIDO; self._cores = _NAO_LIDO
+
+    @property
+    def corretor_lente(self):
+        """comum.lente.CorretorLente ou None (sem modo de lente ou sem arquivo)."""
+        if self._corretor is _NAO_LIDO:
+            with self._trava:
+                if self._corretor is _NAO_LIDO: self._corretor = carregar_corretor(self.arquivo_lente) if self.modo_lente else None
+        return self._corretor
+
+    @property
+    def corrige_frame(self):
+        """True se o frame inteiro deve ser remapeado (modo 'frame' com calibração da lente)."""
+        return self.modo_lente == "frame" and self.corretor_lente is not None
+
+    @property
+    def H(self):
+        """Homografia 3x3 pixel (sem distorção) -> mm. Levanta CalibracaoAusente sem pontos válidos."""
+        if self._H is _NAO_LIDO:
+            with self._trava:
+                if self._H is _NAO_LIDO: self._H = self._calcular_homografia()
+        if isinstance(self._H, str): raise CalibracaoAusente(self._H)
+        return self._H
+
+    def _calcular_homografia(self):
+        p_camera, p_robot = carregar_pontos_do_arquivo(self.arquivo_pontos)
+        if p_camera is None: return f"Falha ao carregar os pontos de calibração de '{self.arquivo_pontos}'."
+        # Os pixels do arquivo foram capturados com a lente distorcida; a homografia
+        # é calculada no mesmo espaço (corrigido) em que os blocos serão medidos
+        if self.corretor_lente is not None: p_camera = self.corretor_lente.corrigir_pontos(p_camera)
+        H, _ = cv2.findHomography(p_camera, p_robot, cv2.RANSAC)
+        return H if H is not None else "Não foi possível calcular a homografia."
+
+    @property
+    def faixas_cor(self):
+        return self._perfil_cor()[0]
+
+    @property
+    def area_minima_cor(self):
+        return self._perfil_cor()[1]
+
+    def _perfil_cor(self):
+        if self._cores is _NAO_LIDO:
+            with self._trava:
+                if self._cores is _NAO_LIDO: self._cores = faixas_do_perfil(self.arquivo_perfil_cor)
+        return self._cores
+
+    def carregar(self):
+        """Carrega tudo agora (lente, homografia, perfil de cor). Retorna False se a homografia falhar."""
+        try:
+            self.H; self._perfil_cor()
+        except CalibracaoAusente as e:
+            print(f"ERRO FATAL: {e} Verifique se o arquivo existe e o formato está correto."); return False
+        return True
+
+    def pixels_para_robo(self, pontos):
+        """N pontos (x, y) em pixels -> array (N, 2) em mm do robô, em uma chamada só (lente + homografia)."""
+        pts = np.asarray(pontos, dtype=np.float32).reshape(-1, 2)
+        if len(pts) == 0: return pts
+        if self.modo_lente == "pontos" and self.corretor_lente is not None: pts = self.corretor_lente.corrigir_pontos(pts)
+        return cv2.perspectiveTransform(pts.reshape(-1, 1, 2), self.H).reshape(-1, 2)
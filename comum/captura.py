@@ -0,0 +1,220 @@
+"""
+Abertura e configuração da câmera, compartilhada por todos os scripts.
+
+Só com cap.set(largura, altura) muitas câmeras UVC caem em YUYV sem
+compressão a 1080p (5 fps pela banda do USB 2.0) e deixam exposição, ganho e
+balanço de branco no automático: as cores mudam com a luz da sala e as
+faixas HSV calibradas deixam de valer. abrir_camera():
+  * escolhe o backend (V4L2 no Linux, DirectShow no Windows) e pede um FOURCC
+    comprimido (MJPG) ANTES da resolução, senão o driver negocia o formato
+    na resolução antiga;
+  * pede o FPS e um buffer de 1 frame (o frame lido é sempre o mais novo);
+  * trava exposição, ganho, balanço de branco e foco com os valores do
+    perfil da câmera (camera_perfil.json), se ele existir;
+  * mede a taxa alcançada e a latência e imprime um relatório na partida.
+
+Perfil (gravado com o automático já assentado na luz da célula; rode da raiz
+do repositório e aponte para a pasta do script que vai usá-lo):
+    python -m comum.captura <câmera> salvar [arquivo]  -> grava o perfil (padrão: camera_perfil.json)
+    python -m comum.captura <câmera> [arquivo]         -> só o relatório, com o perfil aplicado
+Formato (VERSAO_PERFIL_CAMERA = 1):
+    {"versao": 1, "criado": "AAAA-MM-DD HH:MM:SS", "fourcc": "MJPG", "fps": 30,
+     "exposicao": -6.0, "ganho": 0.0, "temperatura_wb": 4600.0, "foco": null}
+Um valor null fica no automático.
+"""
+import json
+import sys
+import time
+
+from comum import importar_sob_demanda
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- Padrões ---
+NOME_ARQUIVO_PERFIL_CAMERA = "camera_perfil.json"
+VERSAO_PERFIL_CAMERA = 1
+FOURCC_PREFERIDOS = ("MJPG", "H264") # Tentados em ordem; o primeiro aceito fica
+FPS_PADRAO = 30
+TAMANHO_BUFFER = 1
+QUADROS_MEDICAO = 30   # Frames lidos na partida para medir taxa e latência (0 = não mede)
+QUADROS_AQUECIMENTO = 5 # Descartados antes da medição (o primeiro frame demora)
+ESPERA_AUTOMATICO = 3.0 # Segundos para o automático assentar antes de salvar o perfil
+# ----------------
+
+# CAP_PROP_AUTO_EXPOSURE não tem valor único: (manual, automático) por backend
+AUTO_EXPOSICAO = {"V4L2": (1, 3), "DSHOW": (0.25, 0.75), "MSMF": (0.25, 0.75)}
+AUTO_EXPOSICAO_PADRAO = (0.25, 0.75)
+
+
+def _backend_do_sistema():
+    if sys.platform.startswith("linux"): return cv2.CAP_V4L2
+    if sys.platform.startswith("win"): return cv2.CAP_DSHOW
+    return cv2.CAP_ANY
+
+
+def _nome_backend(cap):
+    try: return cap.getBackendName()
+    except (cv2.error, AttributeError): return "?"
+
+
+def _fourcc_atual(cap):
+    codigo = int(cap.get(cv2.CAP_PROP_FOURCC))
+    texto = "".join(chr((codigo >> (8 * i)) & 0xFF) for i in range(4))
+    return texto if texto.isprintable() and texto.strip() else "?"
+
+
+# =========================================================
+# --- PERFIL ---
+# =========================================================
+def carregar_perfil_camera(filename=NOME_ARQUIVO_PERFIL_CAMERA):
+    try:
+        with open(filename, 'r', encoding='utf-8') as f: perfil = json.load(f)
+        if perfil.get("versao") != VERSAO_PERFIL_CAMERA:
+            print(f"[ERRO] '{filename}' é da versão {perfil.get('versao')} (esperada {VERSAO_PERFIL_CAMERA}). Câmera no automático.")
+            return None
+    except FileNotFoundError:
+        print(f"[AVISO] '{filename}' não encontrado. Exposição e balanço de branco no automático.")
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[ERRO] Falha ao ler '{filename}': {e}. Câmera no automático.")
+        return None
+    print(f"[SUCESSO] Perfil da câmera carregado de '{filename}' (criado em {perfil.get('criado')}).")
+    return perfil
+
+
+def salvar_perfil_camera(filename, perfil):
+    try:
+        with open(filename, 'w', encoding='utf-8') as f: json.dump(perfil, f, indent=2)
+        print(f"[SUCESSO] Perfil da câmera salvo em '{filename}'.")
+        return True
+    except OSError as e:
+        print(f"[ERRO] Falha ao salvar '{filename}': {e}")
+        return False
+
+
+def ler_perfil_atual(cap, fps=FPS_PADRAO):
+    """Valores que a câmera está usando agora (o automático já assentado), no formato do perfil."""
+    def valor(prop):
+        v = cap.get(prop)
+        return None if v == -1 else float(v) # -1: propriedade não suportada
+    return {"versao": VERSAO_PERFIL_CAMERA, "criado": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "fourcc": _fourcc_atual(cap), "fps": fps,
+            "exposicao": valor(cv2.CAP_PROP_EXPOSURE), "ganho": valor(cv2.CAP_PROP_GAIN),
+            "temperatura_wb": valor(cv2.CAP_PROP_WB_TEMPERATURE), "foco": valor(cv2.CAP_PROP_FOCUS)}
+
+
+def travar_parametros(cap, perfil):
+    """Desliga o automático e fixa os valores do perfil. Devolve os nomes dos parâmetros aceitos."""
+    manual, _ = AUTO_EXPOSICAO.get(_nome_backend(cap), AUTO_EXPOSICAO_PADRAO)
+    travados = []
+    if perfil.get("exposicao") is not None:
+        cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, manual)
+        if cap.set(cv2.CAP_PROP_EXPOSURE, perfil["exposicao"]): travados.append("exposição")
+    if perfil.get("ganho") is not None and cap.set(cv2.CAP_PROP_GAIN, perfil["ganho"]): travados.append("ganho")
+    if perfil.get("temperatura_wb") is not None:
+        cap.set(cv2.CAP_PROP_AUTO_WB, 0)
+        if cap.set(cv2.CAP_PROP_WB_TEMPERATURE, perfil["temperatura_wb"]): travados.append("balanço de branco")
+    if perfil.get("foco") is not None:
+        cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)
+        if cap.set(cv2.CAP_PROP_FOCUS, perfil["foco"]): travados.append("foco")
+    return travados
+
+
+# =========================================================
+# --- MEDIÇÃO ---
+# =========================================================
+def medir_captura(cap, quadros=QUADROS_MEDICAO, aquecimento=QUADROS_AQUECIMENTO):
+    """
+    Lê alguns frames e mede: fps alcançado, tempo bloqueado em read() e, se o
+    backend carimba o buffer no relógio monotônico (V4L2), a latência da
+    captura até a entrega. Devolve um dict ou None se a leitura falhar.
+    """
+    frame = None
+    for _ in range(aquecimento):
+        ret, frame = cap.read(frame)
+        if not ret: return None
+    leituras = []; latencias = []
+    inicio = time.perf_counter()
+    for _ in range(quadros):
+        t = time.perf_counter()
+        ret, frame = cap.read(frame)
+        if not ret: return None
+        leituras.append(time.perf_counter() - t)
+        carimbo = cap.get(cv2.CAP_PROP_POS_MSEC)
+        latencia = time.monotonic() * 1000.0 - carimbo
+        if carimbo > 0 and 0.0 <= latencia < 1000.0: latencias.append(latencia)
+    total = time.perf_counter() - inicio
+    return {"fps": quadros / total if total > 0 else 0.0,
+            "leitura_ms": 1000.0 * sum(leituras) / len(leituras), "leitura_max_ms": 1000.0 * max(leituras),
+            "latencia_ms": sum(latencias) / len(latencias) if len(latencias) == quadros else None}
+
+
+def instante_quadro(cap):
+    """
+    Instante (time.monotonic, em s) em que o último frame lido foi capturado: o carimbo
+    do driver quando ele usa o relógio monotônico (V4L2), senão o instante da entrega.
+    """
+    agora = time.monotonic()
+    carimbo = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+    return carimbo if carimbo > 0 and 0.0 <= agora - carimbo < 1.0 else agora
+
+
+# =========================================================
+# --- ABERTURA ---
+# =========================================================
+def abrir_camera(indice, largura=1920, altura=1080, fps=FPS_PADRAO, arquivo_perfil=NOME_ARQUIVO_PERFIL_CAMERA,
+                 quadros_medicao=QUADROS_MEDICAO, prefixo="Câmera"):
+    """
+    cv2.VideoCapture configurado (formato, resolução, FPS, buffer e parâmetros
+    travados). Como o cv2.VideoCapture, pode voltar fechado: confira isOpened().
+    arquivo_perfil=None deixa exposição e balanço de branco no automático.
+    """
+    backend = _backend_do_sistema()
+    cap = cv2.VideoCapture(indice, backend)
+    if not cap.isOpened() and backend != cv2.CAP_ANY:
+        cap.release(); cap = cv2.VideoCapture(indice)
+    if not cap.isOpened(): return cap
+
+    perfil = carregar_perfil_camera(arquivo_perfil) if arquivo_perfil else None
+    fps = (perfil or {}).get("fps") or fps
+    preferidos = [(perfil or {}).get("fourcc")] + list(FOURCC_PREFERIDOS)
+    fourcc = "?"
+    for nome in dict.fromkeys(p for p in preferidos if p and len(p) == 4):
+        if cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*nome)) and _fourcc_atual(cap) == nome:
+            fourcc = nome; break
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, largura); cap.set(cv2.CAP_PROP_FRAME_HEIGHT, altura)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, TAMANHO_BUFFER)
+    travados = travar_parametros(cap, perfil) if perfil else []
+
+    aw = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)); ah = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    print(f"{prefixo} {indice}: backend {_nome_backend(cap)}, formato {fourcc if fourcc != '?' else _fourcc_atual(cap)}, "
+          f"{aw}x{ah} @ {cap.get(cv2.CAP_PROP_FPS):.0f} fps pedidos.")
+    if fourcc == "?": print(f"[AVISO] A câmera não aceitou {'/'.join(FOURCC_PREFERIDOS)}: sem compressão, a taxa em {aw}x{ah} pode ser baixa.")
+    print(f"  Travados: {', '.join(travados)}." if travados else "  Exposição e balanço de branco no automático.")
+    if quadros_medicao > 0:
+        medida = medir_captura(cap, quadros_medicao)
+        if medida is None: print("[AVISO] Falha ao ler frames na medição.")
+        else:
+            latencia = f", latência da captura {medida['latencia_ms']:.1f} ms" if medida["latencia_ms"] is not None else ""
+            print(f"  Medido: {medida['fps']:.1f} fps, read() {medida['leitura_ms']:.1f} ms (máx {medida['leitura_max_ms']:.1f} ms){latencia}.")
+            if medida["fps"] < 0.8 * fps: print(f"[AVISO] A câmera entrega {medida['fps']:.1f} fps de {fps} pedidos.")
+    return cap
+
+
+if __name__ == "__main__":
+    indice = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    salvar = len(sys.argv) > 2 and sys.argv[2] == "salvar"
+    args = sys.argv[3:] if salvar else sys.argv[2:]
+    arquivo = args[0] if args else NOME_ARQUIVO_PERFIL_CAMERA
+    cap = abrir_camera(indice, arquivo_perfil=None if salvar else arquivo)
+    if not cap.isOpened():
+        print(f"Erro: Não foi possível abrir a câmera {indice}."); sys.exit(1)
+    if salvar:
+        print(f"Aguardando {ESPERA_AUTOMATICO:.0f} s para o automático assentar...")
+        fim = time.monotonic() + ESPERA_AUTOMATICO
+        while time.monotonic() < fim: cap.read()
+        perfil = ler_perfil_atual(cap)
+        print(json.dumps(perfil, indent=2))
+        salvar_perfil_camera(arquivo, perfil)
+    cap.release()
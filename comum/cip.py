@@ -0,0 +1,453 @@
+"""
+Camada CIP com o controlador Fanuc: registradores R[] como INT32 (classe
+0x6B) ou como REAL (classe 0x6C) e registradores de posição PR[] cartesianos
+(classe 0x7B).
+
+SessaoRobo mantém a comunicação viva sem travar o loop de visão:
+  * um pool pequeno de conexões CIPDriver (uma por vez por thread; com 2+
+    o pulso de R[5] e o loop principal escrevem em paralelo);
+  * keep-alive: conexões ociosas leem um registrador periodicamente, então
+    uma sessão morta é detectada mesmo sem tráfego;
+  * reconexão em segundo plano com espera exponencial; enquanto não volta,
+    leituras/escritas falham na hora (retornam False) em vez de bloquear;
+  * ao reconectar, reaplica o estado "de nível" dos registradores
+    (ex.: R[9] = modo limpeza), inclusive valores que o programa tentou
+    escrever durante a queda;
+  * espelho dos registradores: guarda o último valor confirmado de cada R[n]
+    e não reenvia um valor que o robô já tem (forcar=True ignora o espelho);
+  * pulsos (R[n]=1 por alguns segundos) agendados em uma única thread
+    persistente, em vez de uma thread por pulso;
+  * toda transação passa por comum.trafego.RegistroTrafego (sessao.trafego):
+    latência por registrador, taxa de erro e log JSON-lines opcional.
+
+Por que R[5] só é reaplicado quando vale 0: R[5]=1 é um comando que o robô
+consome e zera sozinho; reenviar 1 depois de uma queda pode repetir o
+movimento. Já R[5]=0 ("nada pendente") é sempre seguro. Pelo mesmo motivo o
+espelho nunca evita um R[5]=1: o 1 em cache pode já ter sido zerado pelo robô.
+
+Alvos com casas decimais: write_register arredonda para inteiro (R[1]=312
+em vez de 312.4 mm); write_real escreve o mesmo R[n] como REAL, e
+write_posicao escreve X/Y/Z/W/P/R de um PR[n] em uma única transação. O PR
+é lido uma vez (modelo com UT, UF, configuração e eixos extras, que não
+mudam) e, dali em diante, cada escrita só troca os campos pedidos nesse
+modelo; os campos não informados ficam como estavam no modelo.
+"""
+import heapq
+import queue
+import struct
+import threading
+import time
+
+from comum import importar_sob_demanda
+from comum.trafego import RegistroTrafego
+
+pycomm3 = importar_sob_demanda("pycomm3")
+
+# --- Padrões ---
+TAMANHO_POOL = 2
+PERIODO_KEEPALIVE = 2.0   # s de ociosidade antes de testar a conexão
+REGISTRADOR_KEEPALIVE = 5
+BACKOFF_INICIAL = 0.5     # s
+BACKOFF_MAXIMO = 30.0     # s
+TIMEOUT_POOL = 0.5        # s esperando uma conexão livre antes de desistir
+# Registrador -> valores que podem ser reaplicados após reconectar (None = qualquer valor)
+REAPLICAR = {9: None, 5: {0}}
+# Registradores que o próprio robô também escreve -> valores que ele escreve. O espelho só
+# evita uma escrita se o robô não pode ter mudado o valor desde então (R[5]=0 sim, R[5]=1 não).
+ESCRITOS_PELO_ROBO = {5: {0}}
+CLASSE_R = 0x6B           # R[] como INT32
+CLASSE_R_REAL = 0x6C      # R[] como REAL (float32)
+CLASSE_PR = 0x7B          # PR[] cartesiano; instância = grupo de movimento
+OFFSET_XYZWPR = 8         # Bytes de UT e UF antes de X, Y, Z, W, P, R (6 x float32) no PR
+CAMPOS_PR = ("x", "y", "z", "w", "p", "r")
+SERVICO_MULTIPLO = 0x0A   # Multiple Service Packet (vários get_attribute_single em uma transação)
+# ---------------
+
+
+def _int32(dados):
+    return int.from_bytes(dados, 'little', signed=True) if isinstance(dados, (bytes, bytearray)) and len(dados) == 4 else None
+
+
+def _real(dados):
+    return round(struct.unpack('<f', dados)[0], 4) if isinstance(dados, (bytes, bytearray)) and len(dados) == 4 else None
+
+
+def _caminho_atributo(classe, instancia, atributo):
+    """Caminho CIP (segmentos lógicos de 8 bits; atributo de 16 bits acima de 255)."""
+    atr = bytes([0x30, atributo]) if atributo <= 0xFF else bytes([0x31, 0x00]) + struct.pack('<H', atributo)
+    return bytes([0x20, classe, 0x24, instancia]) + atr
+
+
+def _pedido_multiplo(classe, indices):
+    """Corpo do Multiple Service Packet com um get_attribute_single por registrador."""
+    pedidos = [bytes([0x0E, len(caminho) // 2]) + caminho for caminho in (_caminho_atributo(classe, 0x01, i) for i in indices)]
+    offsets = []; posicao = 2 + 2 * len(pedidos)
+    for pedido in pedidos: offsets.append(posicao); posicao += len(pedido)
+    return struct.pack(f'<{len(pedidos) + 1}H', len(pedidos), *offsets) + b''.join(pedidos)
+
+
+def _respostas_multiplas(dados):
+    """Corpo da resposta do Multiple Service Packet -> [bytes ou None (erro no serviço)]."""
+    n = struct.unpack_from('<H', dados, 0)[0]
+    offsets = list(struct.unpack_from(f'<{n}H', dados, 2)) + [len(dados)]
+    respostas = []
+    for inicio, fim in zip(offsets, offsets[1:]):
+        status, n_extra = dados[inicio + 2], dados[inicio + 3] # Serviço | 0x80, reservado, status geral, status adicional
+        respostas.append(bytes(dados[inicio + 4 + 2 * n_extra:fim]) if status == 0 else None)
+    return respostas
+
+
+def _xyzwpr(dados):
+    if not isinstance(dados, (bytes, bytearray)) or len(dados) < OFFSET_XYZWPR + 24: return None
+    return tuple(round(v, 4) for v in struct.unpack_from('<6f', dados, OFFSET_XYZWPR))
+
+
+class _Conexao:
+    def __init__(self, indice):
+        self.indice = indice
+        self.plc = None
+        self.ultimo_uso = 0.0
+        self.backoff = BACKOFF_INICIAL
+        self.proxima_tentativa = 0.0
+
+
+class SessaoRobo:
+    def __init__(self, ip, tamanho_pool=TAMANHO_POOL, reaplicar=REAPLICAR, escritos_pelo_robo=ESCRITOS_PELO_ROBO,
+                 periodo_keepalive=PERIODO_KEEPALIVE, registrador_keepalive=REGISTRADOR_KEEPALIVE, arquivo_trafego=None):
+        self.ip = ip
+        self.trafego = RegistroTrafego(arquivo_trafego)
+        self.reaplicar = dict(reaplicar)
+        self.escritos_pelo_robo = dict(escritos_pelo_robo)
+        self.periodo_keepalive = periodo_keepalive
+        self.registrador_keepalive = registrador_keepalive
+        self._conexoes = [_Conexao(i) for i in range(tamanho_pool)]
+        self._livres = queue.Queue()   # Conexões saudáveis e desocupadas
+        self._quebradas = []           # Aguardando reconexão (só a thread de manutenção mexe)
+        self._lock = threading.Lock()
+        self._desejado = {}            # Último valor pedido para os registradores de REAPLICAR
+        self._saudaveis = 0
+        self._rodando = False
+        self._thread = None
+        self.reconexoes = 0
+        self._espelho = {}             # R[n] -> último valor confirmado (escrito ou lido)
+        self._modelos_pr = {}          # (grupo, PR) -> bytes do PR inteiro, base das escritas de posição
+        self._multiplo_suportado = True # Multiple Service Packet (read_registers); desliga na primeira recusa
+        self.escritas_evitadas = 0
+        # Pulsos: fila de "ligar" + heap de (instante_desligar, registrador), atendidos por uma thread
+        self._cond_pulsos = threading.Condition()
+        self._ligar = []; self._desligar = []; self._fim_pulso = {}
+        self._thread_pulsos = None
+
+    # --- Ciclo de vida ---
+    def conectar(self):
+        """Abre as conexões (tentativa síncrona) e inicia a manutenção. Retorna True se ao menos uma abriu."""
+        for c in self._conexoes:
+            if self._abrir(c):
+                self._devolver(c)
+            else:
+                self._quebrar(c)
+        self._rodando = True
+        self._thread = threading.Thread(target=self._manutencao, name=f"CIP-{self.ip}", daemon=True)
+        self._thread.start()
+        self._thread_pulsos = threading.Thread(target=self._agendador_pulsos, name=f"CIP-pulsos-{self.ip}", daemon=True)
+        self._thread_pulsos.start()
+        if self.conectado:
+            print(f"Conectado a {self.ip} ({self._saudaveis} conexão(ões)).")
+        else:
+            print(f"Erro conexão com {self.ip}. Tentando novamente em segundo plano...")
+        return self.conectado
+
+    def fechar(self):
+        self._rodando = False
+        with self._cond_pulsos: self._cond_pulsos.notify()
+        for t in (self._thread, self._thread_pulsos):
+            if t is not None: t.join(timeout=2.0)
+        self._thread = self._thread_pulsos = None
+        for c in self._conexoes:
+            if c.plc is not None:
+                try: c.plc.close()
+                except Exception as e: print(f"Erro desconectar: {e}")
+                c.plc = None
+        with self._lock:
+            self._saudaveis = 0
+        while True:
+            try: self._livres.get_nowait()
+            except queue.Empty: break
+        self.trafego.fechar()
+
+    @property
+    def conectado(self):
+        return self._saudaveis > 0
+
+    # --- Registradores R[] ---
+    def write_register(self, register_index, value, forcar=False, conexao=None):
+        """
+        Escreve INT32 em R[register_index]. Retorna True/False (nunca bloqueia esperando reconexão).
+        Se o espelho diz que o robô já tem esse valor, não envia nada e retorna True.
+        """
+        int_value = int(round(float(value)))
+        if register_index in self.reaplicar:
+            self._desejado[register_index] = int_value
+        if not forcar and conexao is None and self._em_espelho(register_index, int_value):
+            self.escritas_evitadas += 1
+            return True
+        response = self.generic_message(
+            conexao=conexao,
+            service=pycomm3.Services.set_attribute_single, class_code=CLASSE_R, instance=0x01,
+            attribute=register_index, request_data=int_value.to_bytes(4, 'little', signed=True), connected=True)
+        if response is None: return False
+        if response.error:
+            print(f"ERRO ESCRITA R[{register_index}]: {response.error}")
+            self._espelho.pop(register_index, None) # Valor no robô agora é incerto
+            return False
+        self._espelho[register_index] = int_value
+        return True
+
+    def read_register(self, register_index, conexao=None):
+        """Lê INT32 de R[register_index]. Retorna (valor, ok)."""
+        response = self.generic_message(
+            conexao=conexao,
+            service=pycomm3.Services.get_attribute_single, class_code=CLASSE_R, instance=0x01,
+            attribute=register_index, connected=True)
+        if response is None or response.error: return None, False
+        valor = int.from_bytes(response.value, 'little', signed=True)
+        self._espelho[register_index] = valor
+        return valor, True
+
+    def read_registers(self, indices, real=False):
+        """
+        Lê vários R[] em uma transação (Multiple Service Packet), como INT32 ou REAL.
+        Retorna ([valores], ok). Se o controlador recusar o serviço, passa a ler um por um.
+        """
+        indices = list(indices)
+        if not self._multiplo_suportado:
+            lidos = [(self.read_real if real else self.read_register)(i) for i in indices]
+            return [v for v, _ in lidos], all(ok for _, ok in lidos)
+        classe = CLASSE_R_REAL if real else CLASSE_R
+        response = self.generic_message(
+            service=SERVICO_MULTIPLO, class_code=0x02, instance=0x01, request_data=_pedido_multiplo(classe, indices),
+            connected=True, rotulo="R[" + ",".join(map(str, indices)) + "]", direcao="leitura", decodificar=lambda d: None)
+        if response is None: return [None] * len(indices), False
+        respostas = None
+        if not response.error:
+            try: respostas = _respostas_multiplas(response.value)
+            except (struct.error, IndexError): respostas = None
+        if respostas is None or len(respostas) != len(indices) or any(r is None or len(r) < 4 for r in respostas):
+            print(f"[AVISO] Leitura em lote recusada por {self.ip} ({response.error or 'resposta inválida'}). Lendo um registrador por vez.")
+            self._multiplo_suportado = False
+            return self.read_registers(indices, real)
+        valores = [struct.unpack('<f', r[:4])[0] if real else int.from_bytes(r[:4], 'little', signed=True) for r in respostas]
+        for i, v in zip(indices, valores): self._espelho[i] = v
+        return valores, True
+
+    def write_real(self, register_index, value, forcar=False):
+        """Escreve R[register_index] como REAL (sem arredondar); usa o mesmo espelho de write_register. Para alvos, não flags."""
+        valor = float(value)
+        valor32 = struct.unpack('<f', struct.pack('<f', valor))[0] # O que o robô guarda, para o espelho
+        if not forcar and self._em_espelho(register_index, valor32):
+            self.escritas_evitadas += 1
+            return True
+        response = self.generic_message(
+            service=pycomm3.Services.set_attribute_single, class_code=CLASSE_R_REAL, instance=0x01,
+            attribute=register_index, request_data=struct.pack('<f', valor), connected=True, decodificar=_real)
+        if response is None: return False
+        if response.error:
+            print(f"ERRO ESCRITA R[{register_index}] (REAL): {response.error}")
+            self._espelho.pop(register_index, None)
+            return False
+        self._espelho[register_index] = valor32
+        return True
+
+    def read_real(self, register_index):
+        """Lê R[register_index] como REAL. Retorna (valor, ok)."""
+        response = self.generic_message(
+            service=pycomm3.Services.get_attribute_single, class_code=CLASSE_R_REAL, instance=0x01,
+            attribute=register_index, connected=True, decodificar=_real)
+        if response is None or response.error: return None, False
+        valor = struct.unpack('<f', response.value[:4])[0]
+        self._espelho[register_index] = valor
+        return valor, True
+
+    # --- Registradores de posição PR[] (cartesianos) ---
+    def read_posicao(self, pr_index, grupo=1):
+        """Lê PR[pr_index] do grupo. Retorna ({'x', 'y', 'z', 'w', 'p', 'r'} em mm/graus, ok) e atualiza o modelo."""
+        response = self.generic_message(
+            service=pycomm3.Services.get_attribute_single, class_code=CLASSE_PR, instance=grupo,
+            attribute=pr_index, connected=True, rotulo=f"PR[{pr_index}]", decodificar=_xyzwpr)
+        if response is None or response.error: return None, False
+        valores = _xyzwpr(response.value)
+        if valores is None:
+            print(f"ERRO LEITURA PR[{pr_index}]: resposta com {len(response.value)} bytes.")
+            return None, False
+        self._modelos_pr[(grupo, pr_index)] = bytes(response.value)
+        return dict(zip(CAMPOS_PR, valores)), True
+
+    def write_posicao(self, pr_index, grupo=1, recarregar=False, **campos):
+        """
+        Escreve os campos pedidos (x=, y=, z=, w=, p=, r=; floats) de PR[pr_index] em uma
+        transação. Os demais ficam como no modelo (lido na primeira escrita ou com recarregar=True).
+        """
+        desconhecidos = set(campos) - set(CAMPOS_PR)
+        if desconhecidos: raise ValueError(f"Campos de PR desconhecidos: {sorted(desconhecidos)}")
+        chave = (grupo, pr_index)
+        if recarregar or chave not in self._modelos_pr:
+            _, ok = self.read_posicao(pr_index, grupo)
+            if not ok: return False
+        dados = bytearray(self._modelos_pr[chave])
+        valores = list(struct.unpack_from('<6f', dados, OFFSET_XYZWPR))
+        for i, nome in enumerate(CAMPOS_PR):
+            if campos.get(nome) is not None: valores[i] = float(campos[nome])
+        struct.pack_into('<6f', dados, OFFSET_XYZWPR, *valores)
+        response = self.generic_message(
+            service=pycomm3.Services.set_attribute_single, class_code=CLASSE_PR, instance=grupo,
+            attribute=pr_index, request_data=bytes(dados), connected=True, rotulo=f"PR[{pr_index}]", decodificar=_xyzwpr)
+        if response is None: return False
+        if response.error:
+            print(f"ERRO ESCRITA PR[{pr_index}]: {response.error}")
+            self._modelos_pr.pop(chave, None) # Relê na próxima: o PR pode ter outro formato (ex.: juntas)
+            return False
+        self._modelos_pr[chave] = bytes(dados)
+        return True
+
+    def _em_espelho(self, register_index, valor):
+        if self._espelho.get(register_index) != valor: return False
+        escritos = self.escritos_pelo_robo.get(register_index)
+        return escritos is None or escritos <= {valor} # O robô não pode ter tirado o registrador desse valor
+
+    def invalidar_espelho(self, register_index=None):
+        """Esquece o valor em cache (de um registrador ou de todos); a próxima escrita vai para o robô."""
+        if register_index is None: self._espelho.clear()
+        else: self._espelho.pop(register_index, None)
+
+    # --- Pulsos ---
+    def pulsar(self, register_index, duracao=1.0):
+        """
+        Liga R[register_index] agora e desliga após 'duracao' s, sem bloquear.
+        Um novo pulso no mesmo registrador antes do fim só estende o desligamento.
+        Retorna False se a sessão está caída.
+        """
+        if not self.conectado: return False
+        with self._cond_pulsos:
+            fim = time.monotonic() + duracao
+            if register_index not in self._fim_pulso: self._ligar.append(register_index)
+            self._fim_pulso[register_index] = fim
+            heapq.heappush(self._desligar, (fim, register_index))
+            self._cond_pulsos.notify()
+        return True
+
+    def _agendador_pulsos(self):
+        while self._rodando:
+            with self._cond_pulsos:
+                espera = (self._desligar[0][0] - time.monotonic()) if self._desligar else 1.0
+                if not self._ligar and espera > 0: self._cond_pulsos.wait(timeout=min(espera, 1.0))
+                ligar, self._ligar = self._ligar, []
+                desligar = []; agora = time.monotonic()
+                while self._desligar and self._desligar[0][0] <= agora:
+                    fim, reg = heapq.heappop(self._desligar)
+                    if self._fim_pulso.get(reg) == fim: # Entradas antigas de pulsos estendidos são ignoradas
+                        del self._fim_pulso[reg]; desligar.append(reg)
+            for reg in ligar:
+                if not self.write_register(reg, 1, forcar=True): print(f"Erro ao LIGAR R[{reg}] (pulso).")
+            for reg in desligar:
+                if not self.write_register(reg, 0, forcar=True): print(f"Erro ao DESLIGAR R[{reg}] (pulso).")
+
+    def generic_message(self, conexao=None, rotulo=None, decodificar=_int32, direcao=None, **kwargs):
+        """
+        Executa um generic_message em uma conexão do pool. Retorna a resposta
+        do pycomm3 ou None se não há conexão ou ela caiu (exceção).
+        'conexao' é usado internamente (keep-alive/reaplicação) para usar uma conexão já reservada.
+        'rotulo' (padrão: o número do R[]), 'decodificar' (bytes -> valor) e 'direcao' (padrão: escrita se
+        há request_data) são só para o registro de tráfego.
+        """
+        c = conexao if conexao is not None else self._pegar()
+        if c is None: return None
+        registrador = rotulo if rotulo is not None else kwargs.get("attribute"); dados = kwargs.get("request_data")
+        direcao = direcao or ("escrita" if dados is not None else "leitura")
+        t0 = time.perf_counter()
+        try:
+            response = c.plc.generic_message(**kwargs)
+            c.ultimo_uso = time.monotonic()
+        except Exception as e:
+            valor = decodificar(dados) if direcao == "escrita" else None
+            self.trafego.registrar(registrador, direcao, valor, (time.perf_counter() - t0) * 1000.0, f"exceção: {e}")
+            print(f"ERRO CIP ({self.ip}, conexão {c.indice}): {e}. Reconectando em segundo plano...")
+            if conexao is None: self._quebrar(c)
+            else: c.ultimo_uso = -1.0 # Sinaliza falha para quem reservou
+            return None
+        latencia_ms = (time.perf_counter() - t0) * 1000.0
+        valor = decodificar(dados) if direcao == "escrita" else (None if response.error else decodificar(response.value))
+        self.trafego.registrar(registrador, direcao, valor, latencia_ms, str(response.error) if response.error else None)
+        if conexao is None: self._devolver(c)
+        return response
+
+    # --- Pool ---
+    def _pegar(self):
+        if not self.conectado: return None
+        try: return self._livres.get(timeout=TIMEOUT_POOL)
+        except queue.Empty: return None
+
+    def _devolver(self, c):
+        self._livres.put(c)
+
+    def _abrir(self, c):
+        try:
+            plc = pycomm3.CIPDriver(self.ip); plc.open()
+            c.plc = plc; c.ultimo_uso = time.monotonic(); c.backoff = BACKOFF_INICIAL
+            with self._lock: self._saudaveis += 1
+            return True
+        except Exception:
+            c.plc = None
+            return False
+
+    def _quebrar(self, c):
+        self._espelho.clear() # Escritas em andamento podem ter chegado ou não; o robô pode ter reiniciado
+        self._modelos_pr.clear()
+        if c.plc is not None:
+            try: c.plc.close()
+            except Exception: pass
+            c.plc = None
+            with self._lock: self._saudaveis -= 1
+        c.proxima_tentativa = time.monotonic() + c.backoff
+        with self._lock: self._quebradas.append(c)
+
+    # --- Thread de manutenção: reconexão e keep-alive ---
+    def _reaplicar_estado(self, c):
+        for reg, valor in list(self._desejado.items()):
+            permitidos = self.reaplicar.get(reg)
+            if permitidos is not None and valor not in permitidos: continue
+            if self.write_register(reg, valor, conexao=c) and c.ultimo_uso >= 0:
+                print(f"Reaplicado R[{reg}]={valor} após reconexão.")
+
+    def _reconectar(self, agora):
+        with self._lock:
+            pendentes = [c for c in self._quebradas if c.proxima_tentativa <= agora]
+        for c in pendentes:
+            with self._lock: self._quebradas.remove(c)
+            if self._abrir(c):
+                self.reconexoes += 1
+                print(f"Reconectado a {self.ip} (conexão {c.indice}).")
+                if self._saudaveis == 1: self._reaplicar_estado(c) # Só a primeira a voltar; as outras acharam o estado já aplicado
+                if c.ultimo_uso < 0: self._quebrar(c) # Caiu de novo durante a reaplicação
+                else: self._devolver(c)
+            else:
+                c.backoff = min(c.backoff * 2.0, BACKOFF_MAXIMO)
+                c.proxima_tentativa = agora + c.backoff
+                with self._lock: self._quebradas.append(c)
+
+    def _keepalive(self, agora):
+        try: c = self._livres.get_nowait() # A fila gira: a cada ciclo testa a conexão livre mais antiga
+        except queue.Empty: return
+        if agora - c.ultimo_uso < self.periodo_keepalive:
+            self._devolver(c); return
+        _, ok = self.read_register(self.registrador_keepalive, conexao=c)
+        if ok: self._devolver(c)
+        else:
+            print(f"Keep-alive falhou em {self.ip} (conexão {c.indice}).")
+            self._quebrar(c)
+
+    def _manutencao(self):
+        while self._rodando:
+            agora = time.monotonic()
+            self._reconectar(agora)
+            self._keepalive(agora)
+            time.sleep(0.1)
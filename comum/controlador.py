@@ -0,0 +1,106 @@
+"""
+Infraestrutura do controlador de célula orientado a eventos.
+
+ControladorEventos executa tratar(evento) em uma thread própria, um evento
+por vez e na ordem de chegada: cliques, teclas, detecções, "robo_livre" e
+timers. O loop de vídeo só posta eventos e desenha; as transições não
+dependem mais do ritmo dos frames.
+
+VigiaRegistrador lê um registrador em alta frequência só enquanto está
+armado e posta o evento assim que ele atinge o valor esperado (ex.: R[5]=0,
+robô livre), então o próximo comando sai na hora, não no próximo frame.
+
+Eventos são dicts {"tipo": ..., ...dados}. Para o replay, tratar() pode ser
+chamado direto, sem iniciar as threads: agendar() só guarda o prazo e o
+timer é entregue por quem chama.
+"""
+import queue
+import threading
+import time
+
+
+class ControladorEventos:
+    def __init__(self, tratar, nome="Controlador"):
+        self.tratar = tratar; self.nome = nome
+        self._fila = queue.Queue()
+        self._timers = {} # tipo -> (instante monotônico, dados)
+        self._lock = threading.Lock()
+        self._rodando = False; self._thread = None
+
+    def postar(self, tipo, **dados):
+        dados["tipo"] = tipo; self._fila.put(dados)
+
+    def agendar(self, tipo, atraso, **dados):
+        """Posta 'tipo' daqui a 'atraso' s. Reagendar o mesmo tipo substitui o anterior."""
+        with self._lock: self._timers[tipo] = (time.monotonic() + atraso, dados)
+        self._fila.put(None) # Acorda a thread para recalcular a espera
+
+    def cancelar(self, tipo):
+        with self._lock: self._timers.pop(tipo, None)
+
+    def restante(self, tipo):
+        """Segundos até o timer 'tipo' (None se não agendado). Para o HUD."""
+        with self._lock: item = self._timers.get(tipo)
+        return None if item is None else max(0.0, item[0] - time.monotonic())
+
+    def iniciar(self):
+        self._rodando = True
+        self._thread = threading.Thread(target=self._loop, name=self.nome, daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._rodando = False; self._fila.put(None)
+        if self._thread is not None: self._thread.join(timeout=2.0); self._thread = None
+
+    def _vencidos(self):
+        agora = time.monotonic(); eventos = []
+        with self._lock:
+            for tipo, (instante, dados) in list(self._timers.items()):
+                if instante <= agora:
+                    del self._timers[tipo]; eventos.append(dict(dados, tipo=tipo))
+        return eventos
+
+    def _loop(self):
+        while self._rodando:
+            with self._lock: proximo = min((t for t, _ in self._timers.values()), default=None)
+            espera = 0.5 if proximo is None else min(0.5, max(0.0, proximo - time.monotonic()))
+            try: evento = self._fila.get(timeout=espera)
+            except queue.Empty: evento = None
+            for vencido in self._vencidos(): self._executar(vencido)
+            if evento is not None and self._rodando: self._executar(evento)
+
+    def _executar(self, evento):
+        try: self.tratar(evento)
+        except Exception as e: print(f"[ERRO] {self.nome}: evento '{evento['tipo']}': {e}")
+
+
+class VigiaRegistrador:
+    """Enquanto armado, lê R[registrador] a cada 'periodo' s e chama ao_atingir() quando valer 'valor'."""
+
+    def __init__(self, ler, registrador, valor, ao_atingir, periodo=0.02):
+        self.ler = ler; self.registrador = registrador; self.valor = valor
+        self.ao_atingir = ao_atingir; self.periodo = periodo
+        self._armado = threading.Event()
+        self._rodando = False; self._thread = None
+
+    def armar(self): self._armado.set()
+    def desarmar(self): self._armado.clear()
+
+    def iniciar(self):
+        self._rodando = True
+        self._thread = threading.Thread(target=self._loop, name=f"Vigia-R{self.registrador}", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._rodando = False; self._armado.set()
+        if self._thread is not None: self._thread.join(timeout=2.0); self._thread = None
+
+    def _loop(self):
+        while self._rodando:
+            if not self._armado.wait(timeout=0.2): continue
+            if not self._rodando: break
+            valor, ok = self.ler(self.registrador)
+            if ok and valor == self.valor and self._armado.is_set():
+                self._armado.clear(); self.ao_atingir()
+            else:
+                time.sleep(self.periodo)
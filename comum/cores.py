@@ -0,0 +1,149 @@
+"""
+Modelo de cor adaptativo para a segmentação das peças.
+
+Cada cor é uma gaussiana em (H, S) com eixos independentes — H circular, então
+o vermelho que cruza 0/180 é uma classe só — mais um V mínimo. Um pixel é da
+cor se está a até K_SIGMA desvios da média em H e em S (uma caixa, como as
+faixas). O modelo começa exatamente nas faixas fixas (comum.segmentacao.FAIXAS_HSV) e
+aprende com detecções CONFIRMADAS (peça enviada ao robô, peça dentro do
+tabuleiro na limpeza), com esquecimento exponencial (ALFA), acompanhando a
+luz do turno sem depender de um único frame.
+
+A classificação por pixel usa uma tabela H x S (LUT) com um bit por cor,
+aplicada com um único cv2.calcBackProject por frame; a tabela só é
+reconstruída quando a média ou o desvio de alguma cor mudam de forma
+perceptível, então o custo por frame fica próximo ao das faixas fixas.
+
+    modelo = ModeloCorAdaptativo()
+    blocos = segmentar_blocos(frame, modelo=modelo)
+    ... bloco confirmado ...
+    modelo.aprender(frame, bloco['rect'], bloco['cor_id'])
+"""
+import threading
+
+import numpy as np
+
+from comum import importar_sob_demanda
+from comum.buffers import pool_da_thread
+from comum.segmentacao import FAIXAS_HSV
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- Padrões ---
+ALFA = 0.05              # Peso de cada confirmação (esquecimento exponencial)
+K_SIGMA = 2.5            # Meia-largura aceita em H e em S, em desvios-padrão
+MIN_PIXELS = 50          # Confirmações com menos pixels úteis são ignoradas
+FAIXA_SIGMA = (0.5, 2.0) # Desvios de (H, S) ficam entre 0,5x e 2x os da semente: nem colapsam, nem engolem o fundo
+MUDANCA_MEDIA = 1.0      # Reconstrói a LUT se a média andar mais que isso (H ou S)...
+MUDANCA_SIGMA = 0.05     # ...ou um desvio variar mais que 5%...
+MUDANCA_V = 3.0          # ...ou o V mínimo mudar mais que isso
+# ---------------
+
+_H = np.arange(180, dtype=np.float32)[:, None]
+_S = np.arange(256, dtype=np.float32)[None, :]
+
+
+def _dif_h(h, centro):
+    """Diferença circular de hue (período 180) em [-90, 90)."""
+    return (h - centro + 90.0) % 180.0 - 90.0
+
+
+class _ClasseCor:
+    def __init__(self, cor_id, faixas, k_sigma):
+        self.cor_id = cor_id
+        hues = np.concatenate([np.arange(int(inf[0]), int(sup[0]) + 1) for inf, sup in faixas]).astype(np.float64)
+        ang = hues * (2.0 * np.pi / 180.0)
+        self.media_h = (np.degrees(np.arctan2(np.sin(ang).mean(), np.cos(ang).mean())) / 2.0) % 180.0
+        meia_h = np.abs(_dif_h(hues, self.media_h)).max()
+        s_min = min(int(inf[1]) for inf, _ in faixas); s_max = max(int(sup[1]) for _, sup in faixas)
+        self.media_s = (s_min + s_max) / 2.0
+        # Semente: a caixa das faixas vale exatamente k_sigma desvios de cada lado
+        self.var = np.array([(max(meia_h, 1.0) / k_sigma) ** 2, (max((s_max - s_min) / 2.0, 1.0) / k_sigma) ** 2])
+        self.v_min = float(min(int(inf[2]) for inf, _ in faixas))
+        self.var_semente = self.var.copy(); self.v_min_semente = self.v_min
+        self.confirmacoes = 0
+
+    def distancia(self, dh, ds):
+        """Maior desvio normalizado entre H e S (a caixa aceita é distancia <= k_sigma)."""
+        return np.maximum(np.abs(dh) / np.sqrt(self.var[0]), np.abs(ds) / np.sqrt(self.var[1]))
+
+    def estado(self):
+        return np.array([self.media_h, self.media_s, np.sqrt(self.var[0]), np.sqrt(self.var[1]), self.v_min])
+
+
+class ModeloCorAdaptativo:
+    def __init__(self, faixas=FAIXAS_HSV, alfa=ALFA, k_sigma=K_SIGMA):
+        self.alfa = alfa; self.k_sigma = k_sigma
+        self.classes = {cor_id: _ClasseCor(cor_id, lims, k_sigma) for cor_id, lims in faixas.items()}
+        self._lock = threading.Lock()
+        self._bits = {cor_id: 1 << i for i, cor_id in enumerate(self.classes)} # Até 8 cores (LUT uint8)
+        self._tabelas_bit = {cor_id: np.where(np.arange(256) & bit, 255, 0).astype(np.uint8) for cor_id, bit in self._bits.items()}
+        self._dentro = {}; self._estado_lut = {}; self._lut = None
+        self.reconstrucoes = 0
+        for c in self.classes.values(): self._reconstruir(c)
+
+    # --- Classificação ---
+    def _reconstruir(self, c):
+        self._dentro[c.cor_id] = c.distancia(_dif_h(_H, c.media_h), _S - c.media_s) <= self.k_sigma + 1e-6
+        self._estado_lut[c.cor_id] = c.estado()
+        lut = np.zeros((180, 256), np.float32) # "Histograma" 180 x 256 para o calcBackProject
+        for cor_id, dentro in self._dentro.items(): lut[dentro] += self._bits[cor_id]
+        self._lut = lut # Troca atômica: mascaras() nunca vê uma tabela pela metade
+        self.reconstrucoes += 1
+
+    def mascaras(self, hsv, pool=None):
+        """{cor_id: máscara uint8 0/255} para um frame HSV, em buffers do pool (comum.buffers)."""
+        pool = pool or pool_da_thread()
+        forma = hsv.shape[:2]
+        rotulos = cv2.calcBackProject([hsv], [0, 1], self._lut, [0, 180, 0, 256], 1, dst=pool.obter("rotulos_cor", forma))
+        v = cv2.extractChannel(hsv, 2, dst=pool.obter("v", forma))
+        temp = pool.obter("temp", forma)
+        resultado = {}
+        for cor_id, c in self.classes.items():
+            mascara = cv2.LUT(rotulos, self._tabelas_bit[cor_id], dst=pool.obter(("mascara", cor_id), forma)) # Bit da cor -> 255
+            cv2.bitwise_and(mascara, cv2.compare(v, c.v_min, cv2.CMP_GE, dst=temp), dst=mascara)
+            resultado[cor_id] = mascara
+        return resultado
+
+    # --- Aprendizado ---
+    def aprender(self, frame, rect, cor_id):
+        """Atualiza a cor 'cor_id' com os pixels da peça confirmada (miolo do minAreaRect, em BGR)."""
+        c = self.classes.get(cor_id)
+        if c is None: return False
+        (cx, cy), (w, h), ang = rect
+        miolo = cv2.boxPoints(((cx, cy), (w * 0.6, h * 0.6), ang)).astype(np.int32) # Evita bordas e sombra
+        x0, y0 = np.maximum(miolo.min(axis=0), 0); x1, y1 = miolo.max(axis=0) + 1
+        roi = frame[y0:y1, x0:x1]
+        if roi.size == 0: return False
+        mascara = np.zeros(roi.shape[:2], np.uint8); cv2.fillConvexPoly(mascara, miolo - (x0, y0), 255)
+        pix = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)[mascara > 0].astype(np.float64)
+        dh = _dif_h(pix[:, 0], c.media_h); ds = pix[:, 1] - c.media_s
+        # Só pixels perto do modelo atual (folga de 1,5x) e com brilho plausível: fundo no miolo não ensina nada
+        util = (c.distancia(dh, ds) <= 1.5 * self.k_sigma) & (pix[:, 2] >= 0.7 * c.v_min)
+        if util.sum() < MIN_PIXELS: return False
+        dh = dh[util]; ds = ds[util]; v = pix[util, 2]
+        a = self.alfa
+        with self._lock:
+            c.media_h = (c.media_h + a * dh.mean()) % 180.0
+            c.media_s = c.media_s + a * ds.mean()
+            c.var = (1.0 - a) * c.var + a * np.array([dh.var(), ds.var()])
+            c.var = np.clip(c.var, FAIXA_SIGMA[0] ** 2 * c.var_semente, FAIXA_SIGMA[1] ** 2 * c.var_semente)
+            # O V mínimo só desce (luz mais fraca); acima da semente cortaria as sombras da própria peça
+            alvo_v = min(c.v_min_semente, max(20.0, float(np.percentile(v, 5)) - 20.0))
+            c.v_min = (1.0 - a) * c.v_min + a * alvo_v
+            c.confirmacoes += 1
+            if self._mudou(c): self._reconstruir(c)
+        return True
+
+    def _mudou(self, c):
+        antigo = self._estado_lut[c.cor_id]; novo = c.estado()
+        return (abs(_dif_h(novo[0], antigo[0])) > MUDANCA_MEDIA or abs(novo[1] - antigo[1]) > MUDANCA_MEDIA
+                or np.any(np.abs(novo[2:4] / antigo[2:4] - 1.0) > MUDANCA_SIGMA) or abs(novo[4] - antigo[4]) > MUDANCA_V)
+
+    def resumo(self):
+        """Texto curto por cor (média H/S, desvios, V mínimo, confirmações) para o console."""
+        linhas = []
+        for cor_id, c in self.classes.items():
+            sh, ss = np.sqrt(c.var)
+            linhas.append(f"cor {cor_id}: H={c.media_h:5.1f}±{sh:4.1f} S={c.media_s:5.1f}±{ss:4.1f} V>={c.v_min:5.1f} ({c.confirmacoes} confirmações)")
+        return "\n".join(linhas) + f"\nLUT reconstruída {self.reconstrucoes}x"
@@ -0,0 +1,206 @@
+"""
+Exibição desacoplada do processamento.
+
+O loop de visão não desenha mais sobre uma cópia do frame em 1080p: ele
+descreve o que deve ser desenhado (Quadro, em coordenadas do frame original)
+e entrega o frame ao Display. Só quando uma renderização está "vencida"
+(taxa limitada por FPS_MAX) o frame é reduzido para um buffer pré-alocado na
+resolução da janela, e uma thread própria desenha os itens com as coordenadas
+escaladas e chama imshow/waitKey.
+
+No modo headless nada é desenhado nem redimensionado: deve_renderizar()
+retorna sempre False e publicar() não faz nada.
+
+Obs.: todas as chamadas de janela (namedWindow, imshow, waitKey) acontecem na
+thread do Display. Cliques são enfileirados e o callback do mouse roda dentro
+de ler_tecla(), na thread do loop (como no waitKey original), sem disputar o
+estado do jogo com a lógica. Isso funciona em Windows e Linux; no
+macOS o HighGUI exige a thread principal, então use headless lá.
+"""
+import queue
+import signal
+import threading
+import time
+
+import numpy as np
+
+from comum import importar_sob_demanda
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- Padrões ---
+DISPLAY_WIDTH = 1280
+DISPLAY_HEIGHT = 720
+FPS_MAX = 15
+# ---------------
+
+
+class Quadro:
+    """Lista de itens a desenhar, em coordenadas do frame ORIGINAL."""
+    def __init__(self):
+        self.itens = []
+
+    def caixa(self, pontos, cor, espessura=2):
+        """Polígono fechado (ex.: cv2.boxPoints de um minAreaRect)."""
+        self.itens.append(("caixa", np.asarray(pontos, dtype=np.float32), cor, espessura))
+
+    def texto(self, texto, pos, escala, cor, espessura=2):
+        self.itens.append(("texto", texto, pos, escala, cor, espessura))
+
+    def circulo(self, centro, raio, cor, espessura=2):
+        self.itens.append(("circulo", centro, raio, cor, espessura))
+
+    def __len__(self):
+        return len(self.itens)
+
+
+def desenhar_itens(buffer, itens, sx, sy):
+    """Desenha os itens de um Quadro em 'buffer', escalando as coordenadas por (sx, sy)."""
+    s = min(sx, sy)
+    for item in itens:
+        tipo = item[0]
+        if tipo == "caixa":
+            _, pontos, cor, esp = item
+            pts = np.intp(pontos * (sx, sy))
+            cv2.polylines(buffer, [pts], True, cor, max(1, int(round(esp * s))))
+        elif tipo == "texto":
+            _, texto, (x, y), escala, cor, esp = item
+            cv2.putText(buffer, texto, (int(x * sx), int(y * sy)), cv2.FONT_HERSHEY_SIMPLEX, escala * s, cor, max(1, int(round(esp * s))))
+        elif tipo == "circulo":
+            _, (x, y), raio, cor, esp = item
+            cv2.circle(buffer, (int(x * sx), int(y * sy)), max(1, int(round(raio * s))), cor, esp if esp < 0 else max(1, int(round(esp * s))))
+
+
+class Display:
+    def __init__(self, nome_janela, largura=DISPLAY_WIDTH, altura=DISPLAY_HEIGHT, fps_max=FPS_MAX,
+                 headless=False, nome_janela_mascara=None):
+        self.nome_janela = nome_janela
+        self.nome_janela_mascara = nome_janela_mascara # None = sem janela de máscara
+        self.tamanho = (largura, altura)
+        self.periodo = 1.0 / fps_max if fps_max > 0 else 0.0
+        self.headless = headless
+
+        self._teclas = queue.Queue()
+        self._cliques = queue.Queue()
+        self._mouse_callback = None
+        self._proxima_renderizacao = 0.0
+        self._sair = False
+
+        # Buffers duplos na resolução da janela: o loop de visão escreve em um
+        # enquanto a thread desenha/exibe o outro.
+        self._buffers = [np.zeros((altura, largura, 3), np.uint8) for _ in range(2)]
+        self._buffers_mascara = [np.zeros((altura, largura), np.uint8) for _ in range(2)]
+        self._tem_mascara = [False, False]
+        self._itens = [[], []]
+        self._escala = [(1.0, 1.0), (1.0, 1.0)]
+        self._lock = threading.Lock()
+        self._pendente = None # Índice do buffer pronto para exibir
+        self._em_uso = None   # Índice do buffer que a thread está exibindo
+        self._novo = threading.Event()
+        self._rodando = False
+        self._thread = None
+
+        if headless:
+            # Sem janela não há ESC: Ctrl+C vira ESC em ler_tecla()
+            try: signal.signal(signal.SIGINT, self._sigint)
+            except ValueError: pass # Fora da thread principal
+        else:
+            self._rodando = True
+            self._thread = threading.Thread(target=self._loop, name="Display", daemon=True)
+            self._thread.start()
+
+    # --- Lado do loop de visão ---
+    @property
+    def mostra_mascara(self):
+        return not self.headless and self.nome_janela_mascara is not None
+
+    def deve_renderizar(self):
+        """True se o próximo publicar() será exibido. Use para pular a montagem do Quadro."""
+        if self.headless:
+            return False
+        return time.monotonic() >= self._proxima_renderizacao
+
+    def novo_quadro(self):
+        return Quadro()
+
+    def publicar(self, frame, quadro=None, mascara=None):
+        if not self.deve_renderizar():
+            return False
+        self._proxima_renderizacao = time.monotonic() + self.periodo
+
+        with self._lock:
+            idx = 1 if self._em_uso == 0 else 0
+            if self._pendente == idx: self._pendente = None # Vai ser sobrescrito
+        h, w = frame.shape[:2]
+        cv2.resize(frame, self.tamanho, dst=self._buffers[idx], interpolation=cv2.INTER_LINEAR)
+        self._tem_mascara[idx] = mascara is not None and self.mostra_mascara
+        if self._tem_mascara[idx]:
+            cv2.resize(mascara, self.tamanho, dst=self._buffers_mascara[idx], interpolation=cv2.INTER_NEAREST)
+        self._itens[idx] = quadro.itens if quadro is not None else []
+        self._escala[idx] = (self.tamanho[0] / w, self.tamanho[1] / h)
+        with self._lock:
+            self._pendente = idx
+        self._novo.set()
+        return True
+
+    def ler_tecla(self, espera=0.0):
+        """
+        Próxima tecla pressionada (código & 0xFF) ou -1. 'espera' em segundos, como o waitKey.
+        Antes, entrega os cliques pendentes ao callback do mouse (nesta thread).
+        """
+        while True:
+            try: evento = self._cliques.get_nowait()
+            except queue.Empty: break
+            if self._mouse_callback is not None: self._mouse_callback(*evento)
+        if self._sair:
+            return 27
+        if self.headless:
+            if espera > 0: time.sleep(espera)
+            return 27 if self._sair else -1
+        try:
+            return self._teclas.get(timeout=espera) if espera > 0 else self._teclas.get_nowait()
+        except queue.Empty:
+            return -1
+
+    def set_mouse_callback(self, callback):
+        """callback(event, x, y, flags, param) com (x, y) em coordenadas da JANELA."""
+        self._mouse_callback = callback
+
+    def fechar(self):
+        self._rodando = False
+        self._novo.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _sigint(self, signum, frame):
+        print("\nCtrl+C: encerrando...")
+        self._sair = True
+
+    # --- Thread de exibição ---
+    def _ao_clicar(self, event, x, y, flags, param):
+        if event != cv2.EVENT_MOUSEMOVE: # Movimento não é usado e lotaria a fila
+            self._cliques.put((event, x, y, flags, param))
+
+    def _loop(self):
+        cv2.namedWindow(self.nome_janela)
+        cv2.setMouseCallback(self.nome_janela, self._ao_clicar)
+        while self._rodando:
+            self._novo.wait(timeout=0.03)
+            self._novo.clear()
+            with self._lock:
+                idx = self._pendente
+                if idx is not None: self._em_uso = idx; self._pendente = None
+            if idx is not None:
+                buffer = self._buffers[idx]
+                sx, sy = self._escala[idx]
+                desenhar_itens(buffer, self._itens[idx], sx, sy)
+                cv2.imshow(self.nome_janela, buffer)
+                if self._tem_mascara[idx]:
+                    cv2.imshow(self.nome_janela_mascara, self._buffers_mascara[idx])
+                with self._lock:
+                    self._em_uso = None
+            key = cv2.waitKey(1) & 0xFF # Mantém a janela respondendo mesmo sem frame novo
+            if key != 255:
+                self._teclas.put(key)
+        cv2.destroyAllWindows()
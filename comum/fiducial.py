@@ -0,0 +1,183 @@
+"""
+Calibração rápida da homografia com um tabuleiro ChArUco e poucos toques do robô.
+
+Os calibradores de pulso levam o marcador a 9 posições e esperam 9 pulsos
+em R[5]. Aqui um frame do tabuleiro ChArUco deitado no plano de trabalho dá
+dezenas de cantos com posição conhecida no tabuleiro, e bastam 2 ou 3
+toques do robô em cantos destacados na tela (um pulso em R[5] em cada, com
+X/Y em R[6]/R[7], como nos calibradores) para levar o tabuleiro ao
+referencial do robô:
+  * 2 toques: similaridade (rotação, escala única e translação);
+  * 3 ou mais: afim (absorve impressão com escala diferente em X e Y).
+A escala da impressão não precisa ser exata: o ajuste aos toques a corrige.
+
+Cada canto detectado vira um par pixel -> mm no formato de sempre
+(pontos_calibracao.txt, comum.calibracao.salvar_pontos), então o jogo e o
+detector leem o resultado sem mudança. Os pixels são os da imagem bruta,
+como os do marcador; a correção da lente continua sendo feita ao carregar.
+
+Os blocos são vistos pelo topo, ALTURA_PECA_MM acima da mesa. Com a
+calibração da lente (lente_calibracao.npz) a pose da câmera sai do próprio
+tabuleiro (solvePnP) e os cantos são reprojetados nessa altura; sem ela os
+pares ficam no plano da mesa.
+
+Tabuleiro para imprimir (PNG, 10 px/mm):
+    python -m comum.fiducial [arquivo.png]
+
+Requer OpenCV 4.7+ (cv2.aruco.CharucoDetector).
+"""
+import sys
+
+import numpy as np
+
+from comum import importar_sob_demanda
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- Padrões ---
+COLUNAS = 7                 # Quadrados do tabuleiro (cabe em uma folha A4 deitada)
+LINHAS = 5
+QUADRADO_MM = 35.0
+MARCADOR_MM = 26.0
+DICIONARIO = "DICT_5X5_100"
+CANTOS_TOQUE = (0, 5, 18)   # IDs dos cantos ChArUco tocados pelo robô (7x5: 24 cantos internos; 0, 5, 18 = três extremos)
+ALTURA_PECA_MM = 0.0        # Topo das peças acima da mesa (só com a calibração da lente)
+MIN_CANTOS = 12             # Cantos detectados necessários para aceitar o frame
+NOME_ARQUIVO_TABULEIRO = "tabuleiro_charuco.png"
+PX_POR_MM_IMPRESSAO = 10
+# ---------------
+
+
+def criar_tabuleiro(colunas=COLUNAS, linhas=LINHAS, quadrado_mm=QUADRADO_MM, marcador_mm=MARCADOR_MM, dicionario=DICIONARIO):
+    """cv2.aruco.CharucoBoard ou None (OpenCV sem aruco)."""
+    if not hasattr(cv2, "aruco") or not hasattr(cv2.aruco, "CharucoDetector"):
+        print(f"[ERRO] OpenCV {cv2.__version__} sem cv2.aruco.CharucoDetector (requer 4.7+).")
+        return None
+    dic = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, dicionario))
+    return cv2.aruco.CharucoBoard((colunas, linhas), quadrado_mm, marcador_mm, dic)
+
+
+def pontos_tabuleiro(tabuleiro):
+    """Cantos ChArUco (N, 2) em mm no plano, com Y invertido: visto de cima, mesmo sentido do referencial do robô (Z para cima)."""
+    cantos = np.asarray(tabuleiro.getChessboardCorners(), dtype=np.float64)[:, :2].copy()
+    cantos[:, 1] *= -1.0
+    return cantos
+
+
+def detectar_cantos(frame, detector):
+    """(ids (N,), pixels (N, 2) float32) dos cantos ChArUco do frame, ou (None, None)."""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    cantos, ids, _, _ = detector.detectBoard(gray)
+    if ids is None or len(ids) == 0: return None, None
+    return ids.ravel(), cantos.reshape(-1, 2)
+
+
+def ajustar_tabuleiro_robo(pontos_tab, pontos_robo):
+    """
+    Matriz 2x3 tabuleiro (mm) -> robô (mm) a partir dos toques: similaridade com 2, afim com 3+.
+    Retorna (M, residuos_mm) ou (None, None).
+    """
+    origem = np.asarray(pontos_tab, dtype=np.float64).reshape(-1, 2)
+    destino = np.asarray(pontos_robo, dtype=np.float64).reshape(-1, 2)
+    if len(origem) < 2: return None, None
+    if len(origem) == 2:
+        M, _ = cv2.estimateAffinePartial2D(origem, destino, method=cv2.LMEDS)
+    else:
+        M, _ = cv2.estimateAffine2D(origem, destino, method=cv2.LMEDS)
+    if M is None: return None, None
+    residuos = np.linalg.norm(origem @ M[:, :2].T + M[:, 2] - destino, axis=1)
+    return M, residuos
+
+
+def pares_calibracao(ids, pixels, tabuleiro, M, corretor=None, altura_mm=ALTURA_PECA_MM):
+    """
+    Pares (p_camera, p_robot) [[x, y], ...] para salvar_pontos: um por canto detectado.
+    Com 'corretor' (comum.lente.CorretorLente) e altura_mm != 0, os pixels são reprojetados na altura das peças.
+    """
+    plano = pontos_tabuleiro(tabuleiro)[ids]
+    robo = plano @ M[:, :2].T + M[:, 2]
+    pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 2)
+    if corretor is not None and altura_mm:
+        objeto = np.asarray(tabuleiro.getChessboardCorners(), dtype=np.float64)[ids]
+        ok, rvec, tvec = cv2.solvePnP(objeto, pixels, corretor.K, corretor.dist)
+        if ok:
+            objeto[:, 2] = -altura_mm # Z do tabuleiro aponta para dentro da mesa
+            pixels = cv2.projectPoints(objeto, rvec, tvec, corretor.K, corretor.dist)[0].reshape(-1, 2)
+        else: print("[AVISO] solvePnP falhou; pares no plano da mesa.")
+    elif altura_mm:
+        print("[AVISO] ALTURA_PECA_MM sem calibração da lente: pares no plano da mesa.")
+    return pixels.tolist(), robo.tolist()
+
+
+def desenhar(frame, ids, pixels, cantos_toque=CANTOS_TOQUE, tocados=0):
+    """Cantos detectados em verde; cantos a tocar numerados (amarelo = próximo, cinza = já tocado)."""
+    if ids is None: return frame
+    for p in pixels: cv2.circle(frame, (int(p[0]), int(p[1])), 4, (0, 255, 0), -1)
+    posicao = dict(zip(ids.tolist(), pixels))
+    for n, canto in enumerate(cantos_toque):
+        if canto not in posicao: continue
+        x, y = (int(v) for v in posicao[canto])
+        cor = (128, 128, 128) if n < tocados else ((0, 255, 255) if n == tocados else (0, 165, 255))
+        cv2.circle(frame, (x, y), 14, cor, 3)
+        cv2.putText(frame, str(n + 1), (x + 16, y - 16), cv2.FONT_HERSHEY_SIMPLEX, 1.0, cor, 2)
+    return frame
+
+
+def calibrar_com_tabuleiro(cap, ler_registrador, reg_flag=5, reg_x=6, reg_y=7, cantos_toque=CANTOS_TOQUE,
+                           tabuleiro=None, corretor=None, altura_mm=ALTURA_PECA_MM):
+    """
+    Loop interativo: espera um pulso 0 -> 1 em R[reg_flag] por canto de cantos_toque (lendo X/Y),
+    guarda o frame com mais cantos detectados e devolve (p_camera, p_robot) ou ([], []) (ESC/falha).
+    ler_registrador(indice) -> (valor, ok), como SessaoRobo.read_register.
+    """
+    tabuleiro = tabuleiro or criar_tabuleiro()
+    if tabuleiro is None: return [], []
+    detector = cv2.aruco.CharucoDetector(tabuleiro)
+    toques = [] # [(x, y)] do robô, na ordem de cantos_toque
+    melhor = (None, None); ultimo_flag = 0
+    print(f"\n[AVISO] Deixe o tabuleiro ChArUco no plano de trabalho e inicie o programa de toques no robô.")
+    print(f"Toque os cantos numerados na tela ({len(cantos_toque)}), com um pulso em R[{reg_flag}] em cada.")
+    while len(toques) < len(cantos_toque) or melhor[0] is None or len(melhor[0]) < MIN_CANTOS:
+        ret, frame = cap.read()
+        if not ret: print("Erro na leitura da câmera."); return [], []
+        ids, pixels = detectar_cantos(frame, detector)
+        if ids is not None and (melhor[0] is None or len(ids) > len(melhor[0])): melhor = (ids, pixels) # Braço na frente = menos cantos
+        flag, ok = ler_registrador(reg_flag)
+        flag = flag if ok else 0
+        if flag == 1 and ultimo_flag == 0 and len(toques) < len(cantos_toque):
+            x, x_ok = ler_registrador(reg_x); y, y_ok = ler_registrador(reg_y)
+            if x_ok and y_ok:
+                toques.append((x, y)); print(f"--> TOQUE {len(toques)} (canto {cantos_toque[len(toques) - 1]}): robô ({x}, {y})")
+            else: print(f"ERRO: Pulso detectado, mas não foi possível ler R[{reg_x}] ou R[{reg_y}]. Toque ignorado.")
+        ultimo_flag = flag
+        desenhar(frame, ids, pixels, cantos_toque, len(toques))
+        n_cantos = 0 if melhor[0] is None else len(melhor[0])
+        status = (f"Toque {len(toques) + 1} de {len(cantos_toque)} em R[{reg_flag}]..." if len(toques) < len(cantos_toque)
+                  else f"Tire o braço da frente: {n_cantos} de {MIN_CANTOS} cantos...")
+        cv2.putText(frame, f"{status} (melhor frame: {n_cantos} cantos)", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        cv2.imshow("Calibração com Tabuleiro ChArUco", cv2.resize(frame, (1280, 720), interpolation=cv2.INTER_AREA))
+        if cv2.waitKey(1) & 0xFF == 27:
+            print("Calibração cancelada pelo usuário."); return [], []
+
+    M, residuos = ajustar_tabuleiro_robo(pontos_tabuleiro(tabuleiro)[list(cantos_toque)], toques)
+    if M is None: print("[ERRO] Toques degenerados (cantos repetidos ou alinhados?)."); return [], []
+    escalas = np.linalg.norm(M[:, :2], axis=0)
+    print(f"Tabuleiro -> robô: escala X={escalas[0]:.4f} Y={escalas[1]:.4f}, resíduo máx. dos toques {residuos.max():.2f} mm")
+    ids, pixels = melhor
+    p_camera, p_robot = pares_calibracao(ids, pixels, tabuleiro, M, corretor, altura_mm)
+    print(f"[SUCESSO] {len(p_camera)} pares pixel -> mm a partir do tabuleiro.")
+    return p_camera, p_robot
+
+
+def salvar_imagem_tabuleiro(filename=NOME_ARQUIVO_TABULEIRO, tabuleiro=None, px_por_mm=PX_POR_MM_IMPRESSAO):
+    tabuleiro = tabuleiro or criar_tabuleiro()
+    if tabuleiro is None: return False
+    largura = int(COLUNAS * QUADRADO_MM * px_por_mm); altura = int(LINHAS * QUADRADO_MM * px_por_mm)
+    imagem = tabuleiro.generateImage((largura, altura), marginSize=0)
+    if not cv2.imwrite(filename, imagem): print(f"[ERRO] Falha ao salvar '{filename}'."); return False
+    print(f"[SUCESSO] Tabuleiro {COLUNAS}x{LINHAS} ({COLUNAS * QUADRADO_MM:.0f} x {LINHAS * QUADRADO_MM:.0f} mm) salvo em '{filename}'. Imprima sem ajustar à página.")
+    return True
+
+
+if __name__ == "__main__":
+    salvar_imagem_tabuleiro(sys.argv[1] if len(sys.argv) > 1 else NOME_ARQUIVO_TABULEIRO)
@@ -0,0 +1,60 @@
+"""
+Fila de picks em um bloco de registradores numéricos.
+
+Em vez de um alvo por vez em R[1]/R[2]/R[8] (com uma volta completa
+R[5]=1 -> robô -> R[5]=0 -> nova detecção -> novo envio entre uma peça e
+outra), o Python escreve a lista ordenada inteira e o robô a percorre sem
+parar. Layout (padrões abaixo):
+
+    R[REG_CONTAGEM]          quantos alvos válidos há na fila (escrito pelo Python, por último)
+    R[REG_INDICE]            quantos o robô já consumiu (zerado pelo Python, incrementado pelo robô)
+    R[REG_BASE + 3*i + 0..2] alvo i (0 = primeiro): X, Y (mm) e cor
+
+Programa do robô (TP), com R[5]=1 ligado pelo Python:
+    LBL[1]
+    IF R[21] >= R[20], JMP LBL[9]       ; fila vazia
+    R[22] = 30 + 3 * R[21]              ; índice indireto do alvo
+    X = R[R[22]], Y = R[R[22]+1], COR = R[R[22]+2] ... pega e descarta ...
+    R[21] = R[21] + 1
+    JMP LBL[1]
+    LBL[9]
+    R[5] = 0                            ; fila esgotada: o Python confere e, se sobrou peça, manda outra
+
+A contagem é escrita depois dos alvos, então o robô nunca lê um alvo pela
+metade; acrescentar() com o robô trabalhando só estende a fila.
+"""
+
+# --- Padrões ---
+REG_CONTAGEM = 20
+REG_INDICE = 21
+REG_BASE = 30
+CAPACIDADE = 9 # Alvos (R[30..56]); as 9 casas do tabuleiro
+# ---------------
+
+
+class FilaPicks:
+    def __init__(self, escrever, reg_contagem=REG_CONTAGEM, reg_indice=REG_INDICE, reg_base=REG_BASE, capacidade=CAPACIDADE):
+        """escrever(registrador, valor, forcar=False) -> bool, como write_cip_explicit_register."""
+        self.escrever = escrever
+        self.reg_contagem = reg_contagem; self.reg_indice = reg_indice; self.reg_base = reg_base
+        self.capacidade = capacidade
+        self.alvos = [] # [(x, y, cor_id), ...] já escritos, na ordem da fila
+
+    @property
+    def livres(self):
+        return self.capacidade - len(self.alvos)
+
+    def reiniciar(self):
+        """Fila vazia (só com o robô parado: ele pode estar lendo o índice)."""
+        self.alvos = []
+        return self.escrever(self.reg_contagem, 0, forcar=True) and self.escrever(self.reg_indice, 0, forcar=True)
+
+    def acrescentar(self, alvos):
+        """Escreve os alvos depois dos que já estão na fila e só então a nova contagem. Retorna quantos entraram."""
+        novos = list(alvos)[:self.livres]
+        for i, (x, y, cor_id) in enumerate(novos, start=len(self.alvos)):
+            r = self.reg_base + 3 * i
+            if not (self.escrever(r, x) and self.escrever(r + 1, y) and self.escrever(r + 2, cor_id)): return 0
+        if novos and not self.escrever(self.reg_contagem, len(self.alvos) + len(novos), forcar=True): return 0
+        self.alvos.extend(novos)
+        return len(novos)
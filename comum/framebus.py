@@ -0,0 +1,289 @@
+"""
+Barramento de frames em memória compartilhada entre processos.
+
+Layout do bloco (multiprocessing.shared_memory):
+    cabeçalho int64: [seq_global, ultimo_slot, n_slots, altura, largura, canais]
+    int64  seq_slot[n_slots]  (-1 = slot sendo escrito)
+    float64 ts_slot[n_slots]  (time.time() da captura)
+    n_slots frames uint8 de altura x largura x canais
+
+Um único escritor (processo de captura) e vários leitores, sem locks:
+  * o escritor marca o slot seguinte ao último publicado com -1, escreve o
+    frame direto nele (cap.read(image=slot), sem cópia), grava a nova
+    sequência no slot e só então aponta ultimo_slot/seq_global para ele;
+  * o leitor pega ultimo_slot e a sequência dele, usa o frame no próprio
+    slot e confere com valido() se ele não foi reaproveitado no meio do
+    caminho (com N_SLOTS >= 3 o escritor leva 2 frames para voltar ao slot).
+
+PipelineProcessos monta o fluxo captura -> segmentação -> interface em
+processos separados e se apresenta ao script como um cv2.VideoCapture.
+"""
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from comum import importar_sob_demanda
+from comum.buffers import pool_da_thread
+from comum.captura import abrir_camera
+from comum.segmentacao import segmentar_blocos
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- Padrões ---
+LARGURA = 1920
+ALTURA = 1080
+N_SLOTS = 4
+TIMEOUT_LEITURA = 2.0 # s
+# ---------------
+
+_CAMPOS_CABECALHO = 6
+
+
+class FrameBus:
+    def __init__(self, nome=None, criar=False, n_slots=N_SLOTS, forma=(ALTURA, LARGURA, 3)):
+        if criar:
+            tamanho_frame = int(np.prod(forma))
+            tamanho = 8 * (_CAMPOS_CABECALHO + 2 * n_slots) + n_slots * tamanho_frame
+            self.shm = shared_memory.SharedMemory(name=nome, create=True, size=tamanho)
+            cab = np.ndarray((_CAMPOS_CABECALHO,), dtype=np.int64, buffer=self.shm.buf)
+            cab[:] = (0, -1, n_slots, forma[0], forma[1], forma[2])
+            del cab
+        else:
+            self.shm = shared_memory.SharedMemory(name=nome)
+        self._cab = np.ndarray((_CAMPOS_CABECALHO,), dtype=np.int64, buffer=self.shm.buf)
+        self.n_slots = int(self._cab[2])
+        self.forma = (int(self._cab[3]), int(self._cab[4]), int(self._cab[5]))
+        offset = 8 * _CAMPOS_CABECALHO
+        self._seq_slot = np.ndarray((self.n_slots,), dtype=np.int64, buffer=self.shm.buf, offset=offset)
+        offset += 8 * self.n_slots
+        self._ts_slot = np.ndarray((self.n_slots,), dtype=np.float64, buffer=self.shm.buf, offset=offset)
+        offset += 8 * self.n_slots
+        self._frames = np.ndarray((self.n_slots,) + self.forma, dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+        if criar:
+            self._seq_slot[:] = 0; self._ts_slot[:] = 0.0
+
+    @property
+    def nome(self):
+        return self.shm.name
+
+    @property
+    def seq_global(self):
+        return int(self._cab[0])
+
+    # --- Escritor ---
+    def slot_para_escrita(self):
+        """Reserva o slot seguinte ao último publicado. Retorna (indice, view do frame)."""
+        i = (int(self._cab[1]) + 1) % self.n_slots
+        self._seq_slot[i] = -1 # Leitores que ainda estiverem nele vão ver valido() == False
+        return i, self._frames[i]
+
+    def publicar_slot(self, i, ts=None):
+        seq = int(self._cab[0]) + 1
+        self._ts_slot[i] = time.time() if ts is None else ts
+        self._seq_slot[i] = seq
+        self._cab[1] = i
+        self._cab[0] = seq
+        return seq
+
+    def publicar(self, frame, ts=None):
+        """Para produtores que já têm o frame em outro buffer (faz uma cópia)."""
+        i, destino = self.slot_para_escrita()
+        np.copyto(destino, frame)
+        return self.publicar_slot(i, ts)
+
+    # --- Leitores ---
+    def ultimo(self):
+        """(seq, indice) do último frame publicado, ou (None, None) se ainda não há nenhum."""
+        for _ in range(3):
+            i = int(self._cab[1])
+            if i < 0: return None, None
+            seq = int(self._seq_slot[i])
+            if seq > 0: return seq, i
+        return None, None
+
+    def esperar_novo(self, ultimo_visto=0, timeout=TIMEOUT_LEITURA):
+        """Espera (polling de 1 ms) um frame com seq > ultimo_visto. Retorna (seq, indice) ou (None, None)."""
+        limite = time.monotonic() + timeout
+        while True:
+            if int(self._cab[0]) > ultimo_visto:
+                seq, i = self.ultimo()
+                if seq is not None and seq > ultimo_visto: return seq, i
+            if time.monotonic() >= limite: return None, None
+            time.sleep(0.001)
+
+    def frame(self, i):
+        """View (sem cópia) do frame no slot i. Confira valido() depois de usar."""
+        return self._frames[i]
+
+    def timestamp(self, i):
+        return float(self._ts_slot[i])
+
+    def valido(self, i, seq):
+        return int(self._seq_slot[i]) == seq
+
+    def slot_da_seq(self, seq):
+        for i in range(self.n_slots):
+            if int(self._seq_slot[i]) == seq: return i
+        return None
+
+    def copiar(self, i, seq, destino):
+        """Copia o slot para 'destino' e confirma que ele não foi sobrescrito durante a cópia."""
+        np.copyto(destino, self._frames[i])
+        return self.valido(i, seq)
+
+    def fechar(self, remover=False):
+        del self._cab, self._seq_slot, self._ts_slot, self._frames # Libera as views antes do close
+        self.shm.close()
+        if remover:
+            try: self.shm.unlink()
+            except FileNotFoundError: pass
+
+
+# =========================================================
+# --- PROCESSOS ---
+# =========================================================
+def _processo_captura(nome_bus, cam_index, arquivo_lente, parar, fila_eventos):
+    bus = FrameBus(nome_bus)
+    h, w = bus.forma[:2]
+    cap = abrir_camera(cam_index, w, h, prefixo="Captura: câmera")
+    if not cap.isOpened():
+        fila_eventos.put(("erro", f"Erro câmera {cam_index}.")); bus.fechar(); return
+    aw = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)); ah = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if (aw, ah) != (w, h): print(f"AVISO (captura): Câmera entregou {aw}x{ah}; frames serão redimensionados para {w}x{h}.")
+    corretor = None
+    if arquivo_lente:
+        from comum.lente import carregar_corretor
+        corretor = carregar_corretor(arquivo_lente)
+        if corretor is not None: corretor.preparar_mapas()
+    fila_eventos.put(("ok", None))
+
+    temp = None; falhas = 0
+    try:
+        while not parar.is_set():
+            i, destino = bus.slot_para_escrita()
+            if corretor is None and (aw, ah) == (w, h):
+                ret, img = cap.read(destino) # Escreve direto na memória compartilhada
+                if ret and img.ctypes.data != destino.ctypes.data: np.copyto(destino, img) # OpenCV realocou
+            else:
+                ret, temp = cap.read(temp)
+                if ret:
+                    if (aw, ah) != (w, h): temp = cv2.resize(temp, (w, h))
+                    if corretor is not None: corretor.corrigir_frame(temp, dst=destino)
+                    else: np.copyto(destino, temp)
+            if not ret:
+                falhas += 1
+                if falhas == 50: fila_eventos.put(("erro", "Câmera parou de entregar frames."))
+                time.sleep(0.01); continue
+            falhas = 0
+            bus.publicar_slot(i)
+    finally:
+        cap.release(); bus.fechar()
+
+
+def _processo_segmentacao(nome_bus, funcao, fila_resultados, parar, reivindicado, filtro=None):
+    bus = FrameBus(nome_bus)
+    visto = 0; pool = pool_da_thread() # Buffers da segmentação deste processo
+    try:
+        while not parar.is_set():
+            seq, i = bus.esperar_novo(visto, timeout=0.5)
+            if seq is None: continue
+            visto = seq
+            with reivindicado.get_lock(): # Com vários segmentadores, cada frame é processado por um só
+                if seq <= reivindicado.value: continue
+                reivindicado.value = seq
+            resultado = funcao(bus.frame(i)) if filtro is None else filtro.obter(bus.frame(i), funcao)
+            pool.fim_do_quadro()
+            if not bus.valido(i, seq): continue # Slot reaproveitado durante o processamento: descarta
+            try: fila_resultados.put_nowait((seq, resultado))
+            except queue.Full: pass # Interface atrasada: ela só usa o mais recente mesmo
+    finally:
+        bus.fechar()
+
+
+class PipelineProcessos:
+    """
+    Captura e segmentação em processos próprios; a interface (este processo)
+    recebe o frame já segmentado. Imita o cv2.VideoCapture:
+        cap = PipelineProcessos(cam_index); ret, frame = cap.read(); cap.ultimos_blocos
+    'ultimos_blocos' é a saída de 'funcao_segmentar' para o frame retornado.
+    Com 'filtro_mudanca' (comum.mudanca.FiltroMudanca) cada segmentador
+    reaproveita o próprio último resultado enquanto a cena não muda.
+    """
+    def __init__(self, cam_index, largura=LARGURA, altura=ALTURA, n_segmentadores=1,
+                 funcao_segmentar=segmentar_blocos, arquivo_lente=None, n_slots=N_SLOTS, filtro_mudanca=None):
+        self.bus = FrameBus(criar=True, n_slots=n_slots, forma=(altura, largura, 3))
+        self._parar = mp.Event()
+        self._eventos = mp.Queue()
+        self._resultados = mp.Queue(maxsize=8)
+        self._reivindicado = mp.Value('q', 0)
+        self._processos = [mp.Process(target=_processo_captura, name="captura", daemon=True,
+                                      args=(self.bus.nome, cam_index, arquivo_lente, self._parar, self._eventos))]
+        for n in range(n_segmentadores):
+            self._processos.append(mp.Process(target=_processo_segmentacao, name=f"segmentacao-{n}", daemon=True,
+                                              args=(self.bus.nome, funcao_segmentar, self._resultados, self._parar, self._reivindicado, filtro_mudanca)))
+        for p in self._processos: p.start()
+        self._frame = np.empty(self.bus.forma, np.uint8) # Cópia da interface (o slot pode ser reaproveitado)
+        self._aberto = None
+        self.ultimos_blocos = None; self.ultima_seq = 0
+        self.lidos = 0; self.fora_de_sincronia = 0; self._t0 = time.monotonic()
+
+    # --- Interface compatível com cv2.VideoCapture ---
+    def isOpened(self):
+        if self._aberto is None:
+            try:
+                tipo, msg = self._eventos.get(timeout=10.0)
+                self._aberto = tipo == "ok"
+                if not self._aberto: print(msg)
+            except queue.Empty:
+                print("Erro: processo de captura não respondeu."); self._aberto = False
+        return self._aberto
+
+    def set(self, prop, valor):
+        return False # Resolução fixada na criação do barramento
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH: return float(self.bus.forma[1])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT: return float(self.bus.forma[0])
+        return 0.0
+
+    def read(self, timeout=TIMEOUT_LEITURA):
+        self._verificar_eventos()
+        resultado = None
+        try: # Espera o próximo frame segmentado e descarta os atrasados
+            resultado = self._resultados.get(timeout=timeout)
+            while True: resultado = max(resultado, self._resultados.get_nowait(), key=lambda r: r[0])
+        except queue.Empty:
+            pass
+        if resultado is None or resultado[0] <= self.ultima_seq:
+            return False, None
+        seq, blocos = resultado
+        i = self.bus.slot_da_seq(seq)
+        if i is None or not self.bus.copiar(i, seq, self._frame):
+            # O frame segmentado já foi sobrescrito: usa o mais novo (detecções de um frame antes)
+            seq_atual, i = self.bus.ultimo()
+            if i is None or not self.bus.copiar(i, seq_atual, self._frame): return False, None
+            self.fora_de_sincronia += 1
+        self.ultimos_blocos = blocos; self.ultima_seq = seq; self.lidos += 1
+        return True, self._frame
+
+    def release(self):
+        dt = time.monotonic() - self._t0
+        if dt > 0 and self.lidos:
+            print(f"Pipeline: captura {self.bus.seq_global / dt:.1f} fps, interface {self.lidos / dt:.1f} fps, "
+                  f"{self.fora_de_sincronia} frames fora de sincronia.")
+        self._parar.set()
+        for p in self._processos:
+            p.join(timeout=2.0)
+            if p.is_alive(): p.terminate()
+        self.bus.fechar(remover=True)
+
+    def _verificar_eventos(self):
+        try:
+            while True:
+                tipo, msg = self._eventos.get_nowait()
+                if tipo == "erro": print(msg)
+        except queue.Empty:
+            pass
@@ -0,0 +1,162 @@
+"""
+Gravação de sessões de jogo (velha/gameplaysupremo.py) para inspeção e replay.
+
+Arquivo .grv (só acrescenta):
+    b"GRV1" seguido de registros  <d t><B tipo><I tamanho><payload>
+        tipo 0 = evento, payload JSON {"tipo": ..., ...}
+        tipo 1 = quadro-chave, payload JPEG
+Índice .grv.idx (só acrescenta): um <Q offset><d t><B tipo> por registro, para
+achar quadros e instantes sem varrer o arquivo. Se faltar ou estiver
+incompleto (queda no meio da gravação), LeitorSessao o reconstrói.
+
+evento() e quadro_chave() só enfileiram; codificação JPEG e disco ficam numa
+thread própria, então gravar não atrasa o loop ao vivo.
+"""
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+from comum import importar_sob_demanda
+
+cv2 = importar_sob_demanda("cv2")
+
+MAGICO = b"GRV1"
+_REGISTRO = struct.Struct("<dBI")
+_INDICE = struct.Struct("<QdB")
+TIPO_EVENTO = 0
+TIPO_QUADRO = 1
+
+# --- Padrões ---
+FPS_QUADROS = 1.0      # Quadros-chave por segundo (0 = sem imagens)
+ESCALA_QUADROS = 0.5   # Reduz os quadros antes do JPEG
+QUALIDADE_JPEG = 80
+# ---------------
+
+
+class GravadorSessao:
+    def __init__(self, arquivo, fps_quadros=FPS_QUADROS, escala_quadros=ESCALA_QUADROS, qualidade_jpeg=QUALIDADE_JPEG):
+        self.arquivo = arquivo
+        self.intervalo_quadros = 1.0 / fps_quadros if fps_quadros > 0 else None
+        self.escala_quadros = escala_quadros; self.qualidade_jpeg = qualidade_jpeg
+        self._proximo_quadro = 0.0
+        self._fila = queue.Queue(maxsize=5000)
+        self.descartados = 0
+        pasta = os.path.dirname(arquivo)
+        if pasta: os.makedirs(pasta, exist_ok=True)
+        self._f = open(arquivo, "ab"); self._fi = open(arquivo + ".idx", "ab")
+        if self._f.tell() == 0: self._f.write(MAGICO)
+        self._thread = threading.Thread(target=self._gravador, name="Gravador", daemon=True)
+        self._thread.start()
+
+    def evento(self, tipo, **dados):
+        dados["tipo"] = tipo
+        self._enfileirar((time.time(), TIPO_EVENTO, dados))
+
+    def quadro_chave(self, frame):
+        """Guarda o frame se já passou o intervalo de quadros-chave (a cópia é necessária: o buffer é reaproveitado)."""
+        if self.intervalo_quadros is None or frame is None: return
+        agora = time.monotonic()
+        if agora < self._proximo_quadro: return
+        self._proximo_quadro = agora + self.intervalo_quadros
+        self._enfileirar((time.time(), TIPO_QUADRO, frame.copy()))
+
+    def _enfileirar(self, item):
+        try: self._fila.put_nowait(item)
+        except queue.Full: self.descartados += 1
+
+    def _payload(self, tipo, dados):
+        if tipo == TIPO_EVENTO:
+            return json.dumps(dados, separators=(",", ":")).encode("utf-8")
+        if self.escala_quadros != 1.0:
+            dados = cv2.resize(dados, None, fx=self.escala_quadros, fy=self.escala_quadros, interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", dados, [cv2.IMWRITE_JPEG_QUALITY, self.qualidade_jpeg])
+        return jpeg.tobytes() if ok else None
+
+    def _gravador(self):
+        fim = False
+        while not fim:
+            lote = [self._fila.get()]
+            while True: # Grava de uma vez o que já chegou
+                try: lote.append(self._fila.get_nowait())
+                except queue.Empty: break
+            for item in lote:
+                if item is None: fim = True; break
+                t, tipo, dados = item
+                payload = self._payload(tipo, dados)
+                if payload is None: continue
+                offset = self._f.tell()
+                self._f.write(_REGISTRO.pack(t, tipo, len(payload))); self._f.write(payload)
+                self._fi.write(_INDICE.pack(offset, t, tipo))
+            self._f.flush(); self._fi.flush()
+
+    def fechar(self):
+        if self._thread is None: return
+        self._fila.put(None); self._thread.join(timeout=5.0); self._thread = None
+        self._f.close(); self._fi.close()
+        if self.descartados: print(f"[AVISO] Gravação: {self.descartados} registros descartados (disco lento).")
+
+
+class LeitorSessao:
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        with open(arquivo, "rb") as f: self._dados = f.read()
+        if self._dados[:len(MAGICO)] != MAGICO: raise ValueError(f"'{arquivo}' não é uma gravação de sessão.")
+        self.indice = self._carregar_indice()
+
+    def _carregar_indice(self):
+        """[(offset, t, tipo)]; o que faltar no .idx (queda antes do flush) é completado varrendo o .grv."""
+        indice = []
+        try:
+            with open(self.arquivo + ".idx", "rb") as f: bruto = f.read()
+            indice = [_INDICE.unpack_from(bruto, i) for i in range(0, len(bruto) - _INDICE.size + 1, _INDICE.size)]
+        except FileNotFoundError:
+            pass
+        while indice and not self._registro_valido(indice[-1][0]): indice.pop() # .idx à frente do .grv
+        if indice:
+            offset = indice[-1][0]
+            offset += _REGISTRO.size + _REGISTRO.unpack_from(self._dados, offset)[2]
+        else:
+            offset = len(MAGICO)
+        while self._registro_valido(offset): # Registros gravados no .grv depois do último indexado
+            t, tipo, n = _REGISTRO.unpack_from(self._dados, offset)
+            indice.append((offset, t, tipo)); offset += _REGISTRO.size + n
+        return indice
+
+    def _registro_valido(self, offset):
+        if offset + _REGISTRO.size > len(self._dados): return False
+        _, _, n = _REGISTRO.unpack_from(self._dados, offset)
+        return offset + _REGISTRO.size + n <= len(self._dados)
+
+    def _ler(self, offset):
+        t, tipo, n = _REGISTRO.unpack_from(self._dados, offset)
+        payload = self._dados[offset + _REGISTRO.size: offset + _REGISTRO.size + n]
+        return t, tipo, payload
+
+    def eventos(self):
+        """Gera (t, dict) dos eventos, em ordem de gravação."""
+        for offset, _, tipo in self.indice:
+            if tipo == TIPO_EVENTO:
+                t, _, payload = self._ler(offset)
+                yield t, json.loads(payload.decode("utf-8"))
+
+    def quadros(self):
+        """Gera (t, imagem BGR) dos quadros-chave."""
+        for offset, _, tipo in self.indice:
+            if tipo == TIPO_QUADRO:
+                t, _, payload = self._ler(offset)
+                yield t, cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+
+    def quadro_em(self, t):
+        """Último quadro-chave gravado até o instante t (ou None)."""
+        escolhido = None
+        for offset, ti, tipo in self.indice:
+            if ti > t: break
+            if tipo == TIPO_QUADRO: escolhido = offset
+        if escolhido is None: return None
+        _, _, payload = self._ler(escolhido)
+        return cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
@@ -0,0 +1,194 @@
+"""
+Correção de distorção da lente (intrínsecos da câmera).
+
+A homografia de 9 pontos é um mapeamento plano e não absorve a distorção
+radial (barril) das bordas da imagem. Este módulo guarda a matriz da câmera
+e os coeficientes de distorção obtidos com um tabuleiro de xadrez e oferece
+duas formas de correção:
+
+  * corrigir_pontos(): corrige apenas os centróides detectados (barato,
+    indicado para o loop principal);
+  * corrigir_frame(): remapeia o frame inteiro usando tabelas
+    cv2.initUndistortRectifyMap pré-calculadas e salvas em disco.
+
+As duas formas usam a mesma matriz de projeção, então um ponto corrigido
+individualmente cai no mesmo pixel do frame remapeado.
+"""
+import glob
+import os
+
+import numpy as np
+
+from comum import importar_sob_demanda
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- NOMES DOS ARQUIVOS ---
+NOME_ARQUIVO_LENTE = "lente_calibracao.npz"  # K, dist e resolução da calibração
+NOME_ARQUIVO_MAPAS = "lente_mapas.npz"       # Cache das tabelas de remapeamento
+# --------------------------
+
+# --- Tabuleiro de xadrez padrão (cantos INTERNOS) ---
+PADRAO_XADREZ = (9, 6)
+TAMANHO_QUADRADO_MM = 25.0
+# ----------------------------------------------------
+
+
+# =========================================================
+# --- CALIBRAÇÃO DOS INTRÍNSECOS ---
+# =========================================================
+def encontrar_cantos_xadrez(imagem, padrao=PADRAO_XADREZ):
+    """Retorna os cantos internos (refinados em subpixel) ou None."""
+    gray = imagem if imagem.ndim == 2 else cv2.cvtColor(imagem, cv2.COLOR_BGR2GRAY)
+    flags = cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE
+    ok, cantos = cv2.findChessboardCorners(gray, padrao, flags)
+    if not ok:
+        return None
+    criterio = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+    return cv2.cornerSubPix(gray, cantos, (11, 11), (-1, -1), criterio)
+
+
+def calibrar_intrinsecos(arquivos_imagem, padrao=PADRAO_XADREZ, tamanho_quadrado_mm=TAMANHO_QUADRADO_MM):
+    """
+    Calibra a câmera a partir de imagens do tabuleiro de xadrez.
+    Retorna (K, dist, (largura, altura), erro_rms) ou None em caso de erro.
+    """
+    # Coordenadas 3D dos cantos no plano do tabuleiro (Z = 0)
+    objp = np.zeros((padrao[0] * padrao[1], 3), np.float32)
+    objp[:, :2] = np.mgrid[0:padrao[0], 0:padrao[1]].T.reshape(-1, 2) * tamanho_quadrado_mm
+
+    pontos_obj = []
+    pontos_img = []
+    tamanho = None
+
+    for arquivo in arquivos_imagem:
+        imagem = cv2.imread(arquivo)
+        if imagem is None:
+            print(f"Aviso: Não foi possível ler '{arquivo}'.")
+            continue
+        h, w = imagem.shape[:2]
+        if tamanho is None:
+            tamanho = (w, h)
+        elif tamanho != (w, h):
+            print(f"Aviso: '{arquivo}' tem resolução {w}x{h} (esperado {tamanho[0]}x{tamanho[1]}). Ignorada.")
+            continue
+        cantos = encontrar_cantos_xadrez(imagem, padrao)
+        if cantos is None:
+            print(f"Aviso: Tabuleiro não encontrado em '{arquivo}'.")
+            continue
+        pontos_obj.append(objp)
+        pontos_img.append(cantos)
+
+    if len(pontos_img) < 3:
+        print(f"ERRO: Apenas {len(pontos_img)} imagens válidas. São necessárias pelo menos 3 (recomendado 15+).")
+        return None
+
+    print(f"Calibrando com {len(pontos_img)} imagens válidas...")
+    erro_rms, K, dist, _, _ = cv2.calibrateCamera(pontos_obj, pontos_img, tamanho, None, None)
+    return K, dist, tamanho, erro_rms
+
+
+def listar_imagens(pasta):
+    """Lista as imagens (.png/.jpg/.bmp) de uma pasta, em ordem alfabética."""
+    arquivos = []
+    for ext in ("*.png", "*.jpg", "*.jpeg", "*.bmp"):
+        arquivos.extend(glob.glob(os.path.join(pasta, ext)))
+    return sorted(arquivos)
+
+
+def salvar_calibracao_lente(filename, K, dist, tamanho, erro_rms):
+    try:
+        np.savez(filename, K=K, dist=dist, tamanho=np.array(tamanho, dtype=np.int32), erro_rms=erro_rms)
+        print(f"[SUCESSO] Calibração da lente salva em '{filename}'.")
+        return True
+    except Exception as e:
+        print(f"[ERRO] Falha ao salvar '{filename}': {e}")
+        return False
+
+
+# =========================================================
+# --- CORREÇÃO ---
+# =========================================================
+class CorretorLente:
+    def __init__(self, K, dist, tamanho, arquivo_mapas=NOME_ARQUIVO_MAPAS):
+        self.K = np.asarray(K, dtype=np.float64)
+        self.dist = np.asarray(dist, dtype=np.float64)
+        self.tamanho = (int(tamanho[0]), int(tamanho[1]))
+        self.arquivo_mapas = arquivo_mapas
+        self.map1 = None; self.map2 = None  # Criados sob demanda (só o modo 'frame' precisa)
+        self._avisou_tamanho = False
+
+    # --- Pontos (caminho rápido) ---
+    def corrigir_pontos(self, pontos):
+        """Recebe N pontos (x, y) em pixels distorcidos e retorna um array (N, 2) float32 corrigido."""
+        pts = np.asarray(pontos, dtype=np.float32).reshape(-1, 1, 2)
+        if pts.shape[0] == 0:
+            return pts.reshape(-1, 2)
+        # P=K mantém o resultado em pixels (mesma projeção usada por corrigir_frame)
+        corrigidos = cv2.undistortPoints(pts, self.K, self.dist, P=self.K)
+        return corrigidos.reshape(-1, 2)
+
+    def corrigir_ponto(self, x_pixel, y_pixel):
+        pt = self.corrigir_pontos([(x_pixel, y_pixel)])
+        return float(pt[0][0]), float(pt[0][1])
+
+    # --- Frame inteiro (remap) ---
+    def _assinatura(self):
+        return np.concatenate([self.K.ravel(), self.dist.ravel(), np.array(self.tamanho, dtype=np.float64)])
+
+    def _carregar_mapas_do_cache(self):
+        try:
+            dados = np.load(self.arquivo_mapas)
+            if not np.allclose(dados["assinatura"], self._assinatura()):
+                print(f"Aviso: '{self.arquivo_mapas}' é de outra calibração. Recalculando mapas.")
+                return False
+            self.map1 = dados["map1"]; self.map2 = dados["map2"]
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Aviso: Falha ao ler '{self.arquivo_mapas}': {e}. Recalculando mapas.")
+            return False
+
+    def preparar_mapas(self, salvar=True):
+        """Carrega as tabelas de remapeamento do cache ou as calcula (e salva)."""
+        if self.map1 is not None:
+            return True
+        if self._carregar_mapas_do_cache():
+            print(f"[SUCESSO] Mapas de correção carregados de '{self.arquivo_mapas}'.")
+            return True
+        # CV_16SC2 é o formato mais rápido para cv2.remap
+        self.map1, self.map2 = cv2.initUndistortRectifyMap(self.K, self.dist, None, self.K, self.tamanho, cv2.CV_16SC2)
+        if salvar:
+            try:
+                np.savez(self.arquivo_mapas, map1=self.map1, map2=self.map2, assinatura=self._assinatura())
+                print(f"Mapas de correção salvos em '{self.arquivo_mapas}'.")
+            except Exception as e:
+                print(f"Aviso: Falha ao salvar '{self.arquivo_mapas}': {e}")
+        return True
+
+    def corrigir_frame(self, frame, dst=None):
+        """Remapeia o frame inteiro. 'dst' pode ser um buffer pré-alocado do mesmo tamanho."""
+        h, w = frame.shape[:2]
+        if (w, h) != self.tamanho:
+            if not self._avisou_tamanho: # Uma vez só: isto roda a cada frame no loop de visão
+                print(f"Aviso: Frame {w}x{h} diferente da calibração da lente {self.tamanho[0]}x{self.tamanho[1]}. Sem correção.")
+                self._avisou_tamanho = True
+            return frame
+        self.preparar_mapas()
+        return cv2.remap(frame, self.map1, self.map2, cv2.INTER_LINEAR, dst=dst)
+
+
+def carregar_corretor(filename=NOME_ARQUIVO_LENTE, arquivo_mapas=NOME_ARQUIVO_MAPAS):
+    """Carrega a calibração da lente. Retorna CorretorLente ou None (arquivo ausente ou inválido)."""
+    try:
+        dados = np.load(filename)
+        corretor = CorretorLente(dados["K"], dados["dist"], tuple(dados["tamanho"]), arquivo_mapas)
+    except FileNotFoundError:
+        print(f"[AVISO] '{filename}' não encontrado. Seguindo sem correção de lente.")
+        return None
+    except Exception as e:
+        print(f"[ERRO] Falha ao ler '{filename}': {e}. Seguindo sem correção de lente.")
+        return None
+    print(f"[SUCESSO] Correção de lente carregada de '{filename}' ({corretor.tamanho[0]}x{corretor.tamanho[1]}).")
+    return corretor
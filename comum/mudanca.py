@@ -0,0 +1,77 @@
+"""
+Filtro de mudança: só refaz a segmentação quando a cena mudou.
+
+Na maior parte do tempo o tabuleiro (ou a bandeja) não muda de um frame para
+o outro, por exemplo enquanto o jogo espera o clique do humano. O filtro
+reduz o ROI a uma grade de médias por bloco (um resize INTER_AREA para
+1/TAMANHO_BLOCO, ~60x34 valores em 1080p) e compara com a assinatura do
+frame da última detecção completa. A detecção só roda de novo quando algum
+bloco muda mais que LIMIAR em algum canal (uma peça posta ou retirada
+cobre blocos inteiros; o ruído do sensor some na média) ou quando passa
+INTERVALO_REFRESCO desde a última; no resto, devolve o resultado guardado.
+
+    filtro = FiltroMudanca(roi)
+    blocos = filtro.obter(frame, segmentar)          # segmentar(frame) só roda se preciso
+    blocos = filtro.obter(frame, segmentar, forcar=True) # Quando o resultado vai virar comando
+"""
+import time
+
+import numpy as np
+
+from comum import importar_sob_demanda
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- Padrões ---
+TAMANHO_BLOCO = 32        # Lado do bloco em pixels do frame
+LIMIAR = 12               # Diferença da média de um bloco (0..255) que conta como mudança
+INTERVALO_REFRESCO = 1.0  # s: detecção completa mesmo sem mudança (luz, modelo de cor adaptativo)
+# ---------------
+
+
+class FiltroMudanca:
+    def __init__(self, roi=None, tamanho_bloco=TAMANHO_BLOCO, limiar=LIMIAR, intervalo_refresco=INTERVALO_REFRESCO):
+        self.tamanho_bloco = tamanho_bloco; self.limiar = limiar; self.intervalo_refresco = intervalo_refresco
+        self.roi = roi; self._roi_novo = None # Como no PortaoOclusao: aplicado na próxima chamada
+        self._assinatura = None; self._instante = 0.0
+        self.resultado = None # Vale enquanto houver assinatura
+        self.calculados = 0; self.reaproveitados = 0 # Para o HUD
+
+    def definir_roi(self, roi):
+        """(x, y, largura, altura) em pixels do frame, ou None para o frame inteiro. Força nova detecção."""
+        self._roi_novo = (roi,)
+
+    def invalidar(self):
+        """A próxima chamada de obter() refaz a detecção."""
+        self._assinatura = None
+
+    @property
+    def fracao_reaproveitada(self):
+        total = self.calculados + self.reaproveitados
+        return self.reaproveitados / total if total else 0.0
+
+    def _assinar(self, frame):
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            frame = frame[max(0, y):y + h, max(0, x):x + w]
+        h, w = frame.shape[:2]
+        tamanho = (max(1, w // self.tamanho_bloco), max(1, h // self.tamanho_bloco))
+        return cv2.resize(frame, tamanho, interpolation=cv2.INTER_AREA)
+
+    def mudou(self, assinatura):
+        if self._assinatura is None or self._assinatura.shape != assinatura.shape: return True
+        return int(np.max(cv2.absdiff(assinatura, self._assinatura))) > self.limiar
+
+    def obter(self, frame, calcular, forcar=False):
+        """calcular(frame) se a cena mudou, o refresco venceu ou forcar=True; senão o último resultado."""
+        if self._roi_novo is not None:
+            (self.roi,) = self._roi_novo; self._roi_novo = None; self._assinatura = None
+        assinatura = self._assinar(frame)
+        agora = time.monotonic()
+        if forcar or agora - self._instante >= self.intervalo_refresco or self.mudou(assinatura):
+            self.resultado = calcular(frame)
+            self._assinatura = assinatura; self._instante = agora
+            self.calculados += 1
+        else:
+            self.reaproveitados += 1
+        return self.resultado
@@ -0,0 +1,97 @@
+"""
+Portão de oclusão: só libera comandos ao robô com a cena parada e desobstruída.
+
+Compara a região de interesse (o tabuleiro) em tons de cinza e resolução
+reduzida (ESCALA) com o frame anterior (movimento) e com um modelo de fundo
+em média móvel (oclusão: mão, braço, objeto sobre a mesa). A cena fica
+ESTAVEL depois de FRAMES_ESTAVEIS frames seguidos sem movimento e sem
+oclusão; enquanto isso o fundo é atualizado devagar (ALFA_FUNDO), o que
+absorve as peças novas. Uma diferença grande e parada por FRAMES_ABSORVER
+frames (tabuleiro deslocado, luz acesa) vira o novo fundo.
+
+Custo: um resize + cvtColor + blur + dois absdiff em ~1/16 dos pixels do ROI.
+
+    portao = PortaoOclusao()
+    portao.atualizar(frame)       # Uma vez por frame, no loop de vídeo
+    if portao.estavel: ...        # Libera o comando
+"""
+import numpy as np
+
+from comum import importar_sob_demanda
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- Padrões ---
+ESCALA = 0.25            # Resolução da comparação (1080p -> 480x270)
+LIMIAR = 25              # Diferença de cinza (0..255) que conta como mudança
+FRACAO_MOVIMENTO = 0.01  # Fração do ROI mudando entre frames = movimento
+FRACAO_OCLUSAO = 0.10    # Fração do ROI diferente do fundo = oclusão (uma peça nova ocupa bem menos)
+FRAMES_ESTAVEIS = 5      # Frames seguidos parados para liberar
+FRAMES_ABSORVER = 90     # Diferença parada por tanto tempo vira fundo (~3 s a 30 fps)
+ALFA_FUNDO = 0.05
+# ---------------
+
+ESTAVEL = "ESTAVEL"
+MOVIMENTO = "MOVIMENTO"
+OCLUIDO = "OCLUIDO"
+
+
+class PortaoOclusao:
+    def __init__(self, roi=None, escala=ESCALA, limiar=LIMIAR, fracao_movimento=FRACAO_MOVIMENTO,
+                 fracao_oclusao=FRACAO_OCLUSAO, frames_estaveis=FRAMES_ESTAVEIS, frames_absorver=FRAMES_ABSORVER,
+                 alfa_fundo=ALFA_FUNDO):
+        self.escala = escala; self.limiar = limiar
+        self.fracao_movimento = fracao_movimento; self.fracao_oclusao = fracao_oclusao
+        self.frames_estaveis = frames_estaveis; self.frames_absorver = frames_absorver
+        self.alfa_fundo = alfa_fundo
+        self.roi = roi; self._roi_novo = None # definir_roi() pode vir de outra thread: aplicado no próximo atualizar()
+        self._anterior = None; self._fundo = None
+        self._parados = 0 # Frames seguidos sem movimento
+        self.estado = MOVIMENTO
+        self.movimento = 0.0; self.oclusao = 0.0 # Frações do último frame (para o HUD)
+
+    @property
+    def estavel(self):
+        return self.estado == ESTAVEL
+
+    def definir_roi(self, roi):
+        """(x, y, largura, altura) em pixels do frame, ou None para o frame inteiro. Recomeça o fundo."""
+        self._roi_novo = (roi,)
+
+    def _reduzir(self, frame):
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            frame = frame[max(0, y):y + h, max(0, x):x + w]
+        pequeno = cv2.resize(frame, None, fx=self.escala, fy=self.escala, interpolation=cv2.INTER_AREA)
+        cinza = cv2.cvtColor(pequeno, cv2.COLOR_BGR2GRAY) if pequeno.ndim == 3 else pequeno
+        return cv2.GaussianBlur(cinza, (5, 5), 0)
+
+    def _fracao(self, a, b):
+        _, mudou = cv2.threshold(cv2.absdiff(a, b), self.limiar, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mudou) / float(mudou.size)
+
+    def atualizar(self, frame):
+        """Processa um frame e retorna o estado (ESTAVEL, MOVIMENTO ou OCLUIDO)."""
+        if self._roi_novo is not None:
+            (self.roi,) = self._roi_novo; self._roi_novo = None
+            self._anterior = None; self._fundo = None
+        atual = self._reduzir(frame)
+        if self._anterior is None or self._anterior.shape != atual.shape:
+            self._anterior = atual; self._fundo = atual.astype(np.float32); self._parados = 0
+            self.estado = MOVIMENTO; return self.estado
+
+        self.movimento = self._fracao(atual, self._anterior)
+        self.oclusao = self._fracao(atual, cv2.convertScaleAbs(self._fundo))
+        self._anterior = atual
+        self._parados = 0 if self.movimento > self.fracao_movimento else self._parados + 1
+
+        if self._parados >= self.frames_absorver: # Mudança permanente: vira fundo de uma vez
+            self._fundo = atual.astype(np.float32); self.oclusao = 0.0
+        if self.oclusao > self.fracao_oclusao:
+            self.estado = OCLUIDO
+        elif self._parados < self.frames_estaveis:
+            self.estado = MOVIMENTO
+        else:
+            self.estado = ESTAVEL
+            cv2.accumulateWeighted(atual, self._fundo, self.alfa_fundo) # Absorve peças novas devagar
+        return self.estado
@@ -0,0 +1,182 @@
+"""
+Perfil de cor das peças (faixas HSV por cor), gerado por detecta/pega/calibradorcor.py.
+
+O operador marca amostras das peças (e, se quiser, do fundo) em um frame;
+ajustar_faixas() encaixa as faixas HSV de cada cor nos pixels marcados e
+avaliar_faixas() mede a separação: quanto da peça a faixa cobre e quanto
+do fundo ela aceita por engano. O resultado vai para um JSON versionado
+que gameplaysupremo.py, detectauto.py e os calibradores carregam na
+partida; sem o arquivo eles seguem com as faixas de comum.segmentacao.
+
+Formato (VERSAO_PERFIL_COR = 1):
+    {"versao": 1, "criado": "AAAA-MM-DD HH:MM:SS", "resolucao": [w, h], "area_minima": px²,
+     "classes": {"1": {"nome": "Azul", "faixas": [[[h, s, v], [h, s, v]], ...], "cobertura": 0.98, "fundo": 0.001}, ...}}
+Uma cor pode ter mais de uma faixa (o vermelho cruza H = 0/180).
+"""
+import json
+import time
+
+import numpy as np
+
+from comum.segmentacao import FAIXAS_HSV, AREA_MINIMA, mascara_faixas
+
+# --- NOME DO ARQUIVO ---
+NOME_ARQUIVO_PERFIL_COR = "perfil_cor.json"
+VERSAO_PERFIL_COR = 1
+# -----------------------
+
+# --- Ajuste das faixas ---
+PERCENTIL = 1.0      # Corta 1% dos pixels de cada lado (bordas, reflexos)
+FOLGA_H = 3          # Folga acrescentada às faixas (H em unidades OpenCV, 0..179)
+FOLGA_SV = 20
+S_MIN_AMOSTRA = 40   # Pixels quase cinza da amostra são fundo, não peça
+JANELA_H = 12        # Só entram os pixels a até 12 de H do pico do histograma (o resto da marcação é fundo)
+V_MIN_AMOSTRA = 40
+FRACAO_AREA_MINIMA = 0.25 # area_minima = 25% da menor peça marcada
+# -------------------------
+
+NOMES_CORES = {1: "Azul", 2: "Vermelho"}
+
+
+class PerfilCor:
+    def __init__(self, faixas, area_minima=AREA_MINIMA, resolucao=None, metricas=None, criado=None):
+        self.faixas = faixas # cor_id -> [(inferior, superior), ...], como FAIXAS_HSV
+        self.area_minima = area_minima
+        self.resolucao = resolucao
+        self.metricas = metricas or {} # cor_id -> {"cobertura": ..., "fundo": ...}
+        self.criado = criado
+
+    def para_json(self):
+        classes = {}
+        for cor_id, lims in self.faixas.items():
+            classes[str(cor_id)] = dict(nome=NOMES_CORES.get(cor_id, str(cor_id)),
+                                        faixas=[[np.asarray(inf).tolist(), np.asarray(sup).tolist()] for inf, sup in lims],
+                                        **self.metricas.get(cor_id, {}))
+        return {"versao": VERSAO_PERFIL_COR, "criado": self.criado or time.strftime("%Y-%m-%d %H:%M:%S"),
+                "resolucao": list(self.resolucao) if self.resolucao else None, "area_minima": self.area_minima,
+                "classes": classes}
+
+
+# =========================================================
+# --- AJUSTE ---
+# =========================================================
+def _media_circular_h(h):
+    ang = h.astype(np.float64) * (2.0 * np.pi / 180.0)
+    return (np.degrees(np.arctan2(np.sin(ang).mean(), np.cos(ang).mean())) / 2.0) % 180.0
+
+
+def _coloridos(pix):
+    pix = np.asarray(pix).reshape(-1, 3)
+    return pix[(pix[:, 1] >= S_MIN_AMOSTRA) & (pix[:, 2] >= V_MIN_AMOSTRA)]
+
+
+def _pico_h(pix):
+    hist = np.bincount(pix[:, 0].astype(np.int64) % 180, minlength=180).astype(np.float64)
+    hist = np.convolve(np.concatenate([hist[-2:], hist, hist[:2]]), np.ones(5), "valid") # Suavizado, circular
+    return int(np.argmax(hist))
+
+
+def _perto_do_pico(pix, pico):
+    return pix[np.abs((pix[:, 0].astype(np.float64) - pico + 90.0) % 180.0 - 90.0) <= JANELA_H]
+
+
+def amostra_da_marcacao(hsv_roi):
+    """
+    Pixels (N x 3) da peça dentro de uma marcação retangular (HSV, altura x largura x 3).
+    A cor da peça é o pico de H na metade CENTRAL da marcação, então um arraste folgado
+    (com fundo nas bordas) não puxa a faixa para a cor do fundo.
+    """
+    h, w = hsv_roi.shape[:2]
+    centro = _coloridos(hsv_roi[h // 4: h - h // 4, w // 4: w - w // 4])
+    todos = _coloridos(hsv_roi)
+    if len(centro) == 0: return todos[:0]
+    return _perto_do_pico(todos, _pico_h(centro))
+
+
+def pixels_dominantes(pixels_hsv):
+    """Pixels (N x 3) da cor dominante: coloridos e perto do pico do histograma circular de H."""
+    pix = _coloridos(pixels_hsv)
+    return _perto_do_pico(pix, _pico_h(pix)) if len(pix) else pix
+
+
+def ajustar_faixas(pixels_hsv, percentil=PERCENTIL, folga_h=FOLGA_H, folga_sv=FOLGA_SV):
+    """
+    Faixas [(inferior, superior), ...] que cobrem os pixels HSV (N x 3) de uma cor.
+    Usa a cor dominante dos pixels (a marcação pode pegar um pouco de fundo).
+    H é tratado como circular: se a faixa cruza 0/180 ela é dividida em duas.
+    Retorna None se não há pixels coloridos suficientes.
+    """
+    pix = pixels_dominantes(pixels_hsv)
+    if len(pix) < 50: return None
+    centro = _media_circular_h(pix[:, 0])
+    dh = (pix[:, 0].astype(np.float64) - centro + 90.0) % 180.0 - 90.0
+    h_inf = int(np.floor(centro + np.percentile(dh, percentil))) - folga_h
+    h_sup = int(np.ceil(centro + np.percentile(dh, 100 - percentil))) + folga_h
+    s_inf = max(0, int(np.percentile(pix[:, 1], percentil)) - folga_sv)
+    v_inf = max(0, int(np.percentile(pix[:, 2], percentil)) - folga_sv)
+    # Peças mais saturadas/claras que as amostras continuam sendo da mesma cor: S e V vão até 255
+    if h_sup - h_inf >= 179: return [(np.array([0, s_inf, v_inf]), np.array([179, 255, 255]))]
+    if h_inf < 0:
+        return [(np.array([0, s_inf, v_inf]), np.array([h_sup, 255, 255])), (np.array([h_inf + 180, s_inf, v_inf]), np.array([179, 255, 255]))]
+    if h_sup > 179:
+        return [(np.array([h_inf, s_inf, v_inf]), np.array([179, 255, 255])), (np.array([0, s_inf, v_inf]), np.array([h_sup - 180, 255, 255]))]
+    return [(np.array([h_inf, s_inf, v_inf]), np.array([h_sup, 255, 255]))]
+
+
+def avaliar_faixas(lims, pixels_cor, pixels_fundo):
+    """
+    {"cobertura": fração dos pixels da cor dominante aceitos, "fundo": fração do fundo aceita por engano}.
+    pixels_*: arrays HSV N x 3 (pixels_fundo pode ser None).
+    """
+    def aceitos(pix):
+        if pix is None or len(pix) == 0: return None
+        return float(np.count_nonzero(mascara_faixas(np.asarray(pix, np.uint8).reshape(-1, 1, 3), lims))) / len(pix)
+    return {k: None if v is None else round(v, 5) for k, v in (("cobertura", aceitos(pixels_dominantes(pixels_cor))), ("fundo", aceitos(pixels_fundo)))}
+
+
+def sugerir_area_minima(areas_pecas, fracao=FRACAO_AREA_MINIMA):
+    """Área mínima de contorno a partir das áreas (px²) das peças marcadas."""
+    return int(max(AREA_MINIMA / 4, fracao * min(areas_pecas))) if areas_pecas else AREA_MINIMA
+
+
+# =========================================================
+# --- ARQUIVO ---
+# =========================================================
+def salvar_perfil_cor(filename, perfil):
+    try:
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(perfil.para_json(), f, indent=2, ensure_ascii=False)
+        print(f"[SUCESSO] Perfil de cor salvo em '{filename}'.")
+        return True
+    except Exception as e:
+        print(f"[ERRO] Falha ao salvar '{filename}': {e}")
+        return False
+
+
+def carregar_perfil_cor(filename=NOME_ARQUIVO_PERFIL_COR):
+    """Carrega o perfil de cor. Retorna PerfilCor ou None (arquivo ausente ou inválido: use FAIXAS_HSV)."""
+    try:
+        with open(filename, "r", encoding="utf-8") as f: dados = json.load(f)
+        if dados.get("versao") != VERSAO_PERFIL_COR:
+            print(f"[ERRO] '{filename}' é da versão {dados.get('versao')} (esperada {VERSAO_PERFIL_COR}). Usando as faixas padrão.")
+            return None
+        faixas = {int(cor_id): [(np.array(inf), np.array(sup)) for inf, sup in c["faixas"]] for cor_id, c in dados["classes"].items()}
+        metricas = {int(cor_id): {k: c[k] for k in ("cobertura", "fundo") if k in c} for cor_id, c in dados["classes"].items()}
+        perfil = PerfilCor(faixas, dados.get("area_minima", AREA_MINIMA), dados.get("resolucao"), metricas, dados.get("criado"))
+    except FileNotFoundError:
+        print(f"[AVISO] '{filename}' não encontrado. Usando as faixas de cor padrão.")
+        return None
+    except Exception as e:
+        print(f"[ERRO] Falha ao ler '{filename}': {e}. Usando as faixas de cor padrão.")
+        return None
+    print(f"[SUCESSO] Perfil de cor carregado de '{filename}' ({len(faixas)} cores, criado em {perfil.criado}).")
+    return perfil
+
+
+def faixas_do_perfil(filename=NOME_ARQUIVO_PERFIL_COR):
+    """(faixas, area_minima) do perfil, ou as de comum.segmentacao se não houver perfil."""
+    perfil = carregar_perfil_cor(filename)
+    if perfil is None: return FAIXAS_HSV, AREA_MINIMA
+    faltando = [NOMES_CORES.get(cor_id, cor_id) for cor_id in FAIXAS_HSV if cor_id not in perfil.faixas]
+    if faltando: print(f"[AVISO] Perfil sem a(s) cor(es) {', '.join(map(str, faltando))}: usando as faixas padrão para elas.")
+    return {**FAIXAS_HSV, **perfil.faixas}, perfil.area_minima
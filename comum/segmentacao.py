@@ -0,0 +1,167 @@
+"""
+Segmentação das peças por cor (HSV), compartilhada pelos scripts.
+
+As máscaras de todas as cores são unidas em uma imagem de frente (com uma
+imagem de classes ao lado); a abertura e a rotulação rodam uma vez e cada
+componente fica com a cor da maioria dos seus pixels.
+
+Os blobs saem de cv2.connectedComponentsWithStats: área,
+caixa e preenchimento são filtrados de uma vez em NumPy e só os
+sobreviventes ganham contorno e minAreaRect. O custo é o de rotular a
+máscara, quase fixo; com findContours + contourArea ele crescia com o
+número de pontinhos de ruído (um laço Python por contorno).
+
+Devolve os blocos em PIXELS (minAreaRect por peça); homografia, ângulo do
+robô e desenho continuam em cada script. Por ser uma função de módulo sem
+estado, pode rodar em outro processo (comum.framebus). Com 'modelo'
+(comum.cores.ModeloCorAdaptativo) as máscaras vêm do modelo aprendido em vez
+das faixas fixas; o modelo vive no processo que o treina, então o modo
+processos continua nas faixas fixas.
+
+HSV, máscaras e morfologia escrevem em buffers do pool da thread
+(comum.buffers): em regime, nenhuma imagem do tamanho do frame é alocada. A
+máscara devolvida com retornar_mascara=True é um desses buffers e vale até a
+próxima chamada na mesma thread.
+"""
+import numpy as np
+
+from comum import importar_sob_demanda
+from comum.buffers import pool_da_thread
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- Faixas de Cor (mesmos valores dos scripts) ---
+limite_inferior_azul = np.array([80, 120, 70])
+limite_superior_azul = np.array([150, 255, 255])
+limite_inferior_vermelho1 = np.array([0, 100, 100])
+limite_superior_vermelho1 = np.array([10, 255, 255])
+limite_inferior_vermelho2 = np.array([170, 100, 100])
+limite_superior_vermelho2 = np.array([180, 255, 255])
+
+# cor_id -> lista de faixas (inferior, superior); as faixas de um mesmo id são unidas
+FAIXAS_HSV = {
+    1: [(limite_inferior_azul, limite_superior_azul)],                                                     # Azul
+    2: [(limite_inferior_vermelho1, limite_superior_vermelho1), (limite_inferior_vermelho2, limite_superior_vermelho2)], # Vermelho
+}
+AREA_MINIMA = 100 # px²
+LADO_MINIMO = 4            # px: descarta riscos finos (reflexos, fita) antes do contorno
+PREENCHIMENTO_MINIMO = 0.25 # área / caixa alinhada; uma peça girada 45° ainda tem 0,5
+NUCLEO_ABERTURA = np.ones((5, 5), np.uint8) # Abertura 5x5 = erode(3x3) x2 + dilate(3x3) x2 de antes, em uma chamada
+FRACAO_MISTA = 0.2          # 2ª cor acima disso da área do componente: peças encostadas, separa por cor
+# -----------------------------------------------------------
+
+
+def mascara_faixas(hsv, lims, dst=None, temp=None):
+    """União das faixas [(inferior, superior), ...] de uma cor. Com dst e temp (uint8 do tamanho do frame) não aloca."""
+    mascara = cv2.inRange(hsv, lims[0][0], lims[0][1], dst=dst)
+    for inferior, superior in lims[1:]:
+        cv2.bitwise_or(mascara, cv2.inRange(hsv, inferior, superior, dst=temp), dst=mascara)
+    return mascara
+
+
+def _mascaras_faixas(hsv, faixas, pool):
+    forma = hsv.shape[:2]
+    for cor_id, lims in faixas.items():
+        yield cor_id, mascara_faixas(hsv, lims, pool.obter(("mascara", cor_id), forma), pool.obter("temp", forma))
+
+
+def _componentes(mascara, area_minima, area_maxima, lado_minimo, preenchimento_minimo):
+    """Rotula a máscara e filtra os componentes. Retorna (bx, by, rotulos, stats, indices) ou None."""
+    bx, by, bw, bh = cv2.boundingRect(mascara) # Rotula só a região com pixels (barato, e a máscara costuma ser quase vazia)
+    if bw == 0: return None
+    n, rotulos, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(mascara[by:by + bh, bx:bx + bw], 8, cv2.CV_32S, cv2.CCL_BBDT)
+    if n <= 1: return None
+    x, y, w, h, area = (stats[1:, i] for i in range(5)) # Rótulo 0 é o fundo
+    ok = (area > area_minima) & (np.minimum(w, h) >= lado_minimo) & (area >= preenchimento_minimo * w * h)
+    if area_maxima is not None: ok &= area <= area_maxima
+    return bx, by, rotulos, stats[1:], np.flatnonzero(ok)
+
+
+def _contorno(recorte, offset):
+    contornos, _ = cv2.findContours(recorte, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+    return contornos
+
+
+def extrair_blobs(mascara, area_minima=AREA_MINIMA, area_maxima=None, lado_minimo=LADO_MINIMO,
+                  preenchimento_minimo=PREENCHIMENTO_MINIMO):
+    """
+    Blobs de uma máscara binária: lista [(contorno, area_px), ...] dos componentes
+    conectados com área > area_minima (e <= area_maxima), caixa com lados
+    >= lado_minimo e preenchimento >= preenchimento_minimo.
+    """
+    comps = _componentes(mascara, area_minima, area_maxima, lado_minimo, preenchimento_minimo)
+    if comps is None: return []
+    bx, by, rotulos, stats, indices = comps
+    blobs = []
+    for i in indices:
+        x0, y0, w, h, area = (int(v) for v in stats[i])
+        recorte = (rotulos[y0:y0 + h, x0:x0 + w] == i + 1).view(np.uint8) # Só este componente, na caixa dele
+        blobs.append((max(_contorno(recorte, (bx + x0, by + y0)), key=len), area))
+    return blobs
+
+
+def extrair_blobs_classes(mascara, classes, n_classes, area_minima=AREA_MINIMA, area_maxima=None, lado_minimo=LADO_MINIMO,
+                          preenchimento_minimo=PREENCHIMENTO_MINIMO, fracao_mista=FRACAO_MISTA):
+    """
+    Como extrair_blobs, para a máscara de TODAS as cores: 'classes' (uint8, do
+    tamanho da máscara) tem o índice 1..n_classes da cor de cada pixel.
+    Retorna [(contorno, area_px, classe), ...]. Cada componente fica com a cor
+    da maioria dos seus pixels (contados só na caixa dele). Um componente em
+    que a segunda cor passa de area_minima e de fracao_mista da área são
+    peças de cores diferentes encostadas: ele é separado por cor (cada parte
+    com a sua abertura, só na caixa do componente).
+    """
+    comps = _componentes(mascara, area_minima, area_maxima, lado_minimo, preenchimento_minimo)
+    if comps is None: return []
+    bx, by, rotulos, stats, indices = comps
+    blobs = []
+    for i in indices:
+        x0, y0, w, h, area = (int(v) for v in stats[i])
+        recorte = rotulos[y0:y0 + h, x0:x0 + w] == i + 1
+        cls_recorte = classes[by + y0:by + y0 + h, bx + x0:bx + x0 + w]
+        offset = (bx + x0, by + y0)
+        votos = np.bincount(cls_recorte[recorte], minlength=n_classes + 1)[1:]
+        ordem = np.argsort(votos)[::-1]
+        segunda = votos[ordem[1]] if n_classes > 1 else 0
+        if segunda <= max(area_minima, fracao_mista * area):
+            blobs.append((max(_contorno(recorte.view(np.uint8), offset), key=len), area, int(ordem[0]) + 1))
+            continue
+        for c in ordem:
+            if votos[c] <= area_minima: break
+            parte = cv2.morphologyEx((recorte & (cls_recorte == c + 1)).view(np.uint8), cv2.MORPH_OPEN, NUCLEO_ABERTURA) # Tira as franjas da outra peça
+            for contorno in _contorno(parte, offset):
+                area_c = cv2.contourArea(contorno)
+                if area_c > area_minima: blobs.append((contorno, int(area_c), int(c) + 1))
+    return blobs
+
+
+def segmentar_blocos(frame, faixas=FAIXAS_HSV, area_minima=AREA_MINIMA, retornar_mascara=False, modelo=None, pool=None):
+    """
+    Retorna a lista [{'cor_id': id, 'rect': ((x, y), (w, h), angulo)}, ...].
+    Com retornar_mascara=True retorna (blocos, mascara_total) para exibição.
+    Com modelo (ModeloCorAdaptativo) as faixas são ignoradas.
+    pool: comum.buffers.PoolBuffers (padrão: o da thread).
+
+    As máscaras das cores viram uma só imagem de frente e uma de classes; a
+    abertura (NUCLEO_ABERTURA) e a rotulação rodam uma vez para todas as
+    cores, então o custo delas não cresce com o número de cores.
+    """
+    pool = pool or pool_da_thread()
+    forma = frame.shape[:2]
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=pool.obter("hsv", frame.shape))
+    mascaras = modelo.mascaras(hsv, pool).items() if modelo is not None else _mascaras_faixas(hsv, faixas, pool)
+    frente = pool.obter("frente", forma); classes = pool.obter("classes", forma); marcado = pool.obter("marcado", forma, np.bool_)
+    cor_ids = []
+    for cor_id, mascara in mascaras:
+        cor_ids.append(cor_id)
+        if len(cor_ids) == 1: np.copyto(frente, mascara); classes.fill(0)
+        else: cv2.bitwise_or(frente, mascara, dst=frente)
+        np.greater(mascara, 0, out=marcado); np.copyto(classes, len(cor_ids), where=marcado)
+    if not cor_ids:
+        return ([], None) if retornar_mascara else []
+    aberta = cv2.morphologyEx(frente, cv2.MORPH_OPEN, NUCLEO_ABERTURA, dst=pool.obter("aberta", forma))
+    blocos = [{'cor_id': cor_ids[classe - 1], 'rect': cv2.minAreaRect(contorno)}
+              for contorno, _, classe in extrair_blobs_classes(aberta, classes, len(cor_ids), area_minima)]
+    if retornar_mascara:
+        return blocos, aberta
+    return blocos
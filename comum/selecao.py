@@ -0,0 +1,157 @@
+"""
+Estratégias de escolha do próximo bloco a pegar (detectauto.py).
+
+Cada seletor recebe a lista de blocos do frame (dicts com 'x_pixel',
+'x_robo', 'y_robo', 'angulo', 'cor_id', 'rect') e a posição atual do robô
+em mm (ou None) e devolve o bloco escolhido, sem efeitos colaterais:
+escolher() pode ser chamado só para o HUD. Depois de um envio bem-sucedido
+o script chama confirmar(bloco), que é onde o modo em lote avança.
+
+    seletor = criar_seletor("proximo")
+    alvo = seletor.escolher(blocos, posicao_robo)
+    ... envia ...
+    seletor.confirmar(alvo)
+"""
+import math
+
+
+def _dist(ax, ay, bx, by):
+    return math.hypot(ax - bx, ay - by)
+
+
+def ordem_vizinho_proximo(itens, xy, primeiro=None):
+    """Itens na ordem do vizinho mais próximo (xy(item) -> (x, y) em mm), começando por 'primeiro' (ou o primeiro da lista)."""
+    restantes = list(itens)
+    if not restantes: return []
+    atual = restantes[0] if primeiro is None else primeiro
+    ordem = []
+    while True:
+        restantes.remove(atual); ordem.append(atual)
+        if not restantes: return ordem
+        ax, ay = xy(atual)
+        atual = min(restantes, key=lambda i: _dist(*xy(i), ax, ay))
+
+
+class SeletorDireita:
+    """Bloco mais à direita na imagem (maior x_pixel). Comportamento original."""
+    nome = "direita"
+
+    def escolher(self, blocos, posicao_robo=None):
+        return max(blocos, key=lambda b: b['x_pixel']) if blocos else None
+
+    def confirmar(self, bloco):
+        pass
+
+
+class SeletorProximo(SeletorDireita):
+    """Bloco mais próximo da posição atual do robô (sem posição: mais à direita)."""
+    nome = "proximo"
+
+    def escolher(self, blocos, posicao_robo=None):
+        if not blocos: return None
+        if posicao_robo is None: return super().escolher(blocos)
+        rx, ry = posicao_robo
+        return min(blocos, key=lambda b: _dist(b['x_robo'], b['y_robo'], rx, ry))
+
+
+class SeletorMenosOcluido(SeletorDireita):
+    """
+    Bloco com mais folga até o vizinho mais próximo (em pixels, descontando
+    o raio de cada um). Evita pegar peças encostadas em outras.
+    """
+    nome = "menos_ocluido"
+
+    @staticmethod
+    def _raio(bloco):
+        (_, _), (w, h), _ = bloco['rect']
+        return 0.5 * math.hypot(w, h)
+
+    def folga(self, bloco, blocos):
+        (x, y), _, _ = bloco['rect']; r = self._raio(bloco)
+        folga = math.inf
+        for outro in blocos:
+            if outro is bloco: continue
+            (ox, oy), _, _ = outro['rect']
+            folga = min(folga, _dist(x, y, ox, oy) - r - self._raio(outro))
+        return folga
+
+    def escolher(self, blocos, posicao_robo=None):
+        if not blocos: return None
+        return max(blocos, key=lambda b: (self.folga(b, blocos), b['x_pixel']))
+
+
+class SeletorPrioridadeCor(SeletorProximo):
+    """Primeiro a cor de maior prioridade; entre as da mesma cor, a mais próxima do robô."""
+    nome = "prioridade_cor"
+
+    def __init__(self, prioridade_cores=(1, 2)):
+        self.prioridade_cores = tuple(prioridade_cores)
+
+    def escolher(self, blocos, posicao_robo=None):
+        for cor_id in self.prioridade_cores:
+            da_cor = [b for b in blocos if b['cor_id'] == cor_id]
+            if da_cor: return super().escolher(da_cor, posicao_robo)
+        return super().escolher(blocos, posicao_robo) # Cores fora da lista vão por último
+
+
+class SeletorLote(SeletorDireita):
+    """
+    Planeja de uma vez a ordem de TODOS os blocos visíveis (vizinho mais
+    próximo a partir do robô, em mm) e segue o plano sem reordenar a cada
+    frame. Cada item do plano é procurado no frame atual (tolerância em mm)
+    para enviar a coordenada mais recente; itens que não aparecem no frame
+    (braço na frente, detecção perdida) são pulados, mas continuam no plano.
+    Só confirmar() tira itens do plano. Quando nada do plano está visível,
+    escolher() propõe o início de um plano novo, adotado no confirmar().
+    """
+    nome = "lote"
+
+    def __init__(self, tolerancia_mm=15.0):
+        self.tolerancia_mm = tolerancia_mm
+        self.plano = [] # [(x_robo, y_robo, cor_id), ...]
+        self._proposta = [] # Plano novo da última escolha fora do plano (itens do plano sumiram de vez)
+
+    def _planejar(self, blocos, posicao_robo):
+        if posicao_robo is None: # Sem posição: começa pelo mais à direita
+            primeiro = max(blocos, key=lambda b: b['x_pixel'])
+        else:
+            primeiro = min(blocos, key=lambda b: _dist(b['x_robo'], b['y_robo'], *posicao_robo))
+        ordem = ordem_vizinho_proximo(blocos, lambda b: (b['x_robo'], b['y_robo']), primeiro)
+        return [(b['x_robo'], b['y_robo'], b['cor_id']) for b in ordem]
+
+    def _localizar(self, item, blocos):
+        x, y, cor_id = item
+        candidatos = [b for b in blocos if b['cor_id'] == cor_id and _dist(b['x_robo'], b['y_robo'], x, y) <= self.tolerancia_mm]
+        return min(candidatos, key=lambda b: _dist(b['x_robo'], b['y_robo'], x, y)) if candidatos else None
+
+    def escolher(self, blocos, posicao_robo=None):
+        if not blocos: return None
+        for item in self.plano: # O primeiro item visível neste frame; os ocultos esperam a vez
+            bloco = self._localizar(item, blocos)
+            if bloco is not None: return bloco
+        self._proposta = self._planejar(blocos, posicao_robo)
+        return self._localizar(self._proposta[0], blocos)
+
+    def confirmar(self, bloco):
+        for i, item in enumerate(self.plano):
+            if self._localizar(item, [bloco]) is not None:
+                del self.plano[i]; return
+        if self._proposta and self._localizar(self._proposta[0], [bloco]) is not None:
+            self.plano = self._proposta[1:] # Adota o plano novo; o que restava do antigo não aparece mais
+        self._proposta = []
+
+
+ESTRATEGIAS = {
+    SeletorDireita.nome: SeletorDireita,
+    SeletorProximo.nome: SeletorProximo,
+    SeletorMenosOcluido.nome: SeletorMenosOcluido,
+    SeletorPrioridadeCor.nome: SeletorPrioridadeCor,
+    SeletorLote.nome: SeletorLote,
+}
+
+
+def criar_seletor(nome, **opcoes):
+    if nome not in ESTRATEGIAS:
+        print(f"[AVISO] Estratégia '{nome}' desconhecida (use {list(ESTRATEGIAS)}). Usando 'direita'.")
+        return SeletorDireita()
+    return ESTRATEGIAS[nome](**opcoes)
@@ -0,0 +1,383 @@
+"""
+Supervisor de várias células (câmera + robô) em um único PC.
+
+Cada célula roda em um processo próprio, com a mesma lógica dos scripts
+(FanucTicTacToeAndClean de velha/gameplaysupremo.py ou FanucCIP de
+detecta/pega/detectauto.py), o seu IP, o seu índice de câmera e a sua pasta
+de calibração (pontos_calibracao.txt, grid_calibracao.txt, lente_*.npz...).
+O processo da célula faz chdir para essa pasta antes de criar a célula,
+então cada uma carrega a sua própria calibração (comum.calibracao).
+
+Dentro da célula o Display é substituído por DisplayCelula:
+  * o preview (já com os desenhos) vai para um bloco de memória compartilhada;
+  * status/resultados (fps, conexão, tabuleiro, alvo...) vão por uma fila;
+  * teclas e cliques do supervisor chegam por outra fila.
+
+Uso:
+    python -m comum.supervisor celulas.json [headless]
+
+Formato de celulas.json (caminhos relativos ao próprio arquivo):
+    [{"nome": "velha1", "tipo": "velha", "ip": "192.168.1.100", "camera": 1, "calibracao": "velha"},
+     {"nome": "pega1",  "tipo": "pega",  "ip": "192.168.1.101", "camera": 2, "calibracao": "detecta/pega"}]
+"""
+import importlib.util
+import json
+import math
+import multiprocessing as mp
+import os
+import queue
+import signal
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from comum import importar_sob_demanda
+from comum.display import Quadro, desenhar_itens, DISPLAY_WIDTH, DISPLAY_HEIGHT
+
+cv2 = importar_sob_demanda("cv2")
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# --- Tipos de célula: script e classe reutilizados ---
+TIPOS = {
+    "velha": ("velha/gameplaysupremo.py", "FanucTicTacToeAndClean"),
+    "pega": ("detecta/pega/detectauto.py", "FanucCIP"),
+}
+
+# --- Configurações ---
+PREVIEW_WIDTH = 640
+PREVIEW_HEIGHT = 360
+FPS_PREVIEW = 10
+PERIODO_STATUS = 1.0     # s entre status enviados por cada célula
+TIMEOUT_SAUDE = 5.0      # s sem status = célula SEM RESPOSTA
+PERIODO_RELATORIO = 5.0  # s entre relatórios no console
+REINICIO_MAX_ESPERA = 60.0
+# Atributos da célula copiados para o status (os que existirem)
+ATRIBUTOS_ESTADO = ("connected", "robot_is_busy", "cleanup_mode", "game_over", "winner", "game_board",
+                    "last_X", "last_Y", "last_Angle", "last_Color_ID")
+# ---------------------
+
+
+# =========================================================
+# --- FRAME EM MEMÓRIA COMPARTILHADA (1 slot) ---
+# =========================================================
+class FrameCompartilhado:
+    """
+    Um frame BGR em memória compartilhada com contador de sequência (seqlock):
+    ímpar = escrita em andamento, par = frame consistente.
+    """
+    def __init__(self, nome, largura, altura, criar=False):
+        self.forma = (altura, largura, 3)
+        tamanho = 8 + altura * largura * 3
+        self.shm = shared_memory.SharedMemory(name=nome, create=criar, size=tamanho if criar else 0)
+        self.seq = np.ndarray((1,), dtype=np.uint64, buffer=self.shm.buf, offset=0)
+        self.imagem = np.ndarray(self.forma, dtype=np.uint8, buffer=self.shm.buf, offset=8)
+        if criar:
+            self.seq[0] = 0; self.imagem[:] = 0
+
+    @property
+    def nome(self):
+        return self.shm.name
+
+    def iniciar_escrita(self):
+        self.seq[0] += 1
+
+    def terminar_escrita(self):
+        self.seq[0] += 1
+
+    def copiar_para(self, destino):
+        """Copia o frame para 'destino'. Retorna a sequência ou None se não conseguiu um frame consistente."""
+        for _ in range(3):
+            s1 = int(self.seq[0])
+            if s1 % 2: time.sleep(0.001); continue
+            np.copyto(destino, self.imagem)
+            if int(self.seq[0]) == s1: return s1
+        return None
+
+    def fechar(self, remover=False):
+        del self.seq, self.imagem # Libera as views antes de fechar o mapeamento
+        self.shm.close()
+        if remover:
+            try: self.shm.unlink()
+            except FileNotFoundError: pass
+
+
+# =========================================================
+# --- LADO DA CÉLULA ---
+# =========================================================
+class DisplayCelula:
+    """Mesma interface do comum.display.Display, mas publica para o supervisor."""
+    mostra_mascara = False
+
+    def __init__(self, nome, celula, nome_shm, fila_saida, fila_comandos):
+        self.nome = nome; self.celula = celula
+        self.fila_saida = fila_saida; self.fila_comandos = fila_comandos
+        self.preview = FrameCompartilhado(nome_shm, PREVIEW_WIDTH, PREVIEW_HEIGHT)
+        self._mouse_callback = None
+        self.quadros = 0 # Iterações do loop da célula (deve_renderizar é chamado 1x por frame)
+        self._quadros_status = 0; self._t_status = time.monotonic()
+        self._proximo_preview = 0.0; self._proximo_status = self._t_status + PERIODO_STATUS
+        self._fechado = False
+
+    def deve_renderizar(self):
+        self.quadros += 1
+        agora = time.monotonic()
+        if agora >= self._proximo_status: self._enviar_status(agora)
+        return agora >= self._proximo_preview
+
+    def novo_quadro(self):
+        return Quadro()
+
+    def publicar(self, frame, quadro=None, mascara=None):
+        self._proximo_preview = time.monotonic() + 1.0 / FPS_PREVIEW
+        h, w = frame.shape[:2]
+        self.preview.iniciar_escrita()
+        try:
+            cv2.resize(frame, (PREVIEW_WIDTH, PREVIEW_HEIGHT), dst=self.preview.imagem, interpolation=cv2.INTER_LINEAR)
+            if quadro is not None: desenhar_itens(self.preview.imagem, quadro.itens, PREVIEW_WIDTH / w, PREVIEW_HEIGHT / h)
+        finally:
+            self.preview.terminar_escrita()
+        return True
+
+    def ler_tecla(self, espera=0.0):
+        limite = time.monotonic() + espera
+        while True:
+            try:
+                restante = limite - time.monotonic()
+                cmd = self.fila_comandos.get(timeout=restante) if restante > 0 else self.fila_comandos.get_nowait()
+            except queue.Empty:
+                return -1
+            if cmd[0] == "tecla": return cmd[1]
+            if cmd[0] == "clique" and self._mouse_callback is not None:
+                # Cliques chegam em coordenadas do preview; a célula espera coordenadas da janela normal
+                x = int(cmd[1] * DISPLAY_WIDTH / PREVIEW_WIDTH); y = int(cmd[2] * DISPLAY_HEIGHT / PREVIEW_HEIGHT)
+                self._mouse_callback(cv2.EVENT_LBUTTONDOWN, x, y, 0, None)
+
+    def set_mouse_callback(self, callback):
+        self._mouse_callback = callback
+
+    def fechar(self):
+        if self._fechado: return
+        self._fechado = True
+        self.preview.fechar()
+
+    def _enviar_status(self, agora):
+        dt = agora - self._t_status
+        estado = {"fps": (self.quadros - self._quadros_status) / dt if dt > 0 else 0.0, "quadros": self.quadros}
+        for atributo in ATRIBUTOS_ESTADO:
+            if hasattr(self.celula, atributo):
+                valor = getattr(self.celula, atributo)
+                estado[atributo] = float(valor) if isinstance(valor, (np.floating, float)) else valor
+        try: self.fila_saida.put_nowait(("status", self.nome, estado))
+        except queue.Full: pass # Supervisor atrasado: descarta, o próximo status substitui
+        self._quadros_status = self.quadros; self._t_status = agora; self._proximo_status = agora + PERIODO_STATUS
+
+
+def _rodar_celula(cfg, nome_shm, fila_saida, fila_comandos):
+    """Ponto de entrada do processo de uma célula."""
+    nome = cfg["nome"]
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # O supervisor coordena o encerramento (ESC via fila)
+    try:
+        os.chdir(cfg["calibracao"]) # Os scripts leem a calibração do diretório atual
+        script, classe = TIPOS[cfg["tipo"]]
+        spec = importlib.util.spec_from_file_location(f"celula_{cfg['tipo']}", os.path.join(RAIZ, script))
+        modulo = importlib.util.module_from_spec(spec); spec.loader.exec_module(modulo)
+        celula = getattr(modulo, classe)(cfg["ip"], cfg["camera"])
+    except Exception as e:
+        fila_saida.put(("erro", nome, f"Falha ao iniciar: {e}")); return
+    if not celula.calibracao.carregar():
+        fila_saida.put(("erro", nome, "Falha ao carregar calibração.")); return
+
+    celula.display = DisplayCelula(nome, celula, nome_shm, fila_saida, fila_comandos)
+    if not celula.connect(): fila_saida.put(("aviso", nome, "Sem conexão com o robô. Rodando só visão enquanto reconecta."))
+    try:
+        celula.run_vision_and_send()
+    except Exception as e:
+        fila_saida.put(("erro", nome, f"Exceção no loop: {e}"))
+    finally:
+        celula.disconnect() # Também encerra a thread de reconexão da sessão
+        celula.display.fechar()
+        fila_saida.put(("fim", nome, None))
+
+
+# =========================================================
+# --- SUPERVISOR ---
+# =========================================================
+def carregar_celulas(filename):
+    try:
+        with open(filename, 'r') as f: celulas = json.load(f)
+    except FileNotFoundError: print(f"[ERRO] Arquivo '{filename}' não encontrado."); return None
+    except json.JSONDecodeError: print(f"[ERRO] Arquivo '{filename}' não é JSON válido."); return None
+    base = os.path.dirname(os.path.abspath(filename))
+    nomes = set()
+    for cfg in celulas:
+        faltando = [k for k in ("nome", "tipo", "ip", "camera", "calibracao") if k not in cfg]
+        if faltando: print(f"[ERRO] Célula {cfg} sem {faltando}."); return None
+        if cfg["tipo"] not in TIPOS: print(f"[ERRO] Tipo '{cfg['tipo']}' inválido (use {list(TIPOS)})."); return None
+        if cfg["nome"] in nomes: print(f"[ERRO] Nome de célula repetido: '{cfg['nome']}'."); return None
+        nomes.add(cfg["nome"])
+        cfg["calibracao"] = os.path.join(base, cfg["calibracao"])
+    print(f"[SUCESSO] {len(celulas)} células carregadas de '{filename}'.")
+    return celulas
+
+
+class Supervisor:
+    def __init__(self, celulas, headless=False):
+        self.headless = headless
+        self.fila_saida = mp.Queue(maxsize=1000)
+        self.celulas = {}
+        for cfg in celulas:
+            self.celulas[cfg["nome"]] = {
+                "cfg": cfg, "processo": None, "fila_comandos": None,
+                "preview": FrameCompartilhado(None, PREVIEW_WIDTH, PREVIEW_HEIGHT, criar=True),
+                "status": {}, "ultimo_status": None, "saude": "PARADA",
+                "reinicios": 0, "proximo_reinicio": 0.0,
+            }
+        self.rodando = False
+        self.selecionada = None # Célula que recebe as teclas
+
+    # --- Processos ---
+    def _iniciar_celula(self, nome):
+        c = self.celulas[nome]
+        c["fila_comandos"] = mp.Queue()
+        c["processo"] = mp.Process(target=_rodar_celula, name=f"celula-{nome}", daemon=True,
+                                   args=(c["cfg"], c["preview"].nome, self.fila_saida, c["fila_comandos"]))
+        c["processo"].start(); c["ultimo_status"] = time.monotonic(); c["saude"] = "INICIANDO"
+        print(f"[{nome}] Processo iniciado (PID {c['processo'].pid}, câmera {c['cfg']['camera']}, robô {c['cfg']['ip']}).")
+
+    def iniciar(self):
+        self.rodando = True
+        for nome in self.celulas: self._iniciar_celula(nome)
+
+    def parar(self, timeout=5.0):
+        self.rodando = False
+        for c in self.celulas.values():
+            if c["processo"] is not None and c["processo"].is_alive(): c["fila_comandos"].put(("tecla", 27)) # ESC
+        limite = time.monotonic() + timeout
+        for nome, c in self.celulas.items():
+            p = c["processo"]
+            if p is None: continue
+            p.join(timeout=max(0.0, limite - time.monotonic()))
+            if p.is_alive(): print(f"[{nome}] Não encerrou a tempo. Forçando."); p.terminate(); p.join(1.0)
+        self._coletar()
+        for c in self.celulas.values(): c["preview"].fechar(remover=True)
+
+    # --- Mensagens das células ---
+    def _coletar(self):
+        while True:
+            try: tipo, nome, dados = self.fila_saida.get_nowait()
+            except queue.Empty: return
+            c = self.celulas.get(nome)
+            if c is None: continue
+            if tipo == "status":
+                c["status"] = dados; c["ultimo_status"] = time.monotonic(); c["saude"] = "OK"
+            elif tipo == "fim":
+                print(f"[{nome}] Loop encerrado.")
+            else:
+                print(f"[{nome}] {tipo.upper()}: {dados}")
+
+    def _verificar_saude(self):
+        agora = time.monotonic()
+        for nome, c in self.celulas.items():
+            p = c["processo"]
+            if p is None: continue
+            if not p.is_alive():
+                if c["saude"] != "MORTA":
+                    c["saude"] = "MORTA"; c["status"] = {}
+                    espera = min(2.0 ** c["reinicios"], REINICIO_MAX_ESPERA)
+                    c["proximo_reinicio"] = agora + espera
+                    print(f"[{nome}] Processo terminou (código {p.exitcode}). Reiniciando em {espera:.0f}s...")
+                elif self.rodando and agora >= c["proximo_reinicio"]:
+                    c["reinicios"] += 1; self._iniciar_celula(nome)
+            elif agora - c["ultimo_status"] > TIMEOUT_SAUDE:
+                c["saude"] = "SEM RESPOSTA"
+
+    def relatorio(self):
+        linhas = ["", "=" * 72, f"{'CÉLULA':<12}{'SAÚDE':<14}{'FPS':>6}  {'ROBÔ':<12}{'REIN.':>5}  ESTADO", "-" * 72]
+        fps_total = 0.0
+        for nome, c in self.celulas.items():
+            st = c["status"]; fps = st.get("fps", 0.0); fps_total += fps if c["saude"] == "OK" else 0.0
+            robo = "CONECTADO" if st.get("connected") else "DESCONECT."
+            if "game_board" in st:
+                estado = f"tab={''.join(st['game_board']).replace(' ', '.')}"
+                if st.get("cleanup_mode"): estado += " LIMPANDO"
+                elif st.get("game_over"): estado += f" FIM({st.get('winner')})"
+                elif st.get("robot_is_busy"): estado += " ROBÔ OCUPADO"
+            elif "last_X" in st:
+                estado = f"alvo X={st['last_X']:.1f} Y={st['last_Y']:.1f} A={st['last_Angle']:.1f} cor={st['last_Color_ID']}"
+            else:
+                estado = "-"
+            linhas.append(f"{nome:<12}{c['saude']:<14}{fps:>6.1f}  {robo:<12}{c['reinicios']:>5}  {estado}")
+        linhas.append("-" * 72)
+        linhas.append(f"TOTAL: {fps_total:.1f} fps em {sum(1 for c in self.celulas.values() if c['saude'] == 'OK')}/{len(self.celulas)} células saudáveis")
+        print("\n".join(linhas))
+
+    # --- Mosaico (preview de todas as células) ---
+    def _layout(self):
+        colunas = max(1, math.ceil(math.sqrt(len(self.celulas))))
+        linhas = max(1, math.ceil(len(self.celulas) / colunas))
+        return colunas, linhas
+
+    def _montar_mosaico(self, mosaico):
+        colunas, _ = self._layout()
+        for i, (nome, c) in enumerate(self.celulas.items()):
+            y0 = (i // colunas) * PREVIEW_HEIGHT; x0 = (i % colunas) * PREVIEW_WIDTH
+            destino = mosaico[y0:y0 + PREVIEW_HEIGHT, x0:x0 + PREVIEW_WIDTH]
+            c["preview"].copiar_para(destino)
+            cor = (0, 255, 0) if c["saude"] == "OK" else (0, 0, 255)
+            borda = 3 if nome == self.selecionada else 1
+            cv2.rectangle(mosaico, (x0, y0), (x0 + PREVIEW_WIDTH - 1, y0 + PREVIEW_HEIGHT - 1), cor, borda)
+            cv2.putText(mosaico, f"{nome} [{c['saude']}] {c['status'].get('fps', 0.0):.1f} fps", (x0 + 8, y0 + PREVIEW_HEIGHT - 12),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, cor, 2)
+
+    def _ao_clicar(self, event, x, y, flags, param):
+        if event != cv2.EVENT_LBUTTONDOWN: return
+        colunas, _ = self._layout()
+        i = (y // PREVIEW_HEIGHT) * colunas + (x // PREVIEW_WIDTH)
+        nomes = list(self.celulas)
+        if i >= len(nomes): return
+        self.selecionada = nomes[i]; c = self.celulas[self.selecionada]
+        if c["processo"] is not None and c["processo"].is_alive():
+            c["fila_comandos"].put(("clique", x % PREVIEW_WIDTH, y % PREVIEW_HEIGHT))
+
+    def rodar(self):
+        self.iniciar()
+        colunas, linhas = self._layout()
+        janela = "Supervisor de Celulas"
+        mosaico = np.zeros((linhas * PREVIEW_HEIGHT, colunas * PREVIEW_WIDTH, 3), np.uint8)
+        if not self.headless:
+            cv2.namedWindow(janela); cv2.setMouseCallback(janela, self._ao_clicar)
+            print("CLIQUE em uma célula para selecioná-la (teclas vão para a selecionada) | ESC: encerrar tudo")
+        else:
+            print("Supervisor headless. Ctrl+C encerra todas as células.")
+        proximo_relatorio = time.monotonic() + PERIODO_RELATORIO
+        try:
+            while True:
+                self._coletar(); self._verificar_saude()
+                if time.monotonic() >= proximo_relatorio:
+                    self.relatorio(); proximo_relatorio = time.monotonic() + PERIODO_RELATORIO
+                if self.headless:
+                    time.sleep(0.1); continue
+                self._montar_mosaico(mosaico); cv2.imshow(janela, mosaico)
+                key = cv2.waitKey(1000 // FPS_PREVIEW) & 0xFF
+                if key == 27: break
+                if key != 255 and self.selecionada is not None:
+                    c = self.celulas[self.selecionada]
+                    if c["processo"] is not None and c["processo"].is_alive(): c["fila_comandos"].put(("tecla", key))
+        except KeyboardInterrupt:
+            print("\nCtrl+C: encerrando células...")
+        finally:
+            self.parar()
+            if not self.headless: cv2.destroyAllWindows()
+            self.relatorio()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Uso: python -m comum.supervisor celulas.json [headless]")
+    celulas = carregar_celulas(sys.argv[1])
+    if not celulas:
+        sys.exit("ERRO FATAL: Nenhuma célula configurada.")
+    Supervisor(celulas, headless=len(sys.argv) > 2 and sys.argv[2] == "headless").rodar()
@@ -0,0 +1,128 @@
+"""
+Registro do tráfego CIP: cada transação (registrador, direção, valor,
+latência, erro) vai para um anel em memória e, opcionalmente, para um
+arquivo JSON-lines que gira ao atingir um tamanho (arquivo + arquivo.1).
+
+Mantém ao vivo, por registrador e direção, um histograma de latência e a
+taxa de erro, consultáveis com o programa rodando:
+
+    trafego = sessao.trafego
+    trafego.percentil(5, "leitura", 95)   # ms
+    trafego.imprimir_resumo()
+
+A gravação em disco é feita por uma thread própria; registrar() só
+atualiza contadores e enfileira, então não pesa na chamada CIP.
+"""
+import collections
+import json
+import os
+import queue
+import threading
+import time
+
+# Limites superiores das faixas do histograma, em ms (a última faixa é "acima de 1000")
+FAIXAS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+TAMANHO_ANEL = 2000                  # Transações mantidas em memória
+TAMANHO_MAX_ARQUIVO = 5 * 1024 * 1024 # bytes antes de girar o arquivo
+
+
+class _Estatistica:
+    def __init__(self):
+        self.contagem = [0] * (len(FAIXAS_MS) + 1)
+        self.total = 0; self.erros = 0
+        self.soma_ms = 0.0; self.max_ms = 0.0
+
+    def adicionar(self, latencia_ms, erro):
+        i = 0
+        while i < len(FAIXAS_MS) and latencia_ms > FAIXAS_MS[i]: i += 1
+        self.contagem[i] += 1
+        self.total += 1; self.soma_ms += latencia_ms; self.max_ms = max(self.max_ms, latencia_ms)
+        if erro: self.erros += 1
+
+    def percentil(self, p):
+        """Limite superior da faixa que contém o percentil p (aproximação do histograma)."""
+        if self.total == 0: return None
+        alvo = self.total * p / 100.0; acumulado = 0
+        for i, n in enumerate(self.contagem):
+            acumulado += n
+            if acumulado >= alvo:
+                return FAIXAS_MS[i] if i < len(FAIXAS_MS) else self.max_ms
+        return self.max_ms
+
+
+class RegistroTrafego:
+    def __init__(self, arquivo=None, tamanho_anel=TAMANHO_ANEL, tamanho_max_arquivo=TAMANHO_MAX_ARQUIVO):
+        self.anel = collections.deque(maxlen=tamanho_anel)
+        self.estatisticas = {} # (registrador, direção) -> _Estatistica
+        self._lock = threading.Lock()
+        self.arquivo = arquivo; self.tamanho_max_arquivo = tamanho_max_arquivo
+        self._fila = None; self._thread = None
+        if arquivo:
+            self._fila = queue.Queue(maxsize=10000)
+            self._thread = threading.Thread(target=self._gravador, name="CIP-trafego", daemon=True)
+            self._thread.start()
+
+    def registrar(self, registrador, direcao, valor, latencia_ms, erro=None):
+        evento = {"t": round(time.time(), 4), "reg": registrador, "dir": direcao,
+                  "valor": valor, "ms": round(latencia_ms, 3), "erro": erro}
+        with self._lock:
+            self.anel.append(evento)
+            chave = (registrador, direcao)
+            if chave not in self.estatisticas: self.estatisticas[chave] = _Estatistica()
+            self.estatisticas[chave].adicionar(latencia_ms, erro is not None)
+        if self._fila is not None:
+            try: self._fila.put_nowait(evento)
+            except queue.Full: pass # Disco atrasado: perde a linha, mas as estatísticas ficam
+
+    # --- Consultas ---
+    def percentil(self, registrador, direcao, p):
+        with self._lock:
+            est = self.estatisticas.get((registrador, direcao))
+            return est.percentil(p) if est else None
+
+    def ultimos(self, n=20, registrador=None):
+        with self._lock:
+            eventos = [e for e in self.anel if registrador is None or e["reg"] == registrador]
+        return eventos[-n:]
+
+    def resumo(self):
+        """{(registrador, direção): {'n', 'erros', 'taxa_erro', 'media_ms', 'p50_ms', 'p95_ms', 'max_ms', 'histograma'}}"""
+        with self._lock:
+            return {chave: {"n": e.total, "erros": e.erros, "taxa_erro": e.erros / e.total,
+                            "media_ms": e.soma_ms / e.total, "p50_ms": e.percentil(50), "p95_ms": e.percentil(95),
+                            "max_ms": e.max_ms, "histograma": list(e.contagem)}
+                    for chave, e in sorted(self.estatisticas.items(), key=lambda item: (isinstance(item[0][0], str), item[0])) if e.total}
+
+    def imprimir_resumo(self):
+        resumo = self.resumo()
+        print("\n--- TRÁFEGO CIP (latência em ms) ---")
+        if not resumo: print("Nenhuma transação registrada.")
+        for (reg, direcao), r in resumo.items():
+            nome = reg if isinstance(reg, str) else f"R[{reg}]" # PR[n] chega já como texto
+            print(f"{nome:<6} {direcao:<8} n={r['n']:<6} erros={r['taxa_erro']*100:5.1f}%  "
+                  f"média={r['media_ms']:6.2f}  p50<={r['p50_ms']:<6}  p95<={r['p95_ms']:<6}  máx={r['max_ms']:.2f}")
+        print("------------------------------------")
+
+    # --- Arquivo ---
+    def _gravador(self):
+        f = open(self.arquivo, "a", encoding="utf-8")
+        try:
+            while True:
+                evento = self._fila.get()
+                if evento is None: break
+                linhas = [json.dumps(evento)]
+                while True: # Esvazia o que já chegou para gravar de uma vez
+                    try: evento = self._fila.get_nowait()
+                    except queue.Empty: break
+                    if evento is None: self._fila.put(None); break
+                    linhas.append(json.dumps(evento))
+                f.write("\n".join(linhas) + "\n"); f.flush()
+                if f.tell() >= self.tamanho_max_arquivo: # Gira: o arquivo anterior vira .1
+                    f.close(); os.replace(self.arquivo, self.arquivo + ".1")
+                    f = open(self.arquivo, "a", encoding="utf-8")
+        finally:
+            f.close()
+
+    def fechar(self):
+        if self._thread is not None:
+            self._fila.put(None); self._thread.join(timeout=2.0); self._thread = None
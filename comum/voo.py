@@ -0,0 +1,169 @@
+"""
+Calibração em voo: o robô varre o plano sem parar e a homografia sai de centenas de pares.
+
+Nos calibradores de pulso cada ponto é uma parada: o robô para, pulsa R[5],
+o script lê R[6] e R[7] em duas transações no ritmo do loop da tela. Aqui o
+robô leva o marcador por um caminho contínuo com R[5]=1 durante a varredura
+e mantém R[6]/R[7] atualizados com a posição atual. Dois fluxos independentes,
+cada um com o seu instante no relógio monotônico:
+  * posições do robô: uma thread lê (R[5], R[6], R[7]) em lote, em uma só
+    transação CIP (SessaoRobo.read_registers), a cada PERIODO_LEITURA, com o
+    instante no meio da ida e volta;
+  * centróides do marcador: um por frame, com o carimbo do driver
+    (comum.captura.instante_quadro).
+Cada centróide recebe a posição do robô interpolada no seu instante. O
+atraso entre os dois relógios (exposição, transporte USB, atualização dos
+registradores no robô) é estimado: a homografia é ajustada para cada atraso
+em [-ATRASO_MAX, ATRASO_MAX] e fica o de menor erro mediano. Com o atraso
+certo, os pares de ida e de volta no mesmo caminho coincidem.
+
+O resultado vai para pontos_calibracao.txt no formato de sempre (2 decimais),
+limitado a MAX_PARES_ARQUIVO pares inliers, espalhados ao longo da varredura.
+"""
+import threading
+import time
+
+import numpy as np
+
+from comum import importar_sob_demanda
+from comum.calibracao import detectar_marcador
+from comum.captura import instante_quadro
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- Padrões ---
+PERIODO_LEITURA = 0.01     # s entre leituras de posição (cada leitura em lote leva uma ida e volta CIP)
+POSICAO_REAL = False       # True: R[6]/R[7] lidos como REAL (programa do robô escreve com decimais)
+MAX_INTERVALO_ROBO = 0.1   # s: frame descartado se as leituras do robô em volta dele estão mais afastadas que isso
+ATRASO_MAX = 0.2           # s: busca do atraso câmera -> robô
+PASSO_ATRASO = 0.005       # s; depois, um refino de 1 ms em volta do melhor
+LIMIAR_RANSAC_MM = 2.0
+MIN_PARES = 30
+MAX_PARES_ARQUIVO = 300
+# ---------------
+
+
+class LeitorPosicoes:
+    """Thread que lê (flag, X, Y) em lote e guarda cada leitura com o seu instante."""
+
+    def __init__(self, ler_registradores, reg_flag=5, reg_x=6, reg_y=7, periodo=PERIODO_LEITURA):
+        """ler_registradores(indices) -> ([valores], ok), como SessaoRobo.read_registers."""
+        self.ler_registradores = ler_registradores
+        self.indices = (reg_flag, reg_x, reg_y); self.periodo = periodo
+        self.amostras = [] # [(instante, flag, x, y)]
+        self.ultimo_flag = 0
+        self.duracao_media = 0.0 # s por leitura em lote
+        self._lock = threading.Lock()
+        self._rodando = False; self._thread = None
+
+    def iniciar(self):
+        self._rodando = True
+        self._thread = threading.Thread(target=self._loop, name="Leitor-posicoes", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._rodando = False
+        if self._thread is not None: self._thread.join(timeout=2.0); self._thread = None
+
+    def _loop(self):
+        while self._rodando:
+            t0 = time.monotonic()
+            valores, ok = self.ler_registradores(self.indices)
+            t1 = time.monotonic()
+            if ok:
+                with self._lock: self.amostras.append(((t0 + t1) / 2.0, *valores))
+                self.ultimo_flag = valores[0]
+                self.duracao_media = (t1 - t0) if self.duracao_media == 0.0 else 0.9 * self.duracao_media + 0.1 * (t1 - t0)
+            time.sleep(max(0.0, self.periodo - (t1 - t0)))
+
+    def trajetoria(self):
+        """(instantes (N,), xy (N, 2)) de todas as leituras, em ordem."""
+        with self._lock: amostras = np.array(self.amostras, dtype=np.float64).reshape(-1, 4)
+        return amostras[:, 0], amostras[:, 2:4]
+
+
+def interpolar(t_robo, xy_robo, instantes, max_intervalo=MAX_INTERVALO_ROBO):
+    """Posição do robô (N, 2) em cada instante e máscara de válidos (entre duas leituras próximas)."""
+    idx = np.searchsorted(t_robo, instantes)
+    validos = (idx > 0) & (idx < len(t_robo))
+    idx = np.clip(idx, 1, max(len(t_robo) - 1, 1))
+    validos &= (t_robo[idx] - t_robo[idx - 1]) <= max_intervalo
+    xy = np.column_stack([np.interp(instantes, t_robo, xy_robo[:, 0]), np.interp(instantes, t_robo, xy_robo[:, 1])])
+    return xy, validos
+
+
+def ajustar_em_voo(t_camera, pixels, t_robo, xy_robo, atraso_max=ATRASO_MAX, passo=PASSO_ATRASO, limiar_mm=LIMIAR_RANSAC_MM):
+    """
+    Homografia pixel -> mm para o melhor atraso da câmera (o frame carimbado em t mostra o robô em t - atraso).
+    Retorna dict {'H', 'atraso', 'erro_mediano', 'erro_p95', 'pixels', 'robo'} (só inliers) ou None.
+    """
+    pixels = np.asarray(pixels, dtype=np.float32).reshape(-1, 2); t_camera = np.asarray(t_camera, dtype=np.float64)
+    if len(t_robo) < 2: return None
+
+    def avaliar(atraso):
+        robo, validos = interpolar(t_robo, xy_robo, t_camera - atraso)
+        if validos.sum() < MIN_PARES: return None
+        origem = pixels[validos]; destino = robo[validos].astype(np.float32)
+        H, inliers = cv2.findHomography(origem, destino, cv2.RANSAC, limiar_mm)
+        if H is None: return None
+        dentro = inliers.ravel().astype(bool)
+        H, _ = cv2.findHomography(origem[dentro], destino[dentro], 0) # Mínimos quadrados com todos os inliers (ida e volta)
+        if H is None: return None
+        erros = np.linalg.norm(cv2.perspectiveTransform(origem.reshape(-1, 1, 2), H).reshape(-1, 2) - destino, axis=1)
+        # Nota sobre todos os pares válidos: descartar pares como outliers não melhora a nota
+        return {"H": H, "atraso": float(atraso), "erro_mediano": float(np.median(erros)), "erro_p95": float(np.percentile(erros, 95)),
+                "pixels": origem[dentro], "robo": destino[dentro]}
+
+    def melhor_de(atrasos, melhor=None):
+        for atraso in atrasos:
+            r = avaliar(atraso)
+            if r is not None and (melhor is None or r["erro_mediano"] < melhor["erro_mediano"]): melhor = r
+        return melhor
+
+    melhor = melhor_de(np.arange(-atraso_max, atraso_max + passo / 2, passo))
+    if melhor is not None: # Refino de 1 ms em volta do melhor da busca grossa
+        melhor = melhor_de(melhor["atraso"] + np.arange(-passo, passo + 0.0005, 0.001), melhor)
+    return melhor
+
+
+def calibrar_em_voo(cap, sessao, faixas, reg_flag=5, reg_x=6, reg_y=7, real=POSICAO_REAL):
+    """
+    Loop interativo: coleta centróides do marcador enquanto R[reg_flag] == 1 (varredura do robô),
+    ajusta e devolve (p_camera, p_robot) para salvar_pontos, ou ([], []) (ESC/falha).
+    sessao: comum.cip.SessaoRobo.
+    """
+    leitor = LeitorPosicoes(lambda indices: sessao.read_registers(indices, real), reg_flag, reg_x, reg_y)
+    t_camera = []; pixels = []; em_voo = False
+    print(f"\n[AVISO] Inicie o programa de varredura no robô: R[{reg_flag}]=1 durante o caminho, com R[{reg_x}]/R[{reg_y}] atualizados.")
+    leitor.iniciar()
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret: print("Erro na leitura da câmera."); return [], []
+            instante = instante_quadro(cap)
+            pixel_pos, frame_vis, _ = detectar_marcador(frame, faixas)
+            if leitor.ultimo_flag == 1:
+                em_voo = True
+                if pixel_pos is not None: t_camera.append(instante); pixels.append(pixel_pos)
+            elif em_voo:
+                print(f"Varredura concluída: {len(pixels)} centróides, {len(leitor.amostras)} leituras do robô.")
+                break
+            status = (f"Em voo: {len(pixels)} centróides, {len(leitor.amostras)} leituras ({leitor.duracao_media * 1000.0:.1f} ms cada)"
+                      if em_voo else f"Aguardando R[{reg_flag}]=1 (início da varredura)...")
+            cv2.putText(frame_vis, status, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+            cv2.imshow("Calibração em Voo", cv2.resize(frame_vis, (1280, 720), interpolation=cv2.INTER_AREA))
+            if cv2.waitKey(1) & 0xFF == 27:
+                print("Calibração cancelada pelo usuário."); return [], []
+    finally:
+        leitor.parar()
+
+    t_robo, xy_robo = leitor.trajetoria()
+    resultado = ajustar_em_voo(t_camera, pixels, t_robo, xy_robo)
+    if resultado is None:
+        print(f"[ERRO] Pares insuficientes (mínimo {MIN_PARES}): varredura mais lenta ou mais longa?"); return [], []
+    print(f"Atraso da câmera: {resultado['atraso'] * 1000.0:.0f} ms. Erro: mediana {resultado['erro_mediano']:.2f} mm, "
+          f"p95 {resultado['erro_p95']:.2f} mm ({len(resultado['pixels'])} inliers).")
+    escolhidos = np.unique(np.linspace(0, len(resultado["pixels"]) - 1, min(MAX_PARES_ARQUIVO, len(resultado["pixels"]))).astype(int))
+    p_camera = resultado["pixels"][escolhidos].tolist(); p_robot = resultado["robo"][escolhidos].tolist()
+    print(f"[SUCESSO] {len(p_camera)} pares pixel -> mm da varredura.")
+    return p_camera, p_robot
@@ -1,79 +1,168 @@
-import cv2
-import numpy as np
-
-# --- PASSO DE CONFIGURAÇÃO ---
-# Você PRECISA ajustar estes valores para a cor do seu bloco e sua iluminação.
-# Exemplo para um bloco AZUL VIVO. Use um "HSV Color Picker" online para achar os valores da sua cor.
-limite_inferior_cor = np.array([90, 80, 50])    # HSV mínimo para azul
-limite_superior_cor = np.array([130, 255, 255]) # HSV máximo para azul
-# -----------------------------
-
-# Inicia a captura de vídeo
-cap = cv2.VideoCapture(1)
-if not cap.isOpened():
-    print("Erro: Não foi possível abrir a câmera.")
-    exit()
-
-while True:
-    # 1. Captura do frame
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    # 2. Conversão de BGR para HSV
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-    # 3. Criação da máscara para a cor específica
-    mascara = cv2.inRange(hsv, limite_inferior_cor, limite_superior_cor)
-    
-    # Opcional: Aplicar operações morfológicas para remover ruídos da máscara
-    mascara = cv2.erode(mascara, None, iterations=2)
-    mascara = cv2.dilate(mascara, None, iterations=2)
-
-    # 4. Encontrar contornos na máscara
-    # cv2.RETR_EXTERNAL é ótimo para pegar apenas o contorno externo do objeto
-    # cv2.CHAIN_APPROX_SIMPLE remove pontos redundantes e economiza memória
-    contornos, _ = cv2.findContours(mascara.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    # Verifica se algum contorno foi encontrado
-    if len(contornos) > 0:
-        # Pega o maior contorno (assumindo que seja o nosso bloco)
-        c = max(contornos, key=cv2.contourArea)
-        
-        # Filtra contornos muito pequenos para evitar ruído
-        if cv2.contourArea(c) > 500: # O valor 500 é um exemplo, ajuste se necessário
-            # --- CÁLCULO DA POSIÇÃO (CENTRO) ---
-            M = cv2.moments(c)
-            if M["m00"] != 0:
-                # Calcula o centroide (cx, cy) do bloco
-                cx = int(M["m10"] / M["m00"])
-                cy = int(M["m01"] / M["m00"])
-                posicao_texto = f"Pos: ({cx}, {cy})"
-                cv2.circle(frame, (cx, cy), 7, (255, 255, 255), -1) # Desenha o centro
-                cv2.putText(frame, posicao_texto, (cx - 50, cy - 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-            # --- CÁLCULO DA ROTAÇÃO ---
-            # Encontra o retângulo de área mínima que envolve o contorno
-            rect = cv2.minAreaRect(c)
-            # rect é uma tupla: ((centro_x, centro_y), (largura, altura), angulo_de_rotacao)
-            box = cv2.boxPoints(rect)
-            box = np.intp(box) # Converte para inteiros
-            
-            angulo = round(rect[2], 2)
-            rotacao_texto = f"Rot: {angulo} graus"
-            
-            # Desenha o retângulo rotacionado no frame original
-            cv2.drawContours(frame, [box], 0, (0, 255, 0), 2)
-            cv2.putText(frame, rotacao_texto, (cx - 50, cy + 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-    # Mostra os frames
-    cv2.imshow('Frame Original', frame)
-    cv2.imshow('Mascara de Cor', mascara)
-
-    # Condição de saída (tecla ESC)
-    if cv2.waitKey(1) & 0xFF == 27:
-        break
-
-# Libera os recursos
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+import cv2
+import numpy as np
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))  # Raiz do repositório (pacote 'comum')
+from comum.captura import abrir_camera
+from comum.segmentacao import segmentar_blocos
+from comum.perfilcor import (NOME_ARQUIVO_PERFIL_COR, NOMES_CORES, PerfilCor, ajustar_faixas, amostra_da_marcacao, avaliar_faixas,
+                             carregar_perfil_cor, faixas_do_perfil, salvar_perfil_cor, sugerir_area_minima)
+
+# --- CONFIGURAÇÕES ---
+CAMERA_INDEX = 1
+LARGURA = 1920   # Mesma resolução dos detectores (as áreas do perfil são em px² desta resolução)
+ALTURA = 1080
+LARGURA_JANELA = 1280
+ALTURA_JANELA = 720
+# ---------------------
+
+# Uso:
+#   python calibradorcor.py                 -> câmera ao vivo (ESPAÇO congela/descongela o frame)
+#   python calibradorcor.py foto.png        -> frame gravado (imagem ou vídeo; no vídeo ESPAÇO também congela)
+# Teclas: '1' Azul, '2' Vermelho, '0' Fundo -> classe das próximas marcações
+#         ARRASTE com o mouse sobre peças (ou fundo) da classe selecionada para marcar amostras
+#         'a' ajusta as faixas e mostra a separação | 's' salva o perfil | 'u' desfaz a última marcação
+#         'c' limpa as marcações da classe selecionada | ESC sai
+# Sem marcações de fundo, o fundo é o frame inteiro menos as marcações (outras peças da mesma cor contam como erro).
+
+CORES_DESENHO = {0: (200, 200, 200), 1: (255, 0, 0), 2: (0, 0, 255)}
+NOMES_CLASSES = {0: "Fundo", **NOMES_CORES}
+
+classe_atual = 1
+marcacoes = [] # [(classe, (x0, y0, x1, y1) em pixels do frame, pixels HSV N x 3)]
+arraste = None # (x0, y0) do início do arraste, em coordenadas da janela
+cursor = None
+frame = None
+escala = (LARGURA / LARGURA_JANELA, ALTURA / ALTURA_JANELA)
+
+
+def ao_mouse(event, x, y, flags, param):
+    global arraste, cursor
+    cursor = (x, y)
+    if event == cv2.EVENT_LBUTTONDOWN:
+        arraste = (x, y)
+    elif event == cv2.EVENT_LBUTTONUP and arraste is not None:
+        sx, sy = escala
+        x0, x1 = sorted((int(arraste[0] * sx), int(x * sx))); y0, y1 = sorted((int(arraste[1] * sy), int(y * sy)))
+        arraste = None
+        if (x1 - x0) * (y1 - y0) < 25 or frame is None: return
+        hsv = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)
+        hsv = hsv.reshape(-1, 3) if classe_atual == 0 else amostra_da_marcacao(hsv) # Fundo: tudo; peça: só a cor do miolo
+        marcacoes.append((classe_atual, (x0, y0, x1, y1), hsv))
+        print(f"Marcação de {NOMES_CLASSES[classe_atual]}: {x1 - x0}x{y1 - y0} px ({len(marcacoes)} no total).")
+
+
+def pixels_de(classe):
+    blocos = [hsv for c, _, hsv in marcacoes if c == classe]
+    return np.concatenate(blocos) if blocos else None
+
+
+def pixels_fundo():
+    """Marcações de fundo ou, sem elas, o frame inteiro fora das marcações (amostrado)."""
+    marcados = pixels_de(0)
+    if marcados is not None: return marcados
+    fora = np.ones(frame.shape[:2], bool)
+    for _, (x0, y0, x1, y1), _ in marcacoes: fora[y0:y1, x0:x1] = False
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)[fora]
+    return hsv[::max(1, len(hsv) // 200000)] # Até ~200 mil pixels bastam para a taxa de falsos
+
+
+def ajustar():
+    """Ajusta as faixas das cores marcadas e imprime a separação. Retorna PerfilCor ou None."""
+    faixas, _ = faixas_do_perfil() # Cores sem marcação mantêm o perfil atual (ou as faixas padrão)
+    fundo = pixels_fundo(); metricas = {}; areas = []
+    print("\n--- AJUSTE DAS FAIXAS ---")
+    for cor_id in sorted(NOMES_CORES):
+        pix = pixels_de(cor_id)
+        if pix is None: print(f"{NOMES_CORES[cor_id]}: sem marcações, mantida."); continue
+        lims = ajustar_faixas(pix)
+        if lims is None: print(f"{NOMES_CORES[cor_id]}: marcações sem pixels coloridos suficientes, mantida."); continue
+        faixas[cor_id] = lims
+        # O fundo de uma cor inclui as amostras das outras cores: a faixa não pode aceitá-las
+        outras = [p for c in NOMES_CORES if c != cor_id for p in [pixels_de(c)] if p is not None]
+        fundo_cor = np.concatenate([fundo] + outras) if outras else fundo
+        metricas[cor_id] = m = avaliar_faixas(lims, pix, fundo_cor)
+        texto = " + ".join(f"[{inf.tolist()} .. {sup.tolist()}]" for inf, sup in lims)
+        print(f"{NOMES_CORES[cor_id]}: {texto}")
+        print(f"    cobertura da peça: {100 * m['cobertura']:.1f}% | fundo aceito por engano: {100 * (m['fundo'] or 0):.3f}%")
+        if m['fundo'] and m['fundo'] > 0.001: print("    AVISO: faixa aceita fundo. Marque o fundo parecido com '0' ou melhore a iluminação.")
+        if m['cobertura'] < 0.95: print("    AVISO: faixa cobre menos de 95% da peça. Marque mais peças, sem sombra/reflexo.")
+        for _, (x0, y0, x1, y1), _ in (mk for mk in marcacoes if mk[0] == cor_id):
+            for b in segmentar_blocos(frame[y0:y1, x0:x1], {cor_id: lims}, area_minima=1):
+                areas.append(b['rect'][1][0] * b['rect'][1][1])
+    if not metricas: print("Nada para ajustar: marque peças com '1'/'2' e arraste."); return None
+    area_minima = sugerir_area_minima(areas)
+    print(f"Área mínima de contorno: {area_minima} px²")
+    h, w = frame.shape[:2]
+    return PerfilCor(faixas, area_minima, (w, h), metricas)
+
+
+def desenhar(perfil):
+    vis = cv2.resize(frame, (LARGURA_JANELA, ALTURA_JANELA), interpolation=cv2.INTER_AREA)
+    mascara = np.zeros((ALTURA_JANELA, LARGURA_JANELA), np.uint8)
+    if perfil is not None: # Prévia do perfil ajustado: contornos que os detectores vão ver
+        pequeno = cv2.resize(frame, (LARGURA_JANELA, ALTURA_JANELA), interpolation=cv2.INTER_AREA)
+        area = perfil.area_minima / (escala[0] * escala[1])
+        blocos, mascara = segmentar_blocos(pequeno, perfil.faixas, area_minima=area, retornar_mascara=True)
+        for b in blocos: cv2.polylines(vis, [np.intp(cv2.boxPoints(b['rect']))], True, CORES_DESENHO[b['cor_id']], 2)
+        cv2.putText(vis, f"Contornos: {len(blocos)}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+    for c, (x0, y0, x1, y1), _ in marcacoes:
+        cv2.rectangle(vis, (int(x0 / escala[0]), int(y0 / escala[1])), (int(x1 / escala[0]), int(y1 / escala[1])), CORES_DESENHO[c], 1)
+    if arraste is not None and cursor is not None:
+        cv2.rectangle(vis, arraste, cursor, CORES_DESENHO[classe_atual], 2)
+    estado = "CONGELADO" if congelado else "AO VIVO"
+    cv2.putText(vis, f"Classe: {NOMES_CLASSES[classe_atual]} | {estado} | 'a' ajusta 's' salva", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    cv2.imshow('Calibrador de Cor', vis)
+    cv2.imshow('Mascara (perfil ajustado)', mascara)
+
+
+if __name__ == "__main__":
+    fonte = sys.argv[1] if len(sys.argv) > 1 else None
+    imagem = cv2.imread(fonte) if fonte is not None else None
+    cap = None
+    if imagem is None:
+        cap = cv2.VideoCapture(fonte) if fonte is not None else abrir_camera(CAMERA_INDEX, LARGURA, ALTURA)
+        if not cap.isOpened():
+            print(f"Erro: Não foi possível abrir {fonte if fonte is not None else f'a câmera {CAMERA_INDEX}'}."); sys.exit(1)
+    else:
+        frame = imagem
+
+    existente = carregar_perfil_cor()
+    perfil = None
+    congelado = imagem is not None
+    cv2.namedWindow('Calibrador de Cor'); cv2.setMouseCallback('Calibrador de Cor', ao_mouse)
+    print("--- CALIBRADOR DE COR ---")
+    print("'1' Azul | '2' Vermelho | '0' Fundo | ARRASTE marca amostras | ESPAÇO congela | 'a' ajusta | 's' salva | 'u' desfaz | 'c' limpa | ESC sai")
+
+    while True:
+        if not congelado:
+            ret, novo = cap.read()
+            if not ret:
+                if frame is None: print("Erro: Sem frames."); break
+                congelado = True # Fim do vídeo: fica no último frame
+            else:
+                frame = novo
+        h, w = frame.shape[:2]; escala = (w / LARGURA_JANELA, h / ALTURA_JANELA)
+        desenhar(perfil)
+
+        key = cv2.waitKey(1 if not congelado else 30) & 0xFF
+        if key == 27: break
+        if key in (ord('0'), ord('1'), ord('2')):
+            classe_atual = key - ord('0'); print(f"Classe: {NOMES_CLASSES[classe_atual]}")
+        elif key == ord(' ') and cap is not None:
+            congelado = not congelado
+        elif key == ord('u') and marcacoes:
+            c, _, _ = marcacoes.pop(); print(f"Desfeita uma marcação de {NOMES_CLASSES[c]}.")
+        elif key == ord('c'):
+            marcacoes = [m for m in marcacoes if m[0] != classe_atual]; print(f"Marcações de {NOMES_CLASSES[classe_atual]} apagadas.")
+        elif key == ord('a'):
+            perfil = ajustar()
+        elif key == ord('s'):
+            if perfil is None: perfil = ajustar()
+            if perfil is not None and salvar_perfil_cor(NOME_ARQUIVO_PERFIL_COR, perfil):
+                if existente is not None: print(f"(Substituiu o perfil de {existente.criado}.)")
+                print(f"Copie '{NOME_ARQUIVO_PERFIL_COR}' para a pasta de cada script que detecta peças.")
+
+    if cap is not None: cap.release()
+    cv2.destroyAllWindows()
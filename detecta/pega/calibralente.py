@@ -0,0 +1,72 @@
+import cv2
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))  # Raiz do repositório (pacote 'comum')
+from comum.captura import abrir_camera
+from comum.lente import (PADRAO_XADREZ, TAMANHO_QUADRADO_MM, NOME_ARQUIVO_LENTE, NOME_ARQUIVO_MAPAS,
+                         calibrar_intrinsecos, listar_imagens, salvar_calibracao_lente,
+                         encontrar_cantos_xadrez, CorretorLente)
+
+# --- CONFIGURAÇÕES ---
+CAMERA_INDEX = 1
+PASTA_IMAGENS = "imagens_xadrez"  # Imagens do tabuleiro de xadrez (uma por pose)
+# ---------------------
+
+# Uso:
+#   python calibralente.py            -> calibra com as imagens de PASTA_IMAGENS
+#   python calibralente.py capturar   -> abre a câmera; ESPAÇO salva um frame em PASTA_IMAGENS, ESC encerra
+# Dica: espalhe as poses pela imagem toda, principalmente pelas BORDAS (onde fica a bandeja).
+
+
+def capturar_imagens(pasta):
+    os.makedirs(pasta, exist_ok=True)
+    cap = abrir_camera(CAMERA_INDEX, 1920, 1080)
+    if not cap.isOpened():
+        print(f"Erro: Não foi possível abrir a câmera {CAMERA_INDEX}"); return
+    print("ESPAÇO: salvar frame | ESC: sair")
+    salvas = len(listar_imagens(pasta))
+    while True:
+        ret, frame = cap.read()
+        if not ret: break
+        cantos = encontrar_cantos_xadrez(frame)
+        frame_vis = frame.copy()
+        if cantos is not None:
+            cv2.drawChessboardCorners(frame_vis, PADRAO_XADREZ, cantos, True)
+        cor = (0, 255, 0) if cantos is not None else (0, 0, 255)
+        cv2.putText(frame_vis, f"Imagens salvas: {salvas}", (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.2, cor, 3)
+        cv2.imshow("Captura Xadrez", cv2.resize(frame_vis, (1280, 720), interpolation=cv2.INTER_AREA))
+        key = cv2.waitKey(1) & 0xFF
+        if key == 27: break
+        if key == ord(' '):
+            if cantos is None: print("Tabuleiro não encontrado neste frame. Não salvo."); continue
+            nome = os.path.join(pasta, f"xadrez_{int(time.time() * 1000)}.png")
+            cv2.imwrite(nome, frame); salvas += 1
+            print(f"Salvo '{nome}'.")
+    cap.release(); cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "capturar":
+        capturar_imagens(PASTA_IMAGENS)
+
+    arquivos = listar_imagens(PASTA_IMAGENS)
+    print(f"--- CALIBRAÇÃO DA LENTE ({len(arquivos)} imagens em '{PASTA_IMAGENS}') ---")
+    print(f"Padrão: {PADRAO_XADREZ[0]}x{PADRAO_XADREZ[1]} cantos internos, quadrado de {TAMANHO_QUADRADO_MM} mm")
+    resultado = calibrar_intrinsecos(arquivos)
+    if resultado is None:
+        sys.exit("Calibração da lente não concluída.")
+
+    K, dist, tamanho, erro_rms = resultado
+    print(f"Resolução: {tamanho[0]}x{tamanho[1]}")
+    print(f"Erro RMS de reprojeção: {erro_rms:.3f} px")
+    print("Matriz da câmera (K):"); print(K)
+    print("Coeficientes de distorção:"); print(dist.ravel())
+    if erro_rms > 1.0:
+        print("AVISO: Erro acima de 1 px. Considere mais imagens ou imagens mais nítidas.")
+
+    if salvar_calibracao_lente(NOME_ARQUIVO_LENTE, K, dist, tamanho, erro_rms):
+        # Já deixa as tabelas de remapeamento prontas em disco
+        CorretorLente(K, dist, tamanho, NOME_ARQUIVO_MAPAS).preparar_mapas(salvar=True)
+        print(f"\nCopie '{NOME_ARQUIVO_LENTE}' (e '{NOME_ARQUIVO_MAPAS}') para a pasta de cada script que usa a câmera.")
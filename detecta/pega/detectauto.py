@@ -1,385 +1,456 @@
-import struct
-import cv2
-import numpy as np
-from pycomm3 import CIPDriver, Services
-import sys
-import time
-import threading
-
-# --- NOME DO ARQUIVO DE CALIBRAÇÃO ---
-# Deve ser o mesmo nome que o script de calibração está salvando
-NOME_ARQUIVO_PONTOS = "pontos_calibracao.txt" 
-# ------------------------------------
-
-# --- FAIXA DE COR AZUL ---
-limite_inferior_azul = np.array([80, 120, 70])
-limite_superior_azul = np.array([150, 255, 255])
-
-# --- FAIXA DE COR VERMELHA ---
-limite_inferior_vermelho1 = np.array([0, 100, 100])
-limite_superior_vermelho1 = np.array([10, 255, 255])
-limite_inferior_vermelho2 = np.array([170, 100, 100])
-limite_superior_vermelho2 = np.array([180, 255, 255])
-
-
-# =========================================================
-# --- NOVO BLOCO: FUNÇÃO PARA CARREGAR OS PONTOS DO ARQUIVO ---
-# =========================================================
-def carregar_pontos_do_arquivo(filename):
-    """
-    Lê o arquivo de calibração gerado e extrai os arrays p_camera e p_robot.
-    Retorna (p_camera_np, p_robot_np) ou (None, None) em caso de erro.
-    """
-    p_camera_list = []
-    p_robot_list = []
-    
-    try:
-        with open(filename, 'r') as f:
-            content = f.read()
-    except FileNotFoundError:
-        print(f"ERRO: Arquivo de calibração '{filename}' não encontrado.")
-        return None, None
-    except Exception as e:
-        print(f"ERRO ao ler o arquivo '{filename}': {e}")
-        return None, None
-
-    # Flags para saber qual bloco de dados estamos lendo
-    lendo_camera = False
-    lendo_robot = False
-    
-    # Processa linha por linha para extrair os pontos
-    for line in content.splitlines():
-        line = line.strip()
-        
-        if "p_camera = np.array([" in line:
-            lendo_camera = True
-            lendo_robot = False
-            continue
-            
-        elif "p_robot = np.array([" in line:
-            lendo_camera = False
-            lendo_robot = True
-            continue
-            
-        elif "], dtype=np.float32)" in line:
-            lendo_camera = False
-            lendo_robot = False
-            continue
-            
-        # Extrai os números
-        if lendo_camera or lendo_robot:
-            # Procura por um par de números entre colchetes, ignorando o resto da linha (comentários)
-            if line.startswith('[') and ']' in line:
-                try:
-                    # Remove colchetes e espaços, separa por vírgula
-                    data_str = line.split(']')[0].strip('[')
-                    x, y = map(float, data_str.split(','))
-                    
-                    if lendo_camera:
-                        # Os pontos de câmera são lidos como int, então forçamos a conversão
-                        p_camera_list.append([int(round(x)), int(round(y))])
-                    elif lendo_robot:
-                        # Os pontos do robô já vêm como inteiros (milímetros)
-                        p_robot_list.append([int(round(x)), int(round(y))])
-
-                except ValueError as e:
-                    print(f"Aviso: Linha de dados inválida no arquivo: '{line}'. Erro: {e}")
-
-    if not p_camera_list or not p_robot_list or len(p_camera_list) != len(p_robot_list):
-        print(f"ERRO: Dados de calibração incompletos ou incompatíveis. Câmera: {len(p_camera_list)} pontos, Robô: {len(p_robot_list)} pontos.")
-        return None, None
-        
-    print(f"\n[SUCESSO] Carregados {len(p_camera_list)} pontos de calibração de '{filename}'.")
-    return np.array(p_camera_list, dtype=np.float32), np.array(p_robot_list, dtype=np.float32)
-
-# =========================================================
-# --- CARREGA OS PONTOS E CALCULA A HOMOGRAFIA ---
-# =========================================================
-p_camera, p_robot = carregar_pontos_do_arquivo(NOME_ARQUIVO_PONTOS)
-
-if p_camera is None or p_robot is None:
-    print("ERRO FATAL: Falha ao carregar os pontos de calibração. Verifique se o arquivo existe e o formato está correto.")
-    sys.exit()
-    
-# --- CALCULA A HOMOGRAFIA ---
-H, _ = cv2.findHomography(p_camera, p_robot, cv2.RANSAC)
-if H is None:
-    print("ERRO: Não foi possível calcular a homografia. Verifique os pontos.")
-    sys.exit()
-
-# --- CLASSE DE COMUNICAÇÃO CIP (Sem Alterações) ---
-class FanucCIP:
-    def __init__(self, ip_robot, cam_index=0):
-        self.ip = ip_robot
-        self.cam_index = cam_index
-        self.connected = False
-        self.plc = None
-        self.last_X = 0.0
-        self.last_Y = 0.0
-        self.last_Angle = 0.0
-        self.last_Color_ID = 0 # 1=Azul, 2=Vermelho
-
-    def connect(self):
-        try:
-            self.plc = CIPDriver(self.ip)
-            self.plc.open()
-            self.connected = True
-            print(f"Conectado ao robô Fanuc em {self.ip}")
-            return True
-        except Exception as e:
-            print(f"Erro na conexão CIP: {e}")
-            self.connected = False
-            return False
-
-    def disconnect(self):
-        if self.connected:
-            try:
-                self.plc.close()
-                print("Desconectado do robô CIP.")
-            except Exception as e:
-                print(f"Erro ao desconectar: {e}")
-            finally:
-                self.connected = False
-
-    def write_cip_explicit_register(self, register_index, value):
-        if not self.connected:
-            return False
-        try:
-            # Se for float (coordenada ou ângulo), precisamos garantir que seja convertido para INT para o CIP
-            int_value = int(round(float(value)))
-            
-            # Fanuc usa INT32 no registrador (DINT no RSLogix, ou similar no Fanuc)
-            # O pycomm3 usa 4 bytes (INT32) e 'little' endian por padrão para CIP explícito
-            # Convertemos para bytes para enviar como dados brutos (pycomm3.generic_message espera bytes)
-            data_payload = int_value.to_bytes(4, 'little', signed=True) 
-            
-            response = self.plc.generic_message(
-                service=Services.set_attribute_single,
-                class_code=0x6B,
-                instance=0x01,
-                attribute=register_index,
-                request_data=data_payload,
-                connected=True # Conectado ou Unconnected (geralmente Connected para Fanuc/CIP)
-            )
-            if response.error:
-                # O Fanuc retorna um código de erro no status do CIP
-                print(f"ERRO CIP ESCRITA R[{register_index}]: {response.error}")
-                return False
-            return True
-        except Exception as e:
-            print(f"ERRO EXCEÇÃO ESCRITA CIP R[{register_index}]: {e}")
-            return False
-
-    # --- FUNÇÕES DE PULSO ---
-    def _pulse_flag_threaded(self, register_index, duration_sec):
-        try:
-            print(f"THREAD: Ligando R[{register_index}]...")
-            success_on = self.write_cip_explicit_register(register_index, 1)
-            time.sleep(duration_sec)
-            print(f"THREAD: Desligando R[{register_index}]...")
-            success_off = self.write_cip_explicit_register(register_index, 0)
-            if not (success_on and success_off):
-                print(f"THREAD: Erro ao pulsar R[{register_index}].")
-        except Exception as e:
-            print(f"THREAD: Exceção na thread do pulso: {e}")
-
-    def pulse_flag(self, register_index, duration_sec=1.0):
-        if not self.connected:
-            print("ERRO (Pulso): Robô desconectado.")
-            return
-        # Cria uma thread para não bloquear o loop de visão
-        pulse_thread = threading.Thread(
-            target=self._pulse_flag_threaded,
-            args=(register_index, duration_sec)
-        )
-        pulse_thread.daemon = True
-        pulse_thread.start()
-    # --- FIM DAS FUNÇÕES DE PULSO ---
-
-    def aplicar_homografia(self, x_pixel, y_pixel):
-        global H
-        ponto_pixel = np.array([[[x_pixel, y_pixel]]], dtype=np.float32)
-        ponto_robo_transformado = cv2.perspectiveTransform(ponto_pixel, H)
-        X_robo = ponto_robo_transformado[0][0][0]
-        Y_robo = ponto_robo_transformado[0][0][1]
-        return X_robo, Y_robo
-
-    def _processar_contornos(self, contornos, cor_id, lista_blocos, frame_para_desenho):
-        """
-        Função auxiliar para encontrar blocos, calcular dados e desenhar.
-        cor_id: 1 para Azul, 2 para Vermelho
-        """
-        cor_desenho = (0, 255, 0) if cor_id == 1 else (0, 0, 255)
-
-        for c in contornos:
-            if cv2.contourArea(c) > 100:
-                rect = cv2.minAreaRect(c)
-                (x_pixel, y_pixel), (width, height), angle = rect
-
-                # --- LÓGICA DE ÂNGULO REINTRODUZIDA ---
-                # A lógica de ângulo permanece a mesma da sua versão original
-                angulo_real = angle
-                
-                if angulo_real > 45:
-                    angulo_real = angulo_real - 45
-                else:
-                    angulo_real = -angulo_real
-
-                
-                # Aplica a homografia
-                X_robot, Y_robot = self.aplicar_homografia(x_pixel, y_pixel)
-
-                # Desenha o contorno
-                box = cv2.boxPoints(rect)
-                box = np.intp(box)
-                cv2.drawContours(frame_para_desenho, [box], 0, cor_desenho, 2)
-
-                # Adiciona o bloco válido à lista
-                lista_blocos.append({
-                    'x_pixel': x_pixel,
-                    'x_robo': X_robot,
-                    'y_robo': Y_robot,
-                    'angulo': angulo_real,
-                    'cor_id': cor_id,
-                })
-
-    def run_vision_and_send(self):
-        cap = cv2.VideoCapture(self.cam_index)
-        if not cap.isOpened():
-            print(f"Erro: não foi possível abrir a câmera ({self.cam_index}).")
-            return
-
-        # --- Configurando a Resolução ---
-        desired_width = 1920
-        desired_height = 1080
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, desired_width)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, desired_height)
-        width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
-        height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
-        print(f"Resolução da câmera definida para: {width}x{height}")
-        # ------------------------------------
-
-        print("\n--- VISÃO 2D (MULTI-COR) e ENVIO CIP (COM ÂNGULO) ---")
-        print("Pressione 'v' para enviar (X, Y, Ângulo, Cor) do bloco MAIS À DIREITA.")
-        print("Pressione 'ESC' para sair.")
-        print("------------------------------------------------------\n")
-
-        DETECTION_SUCCESS = False
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            DETECTION_SUCCESS = False
-            blocos_detectados = []
-
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-            # --- Processar Cor Azul ---
-            mascara_azul = cv2.inRange(hsv, limite_inferior_azul, limite_superior_azul)
-            mascara_azul = cv2.erode(mascara_azul, None, iterations=2)
-            mascara_azul = cv2.dilate(mascara_azul, None, iterations=2)
-            contornos_azul, _ = cv2.findContours(mascara_azul, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            self._processar_contornos(contornos_azul, 1, blocos_detectados, frame)
-
-            # --- Processar Cor Vermelha ---
-            mascara_v1 = cv2.inRange(hsv, limite_inferior_vermelho1, limite_superior_vermelho1)
-            mascara_v2 = cv2.inRange(hsv, limite_inferior_vermelho2, limite_superior_vermelho2)
-            mascara_vermelho = cv2.bitwise_or(mascara_v1, mascara_v2)
-            mascara_vermelho = cv2.erode(mascara_vermelho, None, iterations=2)
-            mascara_vermelho = cv2.dilate(mascara_vermelho, None, iterations=2)
-            contornos_vermelho, _ = cv2.findContours(mascara_vermelho, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            self._processar_contornos(contornos_vermelho, 2, blocos_detectados, frame)
-
-            # --- Máscara combinada (para exibição) ---
-            mascara_total = cv2.bitwise_or(mascara_azul, mascara_vermelho)
-
-            # --- Seleção de Alvo (O MAIS À DIREITA) ---
-            if len(blocos_detectados) > 0:
-                # Encontra o bloco com o MAIOR 'x_pixel'
-                bloco_alvo = max(blocos_detectados, key=lambda b: b['x_pixel'])
-
-                # Armazena os dados do alvo para envio
-                self.last_X = bloco_alvo['x_robo']
-                self.last_Y = bloco_alvo['y_robo']
-                self.last_Angle = bloco_alvo['angulo']
-                self.last_Color_ID = bloco_alvo['cor_id']
-                DETECTION_SUCCESS = True
-
-                # Atualiza o HUD
-                cor_nome = "Azul" if self.last_Color_ID == 1 else "Vermelho"
-                robo_texto = f"ALVO (Direita): X={self.last_X:.1f} Y={self.last_Y:.1f} A={self.last_Angle:.1f} Cor={cor_nome}({self.last_Color_ID})"
-                cv2.putText(frame, robo_texto, (5, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-            # --- Status de Envio na Tela ---
-            if DETECTION_SUCCESS:
-                status_conn = "PRONTO para 'v'" if self.connected else "DESCONECTADO"
-                texto_status = f"Status: {status_conn}"
-                cor_texto = (0, 255, 255) # Amarelo
-                cv2.putText(frame, texto_status, (5, 75), cv2.FONT_HERSHEY_SIMPLEX, 0.7, cor_texto, 2)
-
-            elif not DETECTION_SUCCESS:
-                status_msg = "BUSCANDO OBJETOS..." if self.connected else "DESCONECTADO! BUSCANDO OBJETOS..."
-                cv2.putText(frame, status_msg, (5, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-
-            # Redimensiona a janela de exibição para caber na tela
-            frame_display = cv2.resize(frame, (1280, 720), interpolation=cv2.INTER_AREA)
-            mascara_display = cv2.resize(mascara_total, (1280, 720), interpolation=cv2.INTER_NEAREST)
-
-            cv2.imshow('Frame Original (1080p)', frame_display)
-            cv2.imshow('Mascara (Azul e Vermelho)', mascara_display)
-
-            # --- MONITORAMENTO DE TECLAS ---
-            key = cv2.waitKey(1) & 0xFF
-            if key == 27: # ESC para Sair
-                break
-
-            if key == ord('v'): # 'v' para enviar TUDO
-                if self.connected and DETECTION_SUCCESS:
-                    print("\nTecla 'v' pressionada. Enviando dados do alvo (mais à direita)...")
-
-                    # 1. Envia X, Y, Ângulo e COR
-                    success_X = self.write_cip_explicit_register(1, self.last_X)
-                    success_Y = self.write_cip_explicit_register(2, self.last_Y)
-                    success_A = self.write_cip_explicit_register(3, self.last_Angle)
-                    success_C = self.write_cip_explicit_register(4, self.last_Color_ID)
-
-                    if success_X and success_Y and success_A and success_C:
-                        print(f"ENVIO COORDENADAS OK: X={self.last_X:.1f}, Y={self.last_Y:.1f}, A={self.last_Angle:.1f}, COR={self.last_Color_ID}")
-
-                        # 2. Pulsa R[5]
-                        self.pulse_flag(5, 1.0)
-
-                    else:
-                        print("Falha ao enviar coordenadas (X, Y, A ou C) CIP.")
-                        if not self.connected:
-                            print("Tentando reconectar...")
-                            self.connect()
-
-                elif not self.connected:
-                    print("ERRO: Robô desconectado.")
-                else:
-                    print("ERRO: Nenhum objeto detectado.")
-
-        # Libera a câmera e fecha as janelas
-        cap.release()
-        cv2.destroyAllWindows()
-
-# --- PONTO DE ENTRADA DO SCRIPT ---
-if __name__ == "__main__":
-    # **ALTERE O IP E O ÍNDICE DA CÂMERA AQUI**
-    ip_robot = "192.168.1.100"
-    camera_index = 1
-    # *****************************************
-
-    fanuc = FanucCIP(ip_robot, camera_index)
-
-    # Tenta conectar e rodar
-    if fanuc.connect():
-        fanuc.run_vision_and_send()
-        fanuc.disconnect()
-    else:
-        # Se não conectar, roda mesmo assim (apenas para debug da visão)
-        print("Rodando apenas visão (sem conexão CIP).")
-        fanuc.run_vision_and_send()
\ No newline at end of file
+import struct
+import sys
+import os
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))  # Raiz do repositório (pacote 'comum')
+from comum import importar_sob_demanda
+from comum.calibracao import Calibracao
+from comum.captura import abrir_camera
+from comum.display import Display
+from comum.segmentacao import segmentar_blocos
+from comum.framebus import PipelineProcessos
+from comum.selecao import criar_seletor
+from comum.cip import SessaoRobo
+from comum.cores import ModeloCorAdaptativo
+from comum.oclusao import PortaoOclusao, ESTAVEL
+from comum.mudanca import FiltroMudanca
+from comum.buffers import pool_da_thread
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- NOME DO ARQUIVO DE CALIBRAÇÃO ---
+# Deve ser o mesmo nome que o script de calibração está salvando
+NOME_ARQUIVO_PONTOS = "pontos_calibracao.txt" 
+# ------------------------------------
+
+# --- CORREÇÃO DA LENTE (arquivo gerado por calibralente.py) ---
+# 'pontos': corrige só os centróides detectados (barato, recomendado)
+# 'frame':  remapeia o frame inteiro antes da detecção (mais caro)
+# None:     sem correção
+MODO_LENTE = "pontos"
+# ------------------------------------
+
+# --- PROCESSOS ---
+# True = captura e segmentação em processos separados (comum/framebus.py),
+# usando mais de um núcleo; este processo fica só com a interface e o CIP.
+MODO_PROCESSOS = False
+N_SEGMENTADORES = 1
+# ------------------------------------
+
+# --- SELEÇÃO DO ALVO E ENVIO ---
+# Estratégia (comum/selecao.py): 'direita' (original), 'proximo' (mais perto do robô),
+# 'menos_ocluido', 'prioridade_cor' ou 'lote' (planeja a ordem de todos os blocos visíveis)
+ESTRATEGIA_ALVO = "direita"
+PRIORIDADE_CORES = (1, 2)  # Para 'prioridade_cor': 1=Azul, 2=Vermelho
+# 'manual': tecla 'v' envia o alvo e pulsa R[5] por 1 s (programa original do robô)
+# 'auto':   envia o próximo alvo assim que o robô libera: Python liga R[5]=1 e o robô zera R[5] ao terminar
+MODO_ENVIO = "manual"
+REG_FLAG = 5
+REG_POS_X = 6  # Posição atual do robô em mm (escrita pelo programa do robô); usada por 'proximo' e 'lote'
+REG_POS_Y = 7
+DISTANCIA_REPETIDA_MM = 5.0  # Modo auto: não reenvia o mesmo alvo...
+TEMPO_REPETIDO_S = 1.0       # ...antes deste tempo (frame ainda sem a peça removida)
+# Formato do alvo (comum/cip.py); a cor vai sempre em R[4] como inteiro:
+# 'int':  X, Y e ângulo arredondados para inteiros em R[1..3] (programa original do robô)
+# 'real': os mesmos R[1..3], escritos como REAL: sem perder os décimos de mm e de grau
+# 'pr':   X, Y e ângulo (no R do PR) em PR[PR_ALVO], em uma transação só; Z, W e P ficam
+#         os que estão gravados no PR do robô. O programa do robô deve ir para PR[PR_ALVO].
+TRANSPORTE_ALVO = "int"
+PR_ALVO = 10
+# ------------------------------------
+
+# --- PORTÃO DE OCLUSÃO ---
+# True = só envia alvos com a bandeja parada e sem mão/braço na frente (comum/oclusao.py):
+# o modo auto espera a cena ficar estável; 'v' é recusado enquanto ela se mexe.
+PORTAO_OCLUSAO = True
+ROI_OCLUSAO = None        # (x, y, largura, altura) em pixels da área de pick; None = frame inteiro
+FRAMES_CENA_ESTAVEL = 5
+# ------------------------------------
+
+# --- FILTRO DE MUDANÇA ---
+# True = a segmentação só roda de novo quando a área de pick (ROI_OCLUSAO) muda ou a cada
+# INTERVALO_REFRESCO_DETECCAO s (comum/mudanca.py); com a bandeja parada reaproveita a última detecção.
+FILTRO_MUDANCA = True
+INTERVALO_REFRESCO_DETECCAO = 1.0
+# ------------------------------------
+
+# --- LOG CIP ---
+# Cada transação (registrador, valor, latência, erro) em JSON-lines; None = só em memória.
+# A tecla 't' imprime as latências e taxas de erro por registrador.
+ARQUIVO_TRAFEGO_CIP = None # Ex.: "trafego_cip.jsonl"
+# ------------------------------------
+
+# --- EXIBIÇÃO ---
+HEADLESS = False          # True = sem janelas (produção); Ctrl+C encerra
+FPS_EXIBICAO = 15         # Taxa máxima de renderização (a visão roda na taxa da câmera)
+MOSTRAR_MASCARA = False   # Janela da máscara (só para ajuste/depuração)
+# ------------------------------------
+
+# --- FAIXAS DE COR (AZUL e VERMELHA) ---
+# Lidas do perfil de cor (perfil_cor.json, gerado por calibradorcor.py); sem ele,
+# as de comum/segmentacao.py (FAIXAS_HSV), usadas também pelo gameplay.
+# True = parte dessas faixas e aprende as cores com cada peça enviada ao robô
+# (comum/cores.py), acompanhando a luz do turno. Não vale no MODO_PROCESSOS.
+# A tecla 'm' imprime o modelo atual.
+MODELO_COR_ADAPTATIVO = False
+
+
+# --- CLASSE DE COMUNICAÇÃO CIP (Sem Alterações) ---
+class FanucCIP:
+    def __init__(self, ip_robot, cam_index=0):
+        self.ip = ip_robot
+        self.cam_index = cam_index
+        self.calibracao = Calibracao(NOME_ARQUIVO_PONTOS, MODO_LENTE) # Homografia, lente e cores: lidas no primeiro uso
+        self.sessao = None # comum.cip.SessaoRobo (pool, keep-alive e reconexão com backoff)
+        self.last_X = 0.0
+        self.last_Y = 0.0
+        self.last_Angle = 0.0
+        self.last_Color_ID = 0 # 1=Azul, 2=Vermelho
+        self.display = None # Criado em run_vision_and_send (pode ser injetado antes)
+        self.seletor = criar_seletor(ESTRATEGIA_ALVO, **({'prioridade_cores': PRIORIDADE_CORES} if ESTRATEGIA_ALVO == "prioridade_cor" else {}))
+        self.robot_is_busy = False # Modo auto: aguardando o robô zerar R[5]
+        self.posicao_robo = None   # (X, Y) em mm, lida de R[6]/R[7]
+        self.ultimo_envio = None   # (X, Y, instante)
+        self.picks_enviados = 0; self.t_primeiro_pick = None
+        self.modelo_cor = ModeloCorAdaptativo(self.calibracao.faixas_cor) if MODELO_COR_ADAPTATIVO and not MODO_PROCESSOS else None
+        self._frame_atual = None # Frame da detecção, para o modelo de cor aprender com o alvo enviado
+        self.portao = PortaoOclusao(ROI_OCLUSAO, frames_estaveis=FRAMES_CENA_ESTAVEL) if PORTAO_OCLUSAO else None
+        self.filtro = FiltroMudanca(ROI_OCLUSAO, intervalo_refresco=INTERVALO_REFRESCO_DETECCAO) if FILTRO_MUDANCA else None
+
+    @property
+    def connected(self):
+        """Estado ao vivo da sessão (False enquanto ela reconecta em segundo plano)."""
+        return self.sessao is not None and self.sessao.conectado
+
+    def connect(self):
+        """Inicia a sessão CIP. Se o robô não responder agora, ela segue tentando em segundo plano."""
+        if self.sessao is None:
+            self.sessao = SessaoRobo(self.ip, arquivo_trafego=ARQUIVO_TRAFEGO_CIP)
+        return self.sessao.conectar()
+
+    def disconnect(self):
+        if self.sessao is not None:
+            self.sessao.fechar()
+            self.sessao = None
+            print("Desconectado do robô CIP.")
+
+    def write_cip_explicit_register(self, register_index, value, forcar=False):
+        # INT32 little-endian em R[register_index]; falha na hora se a sessão estiver caída.
+        # Valores que o robô já tem não são reenviados (espelho da sessão), a menos que forcar=True.
+        if self.sessao is None:
+            return False
+        return self.sessao.write_register(register_index, value, forcar=forcar)
+
+    def read_register(self, register_index):
+        """Lê um valor (INT32) do registrador R[]."""
+        if not self.connected:
+            return None, False
+        return self.sessao.read_register(register_index)
+
+    def atualizar_posicao_robo(self):
+        """Lê a posição atual do robô (R[6], R[7]). Sem leitura, mantém a posição do último alvo enviado."""
+        x, x_ok = self.read_register(REG_POS_X)
+        y, y_ok = self.read_register(REG_POS_Y)
+        if x_ok and y_ok:
+            self.posicao_robo = (x, y)
+        return self.posicao_robo
+
+    # --- FUNÇÕES DE PULSO ---
+    def pulse_flag(self, register_index, duration_sec=1.0):
+        # Agendado na thread de pulsos da sessão (uma só, persistente) para não bloquear o loop de visão
+        if self.sessao is None or not self.sessao.pulsar(register_index, duration_sec):
+            print("ERRO (Pulso): Robô desconectado.")
+    # --- FIM DAS FUNÇÕES DE PULSO ---
+
+    def aplicar_homografia(self, x_pixel, y_pixel):
+        ponto_robo_transformado = self.aplicar_homografia_pontos([(x_pixel, y_pixel)])
+        X_robo = ponto_robo_transformado[0][0]
+        Y_robo = ponto_robo_transformado[0][1]
+        return X_robo, Y_robo
+
+    def aplicar_homografia_pontos(self, pontos):
+        """N pontos (x, y) em pixels -> array (N, 2) em mm do robô, em uma chamada só (lente + homografia)."""
+        return self.calibracao.pixels_para_robo(pontos)
+
+    def _processar_blocos(self, segmentados, lista_blocos, quadro=None):
+        """
+        Função auxiliar para calcular dados (homografia, ângulo) e desenhar.
+        segmentados: saída de segmentar_blocos (cor_id 1 = Azul, 2 = Vermelho)
+        quadro: Quadro do Display (None = não desenha)
+        """
+        # Homografia de todos os centros em uma chamada só
+        pontos_robo = self.aplicar_homografia_pontos([bloco['rect'][0] for bloco in segmentados])
+        for bloco, (X_robot, Y_robot) in zip(segmentados, pontos_robo):
+            cor_id = bloco['cor_id']
+            cor_desenho = (0, 255, 0) if cor_id == 1 else (0, 0, 255)
+            rect = bloco['rect']
+            (x_pixel, y_pixel), (width, height), angle = rect
+
+            # --- LÓGICA DE ÂNGULO REINTRODUZIDA ---
+            # A lógica de ângulo permanece a mesma da sua versão original
+            angulo_real = angle
+            
+            if angulo_real > 45:
+                angulo_real = angulo_real - 45
+            else:
+                angulo_real = -angulo_real
+
+            # Desenha o contorno
+            if quadro is not None:
+                quadro.caixa(cv2.boxPoints(rect), cor_desenho, 2)
+
+            # Adiciona o bloco válido à lista
+            lista_blocos.append({
+                'x_pixel': x_pixel,
+                'x_robo': X_robot,
+                'y_robo': Y_robot,
+                'angulo': angulo_real,
+                'cor_id': cor_id,
+                'rect': rect,
+            })
+
+    def _selecionar_alvo(self, blocos):
+        """Escolhe o alvo com a estratégia configurada e guarda em last_*. Retorna o bloco ou None."""
+        bloco_alvo = self.seletor.escolher(blocos, self.posicao_robo)
+        if bloco_alvo is not None:
+            self.last_X = bloco_alvo['x_robo']
+            self.last_Y = bloco_alvo['y_robo']
+            self.last_Angle = bloco_alvo['angulo']
+            self.last_Color_ID = bloco_alvo['cor_id']
+        return bloco_alvo
+
+    def _enviar_alvo(self, bloco_alvo):
+        """Envia X, Y, Ângulo e Cor do alvo (R[1..4]) e dispara o robô em R[5]."""
+        if MODO_ENVIO == "auto" and self.ultimo_envio is not None:
+            ux, uy, ut = self.ultimo_envio
+            if (abs(bloco_alvo['x_robo'] - ux) < DISTANCIA_REPETIDA_MM and abs(bloco_alvo['y_robo'] - uy) < DISTANCIA_REPETIDA_MM
+                    and time.monotonic() - ut < TEMPO_REPETIDO_S):
+                return False # Provavelmente o mesmo bloco ainda na imagem
+
+        # 1. Envia X, Y, Ângulo e COR
+        if not self._escrever_alvo():
+            print("Falha ao enviar coordenadas (X, Y, A ou C) CIP.")
+            if not self.connected:
+                print("Robô desconectado; a sessão está reconectando em segundo plano.")
+            return False
+
+        print(f"ENVIO COORDENADAS OK: X={self.last_X:.1f}, Y={self.last_Y:.1f}, A={self.last_Angle:.1f}, COR={self.last_Color_ID}")
+
+        # 2. Dispara o robô
+        if MODO_ENVIO == "auto":
+            if not self.write_cip_explicit_register(REG_FLAG, 1):
+                print(f"Falha ao LIGAR R[{REG_FLAG}]!")
+                return False
+            self.robot_is_busy = True
+        else:
+            self.pulse_flag(REG_FLAG, 1.0)
+
+        self.seletor.confirmar(bloco_alvo)
+        if self.modelo_cor is not None and self._frame_atual is not None:
+            self.modelo_cor.aprender(self._frame_atual, bloco_alvo['rect'], bloco_alvo['cor_id'])
+        self.posicao_robo = (self.last_X, self.last_Y) # Melhor estimativa até a próxima leitura de R[6]/R[7]
+        self.ultimo_envio = (self.last_X, self.last_Y, time.monotonic())
+        self.picks_enviados += 1
+        if self.t_primeiro_pick is None:
+            self.t_primeiro_pick = time.monotonic()
+        return True
+
+    def _escrever_alvo(self):
+        """Escreve last_X/Y/Angle no formato TRANSPORTE_ALVO e a cor em R[4]."""
+        if self.sessao is None:
+            return False
+        if TRANSPORTE_ALVO == "pr":
+            ok = self.sessao.write_posicao(PR_ALVO, x=self.last_X, y=self.last_Y, r=self.last_Angle)
+        elif TRANSPORTE_ALVO == "real":
+            ok = (self.sessao.write_real(1, self.last_X) and self.sessao.write_real(2, self.last_Y)
+                  and self.sessao.write_real(3, self.last_Angle))
+        else:
+            ok = (self.write_cip_explicit_register(1, self.last_X) and self.write_cip_explicit_register(2, self.last_Y)
+                  and self.write_cip_explicit_register(3, self.last_Angle))
+        return ok and self.write_cip_explicit_register(4, self.last_Color_ID)
+
+    def picks_por_hora(self):
+        if self.picks_enviados < 2:
+            return 0.0
+        return (self.picks_enviados - 1) * 3600.0 / max(time.monotonic() - self.t_primeiro_pick, 1e-6)
+
+    def run_vision_and_send(self):
+        calib = self.calibracao
+        if not calib.carregar():
+            return
+        if MODO_PROCESSOS:
+            arquivo_lente = calib.arquivo_lente if calib.corrige_frame else None
+            cap = PipelineProcessos(self.cam_index, n_segmentadores=N_SEGMENTADORES, arquivo_lente=arquivo_lente,
+                                    funcao_segmentar=partial(segmentar_blocos, faixas=calib.faixas_cor, area_minima=calib.area_minima_cor),
+                                    # Cada segmentador recebe uma cópia; no modo auto todo resultado pode virar comando,
+                                    # e o segmentador do processo não tem como ser forçado: sem filtro
+                                    filtro_mudanca=self.filtro if MODO_ENVIO != "auto" else None)
+        else:
+            cap = abrir_camera(self.cam_index, 1920, 1080)
+        if not cap.isOpened():
+            print(f"Erro: não foi possível abrir a câmera ({self.cam_index}).")
+            return
+
+        # --- Resolução (formato, FPS e exposição: comum/captura.py) ---
+        width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+        height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        print(f"Resolução da câmera definida para: {width}x{height}")
+        # ------------------------------------
+
+        print("\n--- VISÃO 2D (MULTI-COR) e ENVIO CIP (COM ÂNGULO) ---")
+        if MODO_ENVIO == "auto":
+            print(f"MODO AUTOMÁTICO: o próximo alvo ('{self.seletor.nome}') é enviado assim que o robô zerar R[{REG_FLAG}].")
+        else:
+            print(f"Pressione 'v' para enviar (X, Y, Ângulo, Cor) do alvo ('{self.seletor.nome}').")
+        print("Pressione 't' para ver o tráfego CIP e 'ESC' para sair.")
+        print("------------------------------------------------------\n")
+
+        if self.display is None:
+            self.display = Display('Frame Original (1080p)', fps_max=FPS_EXIBICAO, headless=HEADLESS,
+                                   nome_janela_mascara='Mascara (Azul e Vermelho)' if MOSTRAR_MASCARA else None)
+
+        DETECTION_SUCCESS = False
+        frame_corrigido = None # Buffer reutilizado pelo modo de lente 'frame'
+        pool = pool_da_thread() # Buffers da segmentação (HSV, máscaras, morfologia)
+
+        leitura = None # Buffer da captura, reutilizado (a correção de lente escreve em outro)
+        while True:
+            ret, leitura = cap.read() if MODO_PROCESSOS else cap.read(leitura)
+            frame = leitura
+            if not ret:
+                break
+
+            if calib.corrige_frame and not MODO_PROCESSOS: # No modo processos a captura já corrige
+                frame = frame_corrigido = calib.corretor_lente.corrigir_frame(frame, dst=frame_corrigido)
+            cena_estavel = self.portao is None or self.portao.atualizar(frame) == ESTAVEL
+
+            DETECTION_SUCCESS = False
+            blocos_detectados = []
+            # Só monta o desenho quando o Display vai de fato renderizar este frame
+            quadro = self.display.novo_quadro() if self.display.deve_renderizar() else None
+
+            # --- Handshake (modo auto): o robô zera R[5] ao terminar o pick ---
+            if MODO_ENVIO == "auto" and self.robot_is_busy and self.connected:
+                flag_value, read_ok = self.read_register(REG_FLAG)
+                if read_ok and flag_value == 0:
+                    print(f"(Loop) R[{REG_FLAG}] = 0. Robô liberado.")
+                    self.robot_is_busy = False
+            # Decidido antes da segmentação: o que vai virar comando não sai do resultado guardado pelo filtro
+            enviar_agora = MODO_ENVIO == "auto" and self.connected and not self.robot_is_busy and cena_estavel
+
+            # --- Segmentação (Azul e Vermelho) ---
+            # Com o filtro de mudança, só roda quando a bandeja mudou; a máscara combinada só é
+            # montada se a janela da máscara existir, e só é entregue nos frames exibidos
+            mascara_total = None
+            com_mascara = self.display.mostra_mascara and not MODO_PROCESSOS
+            segmentar = partial(segmentar_blocos, faixas=calib.faixas_cor, area_minima=calib.area_minima_cor, retornar_mascara=com_mascara, modelo=self.modelo_cor)
+            if MODO_PROCESSOS:
+                segmentados = cap.ultimos_blocos # Já segmentado no processo de segmentação
+            else:
+                resultado = segmentar(frame) if self.filtro is None else self.filtro.obter(frame, segmentar, forcar=enviar_agora)
+                segmentados, mascara_total = resultado if com_mascara else (resultado, None)
+                if quadro is None: mascara_total = None
+            self._frame_atual = frame
+            self._processar_blocos(segmentados, blocos_detectados, quadro)
+
+            # --- Seleção de Alvo ---
+            # Só escolhe quando o resultado é usado: HUD deste frame ou envio automático
+            bloco_alvo = None
+            if len(blocos_detectados) > 0 and (quadro is not None or enviar_agora):
+                if enviar_agora:
+                    self.atualizar_posicao_robo()
+                bloco_alvo = self._selecionar_alvo(blocos_detectados)
+                DETECTION_SUCCESS = bloco_alvo is not None
+
+                # Atualiza o HUD
+                if quadro is not None and DETECTION_SUCCESS:
+                    cor_nome = "Azul" if self.last_Color_ID == 1 else "Vermelho"
+                    robo_texto = f"ALVO ({self.seletor.nome}): X={self.last_X:.1f} Y={self.last_Y:.1f} A={self.last_Angle:.1f} Cor={cor_nome}({self.last_Color_ID})"
+                    quadro.texto(robo_texto, (5, 50), 0.7, (0, 255, 0), 2)
+                    quadro.caixa(cv2.boxPoints(bloco_alvo['rect']), (0, 255, 255), 4)
+
+            if enviar_agora and bloco_alvo is not None:
+                self._enviar_alvo(bloco_alvo)
+
+            # --- Status de Envio na Tela ---
+            if quadro is None:
+                pass
+            elif DETECTION_SUCCESS:
+                if not self.connected:
+                    status_conn = "DESCONECTADO"
+                elif MODO_ENVIO == "auto":
+                    status_conn = "AUTO: ROBO OCUPADO" if self.robot_is_busy else "AUTO: ENVIANDO" if cena_estavel else f"AUTO: CENA {self.portao.estado}"
+                else:
+                    status_conn = "PRONTO para 'v'"
+                texto_status = f"Status: {status_conn} | Picks: {self.picks_enviados} ({self.picks_por_hora():.0f}/h)"
+                if self.filtro is not None and not MODO_PROCESSOS: texto_status += f" | Reuso: {100 * self.filtro.fracao_reaproveitada:.0f}%"
+                cor_texto = (0, 255, 255) # Amarelo
+                quadro.texto(texto_status, (5, 75), 0.7, cor_texto, 2)
+
+            elif not DETECTION_SUCCESS:
+                status_msg = "BUSCANDO OBJETOS..." if self.connected else "DESCONECTADO! BUSCANDO OBJETOS..."
+                quadro.texto(status_msg, (5, 25), 0.6, (0, 0, 255), 2)
+
+            # Entrega ao Display (reduz para 1280x720 e desenha na thread de exibição)
+            if quadro is not None:
+                self.display.publicar(frame, quadro, mascara_total)
+
+            # --- MONITORAMENTO DE TECLAS ---
+            pool.fim_do_quadro() # Alocações do pipeline neste frame (comum/buffers.py, DEBUG_ALOCACOES)
+            key = self.display.ler_tecla()
+            if key == 27: # ESC para Sair
+                break
+
+            if key == ord('t') and self.sessao is not None: # Latências e erros CIP por registrador
+                self.sessao.trafego.imprimir_resumo()
+
+            if key == ord('m') and self.modelo_cor is not None: # Cores aprendidas até agora
+                print(self.modelo_cor.resumo())
+
+            if key == ord('v') and MODO_ENVIO == "manual": # 'v' para enviar TUDO
+                if not cena_estavel:
+                    print(f"\nTecla 'v': cena em {self.portao.estado} (mão/braço sobre a bandeja?). Aguarde ela parar.")
+
+                elif not self.connected:
+                    print("ERRO: Robô desconectado.")
+
+                else:
+                    if self.filtro is not None:
+                        # O resultado do filtro pode ter até INTERVALO_REFRESCO_DETECCAO: o comando sai deste frame.
+                        # No modo processos o segmentador não tem como ser forçado; segmenta aqui mesmo
+                        resultado = segmentar(frame) if MODO_PROCESSOS else self.filtro.obter(frame, segmentar, forcar=True)
+                        blocos_detectados = []
+                        self._processar_blocos(resultado[0] if com_mascara else resultado, blocos_detectados)
+                    if len(blocos_detectados) > 0:
+                        # Escolhe no momento do envio, com a posição atual do robô
+                        self.atualizar_posicao_robo()
+                        bloco_alvo = self._selecionar_alvo(blocos_detectados)
+                        print(f"\nTecla 'v' pressionada. Enviando dados do alvo ({self.seletor.nome})...")
+                        self._enviar_alvo(bloco_alvo)
+                    else:
+                        print("ERRO: Nenhum objeto detectado.")
+
+        # Libera a câmera e fecha as janelas
+        cap.release()
+        self.display.fechar()
+
+# --- PONTO DE ENTRADA DO SCRIPT ---
+if __name__ == "__main__":
+    # **ALTERE O IP E O ÍNDICE DA CÂMERA AQUI**
+    ip_robot = "192.168.1.100"
+    camera_index = 1
+    # *****************************************
+
+    fanuc = FanucCIP(ip_robot, camera_index)
+    if not fanuc.calibracao.carregar():
+        sys.exit(1)
+
+    # Conecta e roda; sem robô, roda só a visão enquanto a sessão tenta reconectar
+    if not fanuc.connect():
+        print("Rodando apenas visão até o robô responder.")
+    try:
+        fanuc.run_vision_and_send()
+    finally:
+        fanuc.disconnect()
\ No newline at end of file
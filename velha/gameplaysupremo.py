@@ -1,384 +1,570 @@
-import struct
-import cv2
-import numpy as np
-from pycomm3 import CIPDriver, Services
-import sys
-import time
-import threading
-import math
-import json
-
-# --- NOMES DOS ARQUIVOS DE CONFIGURAÇÃO ---
-NOME_ARQUIVO_PONTOS = "pontos_calibracao.txt"
-NOME_ARQUIVO_GRID = "grid_calibracao.txt" # Contém coordenadas em pixels dos 9 centros
-# ------------------------------------
-
-# --- Dimensões ---
-ORIGINAL_WIDTH = 1920
-ORIGINAL_HEIGHT = 1080
-DISPLAY_WIDTH = 1280
-DISPLAY_HEIGHT = 720
-# ------------------------------
-
-# --- Faixas de Cor ---
-limite_inferior_azul = np.array([80, 120, 70])
-limite_superior_azul = np.array([150, 255, 255])
-limite_inferior_vermelho1 = np.array([0, 100, 100])
-limite_superior_vermelho1 = np.array([10, 255, 255])
-limite_inferior_vermelho2 = np.array([170, 100, 100])
-limite_superior_vermelho2 = np.array([180, 255, 255])
-# -----------------------------------------------------------
-
-# Tempo de espera antes da limpeza (segundos)
-CLEANUP_DELAY_SECONDS = 5.0
-
-# =========================================================
-# --- CARREGAR PONTOS DE HOMOGRAFIA DO ARQUIVO ---
-# =========================================================
-def carregar_pontos_do_arquivo(filename):
-    p_camera_list = []
-    p_robot_list = []
-    try:
-        with open(filename, 'r') as f: content = f.read()
-    except FileNotFoundError: print(f"ERRO: Arquivo '{filename}' não encontrado."); return None, None
-    except Exception as e: print(f"ERRO ao ler '{filename}': {e}"); return None, None
-    lendo_camera = False; lendo_robot = False
-    for line in content.splitlines():
-        line = line.strip()
-        if "p_camera = np.array([" in line: lendo_camera = True; lendo_robot = False; continue
-        elif "p_robot = np.array([" in line: lendo_camera = False; lendo_robot = True; continue
-        elif "], dtype=np.float32)" in line: lendo_camera = False; lendo_robot = False; continue
-        if lendo_camera or lendo_robot:
-            if line.startswith('[') and ']' in line:
-                try:
-                    data_str = line.split(']')[0].strip('[')
-                    x, y = map(float, data_str.split(','))
-                    if lendo_camera: p_camera_list.append([int(round(x)), int(round(y))])
-                    elif lendo_robot: p_robot_list.append([int(round(x)), int(round(y))])
-                except ValueError as e: print(f"Aviso: Linha inválida: '{line}'. Erro: {e}")
-    if not p_camera_list or not p_robot_list or len(p_camera_list) != len(p_robot_list):
-        print(f"ERRO: Dados incompletos. Câmera: {len(p_camera_list)}, Robô: {len(p_robot_list)}."); return None, None
-    print(f"\n[SUCESSO] Carregados {len(p_camera_list)} pontos de calibração de '{filename}'.")
-    return np.array(p_camera_list, dtype=np.float32), np.array(p_robot_list, dtype=np.float32)
-
-# --- Executa o carregamento da Homografia ---
-p_camera, p_robot = carregar_pontos_do_arquivo(NOME_ARQUIVO_PONTOS)
-if p_camera is None or p_robot is None: sys.exit("ERRO FATAL: Falha ao carregar pontos de calibração.")
-H, _ = cv2.findHomography(p_camera, p_robot, cv2.RANSAC)
-if H is None: sys.exit("ERRO: Não foi possível calcular a homografia.")
-# =========================================================
-
-
-# =========================================================
-# --- CARREGAR CENTROS DA GRADE (PIXELS) DO ARQUIVO ---
-# =========================================================
-def carregar_centros_grid_pixels(filename):
-    try:
-        with open(filename, 'r') as f:
-            centros_pixels = json.load(f)
-        if isinstance(centros_pixels, list) and len(centros_pixels) == 9:
-            centros_pixels_tuples = [(int(p[0]), int(p[1])) for p in centros_pixels]
-            print(f"[SUCESSO] Carregados {len(centros_pixels_tuples)} centros da grade (pixels) de '{filename}'.")
-            return centros_pixels_tuples
-        else:
-            print(f"[ERRO] Arquivo '{filename}' não contém lista válida de 9 pontos."); return None
-    except FileNotFoundError: print(f"[ERRO] Arquivo '{filename}' não encontrado."); return None
-    except json.JSONDecodeError: print(f"[ERRO] Arquivo '{filename}' não é JSON válido."); return None
-    except Exception as e: print(f"[ERRO] Falha inesperada ao ler '{filename}': {e}."); return None
-# =========================================================
-
-
-# --- CLASSE DE COMUNICAÇÃO CIP ---
-class FanucTicTacToeAndClean:
-    def __init__(self, ip_robot, cam_index=0):
-        self.ip = ip_robot; self.cam_index = cam_index
-        self.connected = False; self.plc = None
-        self.grid_centers_robo = [] # Coordenadas do Robô
-        self.grid_centers_pixel = None # Coordenadas em Pixel
-        self.grid_min_x = None; self.grid_max_x = None; self.grid_min_y = None; self.grid_max_y = None
-        self.USER_PLAYER_CHAR = 'X'; self.ROBOT_PLAYER_CHAR = 'O'
-        self.game_board = [' '] * 9; self.game_over = False; self.winner = None
-        self.robot_is_busy = False # Flag baseada em R[5]
-        self.cleanup_mode = False; self.last_sent_coords = {}
-        self.waiting_for_cleanup_start = False; self.game_end_time = None
-
-    def connect(self):
-        try:
-            self.plc = CIPDriver(self.ip); self.plc.open(); self.connected = True
-            print(f"Conectado a {self.ip}"); return True
-        except Exception as e: print(f"Erro conexão: {e}"); self.connected = False; return False
-
-    def disconnect(self):
-        if self.connected:
-            print("Garantindo R[5]=0 e R[9]=0...");
-            self.write_cip_explicit_register(5, 0); self.write_cip_explicit_register(9, 0); time.sleep(0.1)
-            try: self.plc.close(); print("Desconectado.")
-            except Exception as e: print(f"Erro desconectar: {e}")
-            finally: self.connected = False
-
-    def write_cip_explicit_register(self, register_index, value):
-        if not self.connected: return False
-        try:
-            int_value = int(round(float(value)))
-            data_payload = int_value.to_bytes(4, 'little', signed=True)
-            response = self.plc.generic_message(
-                service=Services.set_attribute_single, class_code=0x6B, instance=0x01,
-                attribute=register_index, request_data=data_payload, connected=True)
-            if response.error: print(f"ERRO ESCRITA R[{register_index}]: {response.error}"); return False
-            return True
-        except Exception as e: print(f"ERRO EXCEÇÃO ESCRITA R[{register_index}]: {e}"); return False
-
-    def read_register(self, register_index):
-        if not self.connected: return None, False
-        try:
-            response = self.plc.generic_message(
-                service=Services.get_attribute_single, class_code=0x6B, instance=0x01,
-                attribute=register_index, connected=True)
-            if response.error: return None, False
-            value = int.from_bytes(response.value, 'little', signed=True)
-            return value, True
-        except Exception as e: return None, False # Não printa exceção aqui
-
-    def aplicar_homografia(self, x_pixel, y_pixel):
-        global H; pt = np.array([[[x_pixel, y_pixel]]], dtype=np.float32); trans = cv2.perspectiveTransform(pt, H); return trans[0][0][0], trans[0][0][1]
-
-    def load_grid_and_boundaries(self):
-        global NOME_ARQUIVO_GRID
-        print("\nCarregando centros da grade (pixels)..."); centros_pixels = carregar_centros_grid_pixels(NOME_ARQUIVO_GRID)
-        if centros_pixels:
-            self.grid_centers_pixel = centros_pixels; self.grid_centers_robo = []
-            try:
-                for (cx, cy) in centros_pixels: self.grid_centers_robo.append(self.aplicar_homografia(cx, cy))
-                if len(self.grid_centers_robo) == 9:
-                    sx=abs(self.grid_centers_robo[8][0]-self.grid_centers_robo[0][0])/2.0; sy=abs(self.grid_centers_robo[8][1]-self.grid_centers_robo[0][1])/2.0
-                    mx=sx/1.5; my=sy/1.5; cx1=self.grid_centers_robo[0][0]; cy1=self.grid_centers_robo[0][1]; cx9=self.grid_centers_robo[8][0]; cy9=self.grid_centers_robo[8][1]
-                    self.grid_min_x=min(cx1,cx9)-mx; self.grid_max_x=max(cx1,cx9)+mx; self.grid_min_y=min(cy1,cy9)-my; self.grid_max_y=max(cy1,cy9)+my
-                    print("SUCESSO: Grade carregada."); return True
-                else: print("ERRO: 9 pontos não carregados."); self._reset_state(); return False
-            except Exception as e: print(f"ERRO homografia: {e}"); self._reset_state(); return False
-        else: print("FALHA ao carregar centros."); self._reset_state(); return False
-
-    def _reset_state(self):
-        self.grid_centers_robo = []; self.grid_centers_pixel = None; self.grid_min_x=None; self.grid_max_x=None; self.grid_min_y=None; self.grid_max_y=None
-        self.game_board = [' ']*9; self.game_over=False; self.winner=None; self.robot_is_busy=False
-        self.cleanup_mode=False; self.last_sent_coords={}; self.waiting_for_cleanup_start = False; self.game_end_time = None
-        if self.connected: self.write_cip_explicit_register(9, 0); self.write_cip_explicit_register(5, 0)
-
-    # --- (JOGO DA VELHA - Lógica) ---
-    def print_board(self, board): print(" ESTADO ATUAL:"); print(f" |{board[0]}|{board[1]}|{board[2]}|");print(" |-|-|-|");print(f" |{board[3]}|{board[4]}|{board[5]}|");print(" |-|-|-|");print(f" |{board[6]}|{board[7]}|{board[8]}|")
-    def is_winner(self, board, player): win=[[0,1,2],[3,4,5],[6,7,8],[0,3,6],[1,4,7],[2,5,8],[0,4,8],[2,4,6]]; return any(all(board[i]==player for i in c) for c in win)
-    def is_board_full(self, board): return ' ' not in board
-    def _can_win(self, board, player): opp=self.ROBOT_PLAYER_CHAR if player==self.USER_PLAYER_CHAR else self.USER_PLAYER_CHAR; win=[[0,1,2],[3,4,5],[6,7,8],[0,3,6],[1,4,7],[2,5,8],[0,4,8],[2,4,6]]; return any(opp not in [board[i] for i in c] for c in win)
-    def check_game_over(self, board):
-        if self.is_winner(board, self.USER_PLAYER_CHAR): return self.USER_PLAYER_CHAR
-        if self.is_winner(board, self.ROBOT_PLAYER_CHAR): return self.ROBOT_PLAYER_CHAR
-        uc=self._can_win(board,self.USER_PLAYER_CHAR); rc=self._can_win(board,self.ROBOT_PLAYER_CHAR)
-        if not uc and not rc: return 'Draw' # Empate por bloqueio
-        if self.is_board_full(board): return 'Draw' # Empate por preenchimento
-        return None
-    def minimax(self, board, depth, is_maximizing):
-        winner = self.check_game_over(board);
-        if winner == self.ROBOT_PLAYER_CHAR: return 10 - depth
-        if winner == self.USER_PLAYER_CHAR: return depth - 10
-        if winner == 'Draw': return 0
-        score_func = max if is_maximizing else min; best_score = -math.inf if is_maximizing else math.inf
-        player = self.ROBOT_PLAYER_CHAR if is_maximizing else self.USER_PLAYER_CHAR
-        for i in range(9):
-            if board[i] == ' ': board[i] = player; score = self.minimax(board, depth + 1, not is_maximizing); board[i] = ' '; best_score = score_func(score, best_score)
-        return best_score
-
-    # --- (CORRIGIDO) find_best_move ---
-    def find_best_move(self, board):
-        best_score = -math.inf; best_move = -1
-        for i in range(9):
-            if board[i] == ' ':
-                board[i] = self.ROBOT_PLAYER_CHAR
-                score = self.minimax(board, 0, False)
-                board[i] = ' '
-                # Linha corrigida (indentação)
-                if score > best_score: best_score = score; best_move = i
-        return best_move
-    # --- Fim da Correção ---
-
-    # --- Função para detectar blocos (Usada na Limpeza e visualização) ---
-    def _detect_all_blocks(self, frame, draw_contours=True):
-        blocos = []; hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        ids_cores = {1: (limite_inferior_azul, limite_superior_azul), 2: (limite_inferior_vermelho1, limite_superior_vermelho1, limite_inferior_vermelho2, limite_superior_vermelho2)}
-        cores_desenho = {1: (255,0,0), 2: (0,0,255)}
-        for cid, lims in ids_cores.items():
-            if cid==1: mask=cv2.inRange(hsv, lims[0], lims[1])
-            else: m1=cv2.inRange(hsv, lims[0], lims[1]); m2=cv2.inRange(hsv, lims[2], lims[3]); mask = cv2.bitwise_or(m1, m2)
-            mask = cv2.dilate(cv2.erode(mask, None, iterations=2), None, iterations=2)
-            cnts, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            for c in cnts:
-                if cv2.contourArea(c) > 100:
-                    rect=cv2.minAreaRect(c);
-                    if draw_contours: box=np.intp(cv2.boxPoints(rect)); cv2.drawContours(frame, [box], 0, cores_desenho[cid], 2)
-                    (xp, yp), _, _ = rect; xr, yr = self.aplicar_homografia(xp, yp)
-                    blocos.append({'x_robo': xr, 'y_robo': yr, 'cor_id': cid})
-        return blocos
-
-    # --- Função para iniciar a limpeza ---
-    def _start_cleanup_sequence(self):
-        print("\n--- INICIANDO LIMPEZA ---"); self.cleanup_mode = True; self.last_sent_coords = {}
-        if self.connected: print("Ligando R[9]=1"); self.write_cip_explicit_register(9, 1)
-
-    # --- Callback do Mouse ---
-    def handle_click(self, event, x, y, flags, param):
-        if event == cv2.EVENT_LBUTTONDOWN:
-            sx=ORIGINAL_WIDTH/DISPLAY_WIDTH; sy=ORIGINAL_HEIGHT/DISPLAY_HEIGHT; ox=int(x*sx); oy=int(y*sy); print(f"\nClique ({x},{y})->({ox},{oy})")
-            if self.cleanup_mode: print("Limpeza."); return;
-            if self.game_over: print("Jogo acabou."); return
-            if not self.grid_centers_pixel: print("Grade não calibrada."); return
-            if self.robot_is_busy: print("Aguarde robô."); return
-            if not self.connected: print("Robô desconectado."); return
-            if self.game_board.count('X') > self.game_board.count('O'): print("Não é sua vez."); return
-
-            click_pos = np.array([ox, oy]); dists = [np.linalg.norm(click_pos-np.array(c)) for c in self.grid_centers_pixel]; idx = np.argmin(dists)
-            if dists[idx] > 150: print(f"Clique longe (Dist: {dists[idx]:.1f})"); return
-
-            print(f"Célula: {idx + 1}")
-            if self.game_board[idx] == ' ':
-                print("Enviando jogada USR..."); (ux, uy) = self.grid_centers_robo[idx]
-                sX=self.write_cip_explicit_register(1, ux); sY=self.write_cip_explicit_register(2, uy)
-                if not (sX and sY): print("Falha envio coords (USR)."); return
-                print(f"ENVIO USR OK: X={ux:.1f}, Y={uy:.1f}"); sF = self.write_cip_explicit_register(5, 1);
-                if not sF: print("Falha LIGAR R[5] (USR)!"); return
-                print("R[5] LIGADO (USR)..."); self.robot_is_busy = True
-                self.game_board[idx] = self.USER_PLAYER_CHAR; self.print_board(self.game_board)
-                self.winner = self.check_game_over(self.game_board)
-                if self.winner: self.game_over = True; print(f"--- FIM DE JOGO! Result: {self.winner} ---")
-            else: print("Célula ocupada.")
-
-
-    # --- LOOP PRINCIPAL ---
-    def run_vision_and_send(self):
-        global ORIGINAL_WIDTH, ORIGINAL_HEIGHT
-        if not self.load_grid_and_boundaries(): print("AVISO: Falha ao carregar grade. 'g'.")
-
-        cap = cv2.VideoCapture(self.cam_index)
-        if not cap.isOpened(): print(f"Erro câmera {self.cam_index}."); return
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, ORIGINAL_WIDTH); cap.set(cv2.CAP_PROP_FRAME_HEIGHT, ORIGINAL_HEIGHT)
-        aw = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)); ah = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        print(f"Resolução: {aw}x{ah}")
-        if aw!=ORIGINAL_WIDTH or ah!=ORIGINAL_HEIGHT: print("AVISO: Resolução diferente!"); ORIGINAL_WIDTH=aw; ORIGINAL_HEIGHT=ah
-
-        window_name = 'Jogo da Velha & Limpeza Automática'; cv2.namedWindow(window_name)
-        cv2.setMouseCallback(window_name, self.handle_click)
-        print("\n--- JOGO DA VELHA & LIMPEZA ---"); print("'g': Grade | 'r': Reset | 'ESC': Sair | CLIQUE: Jogar")
-        print("Limpeza automática no FIM DE JOGO."); print("-----------------------------")
-
-        centros_grid_pixel = self.grid_centers_pixel; frame = None
-
-        while True:
-            ret, current_frame_read = cap.read();
-            if ret: frame = current_frame_read
-            elif frame is None: print("Erro frame."); break
-            frame_display = frame.copy()
-
-            robot_finished_now = False
-            # --- Leitura periódica de R[5] ---
-            if self.connected and self.robot_is_busy:
-                flag_value, read_ok = self.read_register(5)
-                if read_ok and flag_value == 0:
-                    print("(Loop) R[5] = 0. Robô liberado.")
-                    self.robot_is_busy = False; robot_finished_now = True; self.last_sent_coords = {}
-                # elif not read_ok: print("(Loop) Aviso: Falha leitura R[5]...") # Opcional
-
-            # --- Lógica Principal ---
-            if not self.robot_is_busy:
-
-                # --- Inicia Limpeza se Jogo Acabou E Robô Terminou ---
-                if self.game_over and robot_finished_now and not self.cleanup_mode:
-                     print(f"Jogo terminou ({self.winner}). Iniciando limpeza...")
-                     self._start_cleanup_sequence()
-
-                # --- Processa Limpeza ---
-                elif self.cleanup_mode:
-                     current_pieces = []
-                     if self.grid_min_x is not None:
-                         all_detected = self._detect_all_blocks(frame.copy(), draw_contours=False)
-                         for piece in all_detected:
-                            px, py = piece['x_robo'], piece['y_robo']
-                            if (self.grid_min_x <= px <= self.grid_max_x and self.grid_min_y <= py <= self.grid_max_y): current_pieces.append(piece)
-                     print(f"Limpando... Peças restantes: {len(current_pieces)}")
-
-                     if current_pieces:
-                         next_piece = current_pieces[0]; px=next_piece['x_robo']; py=next_piece['y_robo']; pcid=next_piece['cor_id']; coord_key = f"{px:.0f}_{py:.0f}"
-                         if coord_key == self.last_sent_coords.get("key"): print("Coords iguais..."); time.sleep(0.2)
-                         else:
-                              print(f"Enviando peça {('Azul' if pcid==1 else 'Vermelha')} p/ limpar...");
-                              sX=self.write_cip_explicit_register(1,px); sY=self.write_cip_explicit_register(2,py); sC=self.write_cip_explicit_register(8,pcid); sM=self.write_cip_explicit_register(9,1)
-                              if sX and sY and sC and sM:
-                                   sF=self.write_cip_explicit_register(5,1);
-                                   if sF: self.robot_is_busy=True; self.last_sent_coords = {"key": coord_key}
-                                   else: print("Falha R[5]!")
-                              else: print("Falha R[1/2/8/9].")
-                     else: # Fim limpeza
-                         print("Limpeza concluída."); self.cleanup_mode = False; self.last_sent_coords = {}
-                         if self.connected: print("Desligando R[9]..."); self.write_cip_explicit_register(9, 0)
-
-                # --- Processa Jogada do Robô ---
-                elif robot_finished_now and not self.game_over:
-                    if self.game_board.count('X') > self.game_board.count('O'):
-                        print("Calculando/enviando jogada ROBÔ..."); idx = self.find_best_move(self.game_board)
-                        if idx != -1:
-                            (px_r, py_r) = self.grid_centers_robo[idx]; sX_r=self.write_cip_explicit_register(1,px_r); sY_r=self.write_cip_explicit_register(2,py_r)
-                            if (sX_r and sY_r):
-                                print(f"ENVIO ROBÔ OK: Célula {idx+1}"); sF_r = self.write_cip_explicit_register(5, 1);
-                                if sF_r:
-                                    print("R[5] LIGADO (Robô)..."); self.robot_is_busy = True; self.game_board[idx] = self.ROBOT_PLAYER_CHAR; self.print_board(self.game_board)
-                                    self.winner = self.check_game_over(self.game_board)
-                                    if self.winner: self.game_over = True; print(f"--- FIM DE JOGO! Result: {self.winner} ---")
-                                else: print("Falha R[5] (Robô)!")
-                            else: print("Falha envio coords (Robô).")
-                        else: # Empate ou erro
-                             self.winner = self.check_game_over(self.game_board)
-                             if self.winner == 'Draw': self.game_over = True; print("--- JOGO EMPATADO ---")
-                             else: print("ERRO: Minimax não achou jogada.")
-            # --- Fim Lógica ---
-
-            # --- Desenhos ---
-            if self.grid_centers_pixel:
-                for i, (cx, cy) in enumerate(self.grid_centers_pixel):
-                    cv2.putText(frame_display, str(i+1), (cx-10, cy+10), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255,255,255), 3)
-                    p_char = self.game_board[i];
-                    if p_char != ' ': color = (255,100,100) if p_char=='X' else (100,100,255); (tw,th),_ = cv2.getTextSize(p_char, cv2.FONT_HERSHEY_SIMPLEX, 2.5, 5); tx=cx-tw//2; ty=cy+th//2; cv2.putText(frame_display, p_char, (tx,ty), cv2.FONT_HERSHEY_SIMPLEX, 2.5, color, 5)
-            # Desenha blocos detectados
-            self._detect_all_blocks(frame_display, draw_contours=True)
-
-            # --- HUD ---
-            current_pieces_on_board_count = "?"
-            if self.grid_min_x is not None:
-                all_detected_hud = self._detect_all_blocks(frame.copy(), draw_contours=False); on_board_hud = [p for p in all_detected_hud if (self.grid_min_x <= p['x_robo'] <= self.grid_max_x and self.grid_min_y <= p['y_robo'] <= self.grid_max_y)]; current_pieces_on_board_count = len(on_board_hud)
-
-            if self.cleanup_mode: status_msg = f"LIMPANDO... [{current_pieces_on_board_count} detec.]"; color = (255,165,0)
-            elif self.game_over: status_msg = f"FIM: {self.winner}. Aguardando R[5]=0 p/ limpar..."; color = (0, 200, 200)
-            elif not self.grid_centers_robo: status_msg = "GRADE NAO CALIBRADA. 'g'."; color = (0,0,255)
-            elif self.robot_is_busy: status_msg = "AGUARDANDO ROBO..."; color = (0,165,255)
-            else: status_msg = "Sua vez. CLIQUE."; color = (0,255,0)
-            cv2.putText(frame_display, status_msg, (15, 75), cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 3)
-            status_conn = "CONECTADO" if self.connected else "DESCONECTADO"; color_conn = (0,255,255) if self.connected else (0,0,255); cv2.putText(frame_display, f"Status: {status_conn}", (15, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, color_conn, 2)
-
-            # --- Exibe ---
-            display_frame_resized = cv2.resize(frame_display, (DISPLAY_WIDTH, DISPLAY_HEIGHT)); cv2.imshow(window_name, display_frame_resized)
-
-            # --- Teclas ---
-            key = cv2.waitKey(50) & 0xFF
-            if key == 27: break # ESC
-            if key == ord('g'):
-                if self.robot_is_busy or self.cleanup_mode: print("Aguarde..."); continue
-                print("\n--- CARREGANDO GRADE ---"); centros_grid_pixel = self.load_grid_and_boundaries();
-                if centros_grid_pixel: self.print_board(self.game_board)
-            if key == ord('r'):
-                if self.robot_is_busy or self.cleanup_mode: print("Aguarde..."); continue
-                print("\n--- JOGO RESETADO ---"); self._reset_state(); self.print_board(self.game_board); centros_grid_pixel = None
-
-        cap.release(); cv2.destroyAllWindows()
-
-# --- PONTO DE ENTRADA ---
-if __name__ == "__main__":
-    ip_robot = "192.168.1.100"; camera_index = 1
-    game = FanucTicTacToeAndClean(ip_robot, camera_index)
-    if game.connect(): game.run_vision_and_send(); game.disconnect()
-    else: print("Rodando só visão."); game.run_vision_and_send()
\ No newline at end of file
+import struct
+import numpy as np
+import sys
+import os
+import time
+import threading
+import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # Raiz do repositório (pacote 'comum')
+from comum import importar_sob_demanda
+from comum.calibracao import Calibracao, carregar_centros_grid_pixels
+from comum.captura import abrir_camera
+from comum.display import Display
+from comum.segmentacao import segmentar_blocos
+from comum.cores import ModeloCorAdaptativo
+from comum.framebus import PipelineProcessos
+from comum.cip import SessaoRobo
+from comum.gravacao import GravadorSessao
+from comum.controlador import ControladorEventos, VigiaRegistrador
+from comum.oclusao import PortaoOclusao, ESTAVEL
+from comum.mudanca import FiltroMudanca
+from comum.agendador import AgendadorQuadros
+from comum.buffers import pool_da_thread
+from comum.filapicks import FilaPicks
+from comum.selecao import ordem_vizinho_proximo
+
+cv2 = importar_sob_demanda("cv2")
+
+# --- NOMES DOS ARQUIVOS DE CONFIGURAÇÃO ---
+NOME_ARQUIVO_PONTOS = "pontos_calibracao.txt"
+NOME_ARQUIVO_GRID = "grid_calibracao.txt" # Contém coordenadas em pixels dos 9 centros
+# ------------------------------------
+
+# --- Dimensões ---
+ORIGINAL_WIDTH = 1920
+ORIGINAL_HEIGHT = 1080
+DISPLAY_WIDTH = 1280
+DISPLAY_HEIGHT = 720
+# ------------------------------
+
+# --- Exibição ---
+HEADLESS = False   # True = sem janela (sem cliques: só para testes de robô/limpeza); Ctrl+C encerra
+FPS_EXIBICAO = 15  # Taxa máxima de renderização
+# ------------------------------
+
+# --- Faixas de Cor: perfil_cor.json (calibradorcor.py) ou, sem ele, comum/segmentacao.py (FAIXAS_HSV) ---
+# True = aprende as cores (comum/cores.py) com as peças vistas dentro da grade na limpeza. Não vale no MODO_PROCESSOS.
+MODELO_COR_ADAPTATIVO = False
+
+# --- Processos: captura e segmentação em processos separados (comum/framebus.py) ---
+MODO_PROCESSOS = False
+
+# Correção da lente: 'pontos' (só centróides/centros), 'frame' (remap completo) ou None
+MODO_LENTE = "pontos"
+
+# Log das transações CIP em JSON-lines (None = só em memória; 't' imprime as latências)
+ARQUIVO_TRAFEGO_CIP = None # Ex.: "trafego_cip.jsonl"
+
+# Gravação da sessão (comum/gravacao.py) para inspeção e replay (replaysessao.py)
+GRAVAR_SESSAO = False
+PASTA_GRAVACOES = "gravacoes"
+FPS_QUADROS_GRAVACAO = 1.0 # Quadros-chave JPEG por segundo (0 = só eventos)
+
+# Portão de oclusão (comum/oclusao.py): jogadas e limpeza só saem com o tabuleiro parado e sem mão/braço na frente
+PORTAO_OCLUSAO = True
+FRAMES_CENA_ESTAVEL = 5 # Frames seguidos sem movimento para liberar
+MARGEM_ROI_CELULAS = 0.75 # Margem do ROI em volta dos centros da grade, em células
+
+# Filtro de mudança (comum/mudanca.py): a segmentação só roda de novo quando o tabuleiro muda
+# (ou a cada INTERVALO_REFRESCO_DETECCAO s); no resto o HUD reaproveita a última detecção
+FILTRO_MUDANCA = True
+INTERVALO_REFRESCO_DETECCAO = 1.0
+
+# Tempo de espera antes da limpeza (segundos)
+CLEANUP_DELAY_SECONDS = 5.0
+
+# --- Estados do controlador da célula (comum/controlador.py) ---
+SEM_GRADE = "SEM_GRADE"            # Aguardando 'g'
+VEZ_HUMANO = "VEZ_HUMANO"          # Aguardando clique
+JOGADA_HUMANO = "JOGADA_HUMANO"    # Robô colocando a peça do humano (R[5]=1)
+VEZ_ROBO = "VEZ_ROBO"              # Envio da jogada do robô falhou; reenvia em REENVIO_SECONDS
+JOGADA_ROBO = "JOGADA_ROBO"        # Robô colocando a própria peça
+ESPERA_LIMPEZA = "ESPERA_LIMPEZA"  # Fim de jogo; limpeza começa após CLEANUP_DELAY_SECONDS
+LIMPEZA_BUSCA = "LIMPEZA_BUSCA"    # Aguardando a detecção da próxima peça
+LIMPEZA_PECA = "LIMPEZA_PECA"      # Robô removendo uma peça (ou a fila inteira, LIMPEZA_EM_FILA)
+FIM = "FIM"                        # Tabuleiro limpo; 'r' para novo jogo
+ESTADOS_ROBO_OCUPADO = (JOGADA_HUMANO, JOGADA_ROBO, LIMPEZA_PECA)
+PERIODO_VIGIA_R5 = 0.02 # s entre leituras de R[5] enquanto o robô trabalha
+
+# Ritmo do loop de vídeo por estado (comum/agendador.py): (frames por segundo, detectar blocos).
+# Com o braço sobre o tabuleiro só o portão de oclusão roda; a conferência da limpeza vai na taxa cheia.
+RITMOS_ESTADO = {JOGADA_HUMANO: (5, False), JOGADA_ROBO: (5, False), LIMPEZA_PECA: (5, False),
+                 LIMPEZA_BUSCA: (30, True), VEZ_ROBO: (15, True),
+                 SEM_GRADE: (10, True), VEZ_HUMANO: (10, True), ESPERA_LIMPEZA: (10, True), FIM: (5, True)}
+REENVIO_SECONDS = 1.0
+
+# Banco de registradores das jogadas do ROBÔ (X, Y). None = usa R[1]/R[2] como a do humano.
+# Com um banco separado (ex.: (11, 12)) a resposta do robô é escrita nele enquanto o braço ainda
+# coloca a peça do humano, e ao R[5] voltar a 0 só falta ligar R[5]. O programa do robô deve
+# ler X/Y desse banco nas jogadas 'O'.
+REGS_BANCO_ROBO = None
+
+# --- LIMPEZA EM FILA ---
+# True = cada conferência do tabuleiro escreve TODAS as peças restantes (vizinho mais próximo) na
+# fila de registradores de comum.filapicks (R[20] contagem, R[21] índice consumido pelo robô,
+# R[30..] X/Y/cor) e liga R[9]=2 e R[5]=1: o robô remove todas sem esperar nova detecção e só
+# zera R[5] no fim da fila. O Python confere o tabuleiro e manda outra fila com o que sobrou.
+# False = uma peça por R[5] (R[1]/R[2]/R[8], R[9]=1).
+LIMPEZA_EM_FILA = False
+MAX_RODADAS_SEM_PROGRESSO = 2 # Filas seguidas sem diminuir as peças no tabuleiro antes de desistir
+
+# =========================================================
+# --- CLASSE DE COMUNICAÇÃO CIP ---
+class FanucTicTacToeAndClean:
+    def __init__(self, ip_robot, cam_index=0):
+        self.ip = ip_robot; self.cam_index = cam_index
+        self.calibracao = Calibracao(NOME_ARQUIVO_PONTOS, MODO_LENTE) # Homografia, lente e cores: lidas no primeiro uso
+        self.sessao = None # comum.cip.SessaoRobo (pool, keep-alive e reconexão)
+        self.grid_centers_robo = [] # Coordenadas do Robô
+        self.grid_centers_pixel = None # Coordenadas em Pixel
+        self.grid_min_x = None; self.grid_max_x = None; self.grid_min_y = None; self.grid_max_y = None
+        self.USER_PLAYER_CHAR = 'X'; self.ROBOT_PLAYER_CHAR = 'O'
+        self.game_board = [' '] * 9; self.game_over = False; self.winner = None
+        self.estado = SEM_GRADE; self.last_sent_coords = {}
+        self.display = None # Criado em run_vision_and_send (pode ser injetado antes)
+        self.gravador = None # comum.gravacao.GravadorSessao (GRAVAR_SESSAO)
+        self.modelo_cor = ModeloCorAdaptativo(self.calibracao.faixas_cor) if MODELO_COR_ADAPTATIVO and not MODO_PROCESSOS else None
+        # Transições rodam na thread do controlador; o loop de vídeo só posta eventos e desenha
+        self.controlador = ControladorEventos(self._tratar_evento, "Controlador-velha")
+        self.vigia = VigiaRegistrador(self.read_register, 5, 0, lambda: self.controlador.postar("robo_livre"), PERIODO_VIGIA_R5)
+        self._pedir_deteccao = threading.Event() # Limpeza: o controlador pede uma detecção ao loop de vídeo
+        self.portao = PortaoOclusao(frames_estaveis=FRAMES_CENA_ESTAVEL) if PORTAO_OCLUSAO else None # Alimentado pelo loop de vídeo
+        self.filtro = FiltroMudanca(intervalo_refresco=INTERVALO_REFRESCO_DETECCAO) if FILTRO_MUDANCA and not MODO_PROCESSOS else None # ROI = tabuleiro (como o portão)
+        self.agendador = AgendadorQuadros(RITMOS_ESTADO)
+        self.cena_estavel = True # Estado do portão visto pelo controlador (evento "cena", gravado)
+        self._clique_pendente = None # Clique feito com a cena em movimento: vale quando ela parar
+        # Especulação: respostas do robô calculadas em segundo plano enquanto o braço trabalha
+        self._especulador = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Especulador")
+        self._respostas = {} # tabuleiro ("X O  ...") -> Future de find_best_move (função pura: vale entre partidas)
+        self._banco_preparado = None # (tabuleiro, idx) já escrito em REGS_BANCO_ROBO
+        self.fila = FilaPicks(self.write_cip_explicit_register) # LIMPEZA_EM_FILA
+        self._pecas_na_fila = None; self._rodadas_sem_progresso = 0
+
+    def _gravar(self, tipo, **dados):
+        if self.gravador is not None: self.gravador.evento(tipo, **dados)
+
+    @property
+    def robot_is_busy(self): return self.estado in ESTADOS_ROBO_OCUPADO
+    @property
+    def cleanup_mode(self): return self.estado in (LIMPEZA_BUSCA, LIMPEZA_PECA)
+
+    def _mudar_estado(self, estado):
+        self.estado = estado
+        if estado in ESTADOS_ROBO_OCUPADO: self.vigia.armar() # Avisa "robo_livre" assim que R[5] voltar a 0
+        if estado == LIMPEZA_BUSCA: self._pedir_deteccao.set()
+
+    @property
+    def connected(self): return self.sessao is not None and self.sessao.conectado # Ao vivo: cai durante uma reconexão
+
+    def connect(self):
+        """Inicia a sessão. Mesmo se falhar agora, ela segue tentando em segundo plano."""
+        if self.sessao is None: self.sessao = SessaoRobo(self.ip, arquivo_trafego=ARQUIVO_TRAFEGO_CIP)
+        return self.sessao.conectar()
+
+    def disconnect(self):
+        if self.sessao is None: return
+        if self.connected:
+            print("Garantindo R[5]=0 e R[9]=0...");
+            self.write_cip_explicit_register(5, 0); self.write_cip_explicit_register(9, 0); time.sleep(0.1)
+        self.sessao.fechar(); self.sessao = None; print("Desconectado.")
+
+    def write_cip_explicit_register(self, register_index, value, forcar=False):
+        if self.sessao is None: return False
+        # Valor já confirmado no robô não é reenviado (forcar=True ignora); R[9]/R[5]=0 pedidos durante uma queda são reaplicados ao reconectar
+        ok = self.sessao.write_register(register_index, value, forcar=forcar)
+        self._gravar("escrita", reg=register_index, valor=int(round(float(value))), ok=ok); return ok
+
+    def read_register(self, register_index):
+        if not self.connected: return None, False
+        return self.sessao.read_register(register_index)
+
+    def aplicar_homografia(self, x_pixel, y_pixel):
+        trans = self.aplicar_homografia_pontos([(x_pixel, y_pixel)]); return trans[0][0], trans[0][1]
+
+    def aplicar_homografia_pontos(self, pontos):
+        """N pontos (x, y) em pixels -> array (N, 2) em mm do robô, em uma chamada só (lente + homografia)."""
+        return self.calibracao.pixels_para_robo(pontos)
+
+    def load_grid_and_boundaries(self):
+        global NOME_ARQUIVO_GRID
+        print("\nCarregando centros da grade (pixels)..."); centros_pixels = carregar_centros_grid_pixels(NOME_ARQUIVO_GRID)
+        if centros_pixels:
+            if self.calibracao.corrige_frame: # Centros salvos em pixels distorcidos -> mesmo espaço do frame remapeado
+                centros_pixels = [(int(round(x)), int(round(y))) for x, y in self.calibracao.corretor_lente.corrigir_pontos(centros_pixels)]
+            try:
+                centros_robo = [self.aplicar_homografia(cx, cy) for (cx, cy) in centros_pixels]
+                if len(centros_robo) == 9:
+                    self._definir_grade(centros_pixels, centros_robo)
+                    self._gravar("grade", pixel=[[int(x), int(y)] for x, y in self.grid_centers_pixel], robo=[[float(x), float(y)] for x, y in self.grid_centers_robo])
+                    print("SUCESSO: Grade carregada."); return True
+                else: print("ERRO: 9 pontos não carregados.")
+            except Exception as e: print(f"ERRO homografia: {e}")
+        else: print("FALHA ao carregar centros.")
+        self._gravar("grade", pixel=None, robo=None); self._reset_state(); return False
+
+    def _definir_grade(self, centros_pixel, centros_robo):
+        """Centros da grade (pixel e robô) e limites da área do tabuleiro; também usado pelo replay."""
+        self.grid_centers_pixel = [tuple(c) for c in centros_pixel]; self.grid_centers_robo = [tuple(c) for c in centros_robo]
+        sx=abs(self.grid_centers_robo[8][0]-self.grid_centers_robo[0][0])/2.0; sy=abs(self.grid_centers_robo[8][1]-self.grid_centers_robo[0][1])/2.0
+        mx=sx/1.5; my=sy/1.5; cx1=self.grid_centers_robo[0][0]; cy1=self.grid_centers_robo[0][1]; cx9=self.grid_centers_robo[8][0]; cy9=self.grid_centers_robo[8][1]
+        self.grid_min_x=min(cx1,cx9)-mx; self.grid_max_x=max(cx1,cx9)+mx; self.grid_min_y=min(cy1,cy9)-my; self.grid_max_y=max(cy1,cy9)+my
+        if self.portao is not None: self.portao.definir_roi(self._roi_tabuleiro())
+        if self.filtro is not None: self.filtro.definir_roi(self._roi_tabuleiro())
+        if self.estado == SEM_GRADE: self.estado = VEZ_HUMANO
+
+    def _roi_tabuleiro(self):
+        """(x, y, largura, altura) em pixels: centros da grade + MARGEM_ROI_CELULAS células de cada lado."""
+        pts = np.array(self.grid_centers_pixel, dtype=np.float64); (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+        margem = MARGEM_ROI_CELULAS * max(x1 - x0, y1 - y0) / 2.0 # Centro a centro são 2 células
+        x0 = int(max(0, x0 - margem)); y0 = int(max(0, y0 - margem))
+        return x0, y0, int(x1 + margem) - x0, int(y1 + margem) - y0
+
+    def _reset_state(self):
+        self.grid_centers_robo = []; self.grid_centers_pixel = None; self.grid_min_x=None; self.grid_max_x=None; self.grid_min_y=None; self.grid_max_y=None
+        self.game_board = [' ']*9; self.game_over=False; self.winner=None; self.last_sent_coords={}
+        self.estado = SEM_GRADE; self._banco_preparado = None; self._clique_pendente = None; self.vigia.desarmar(); self.controlador.cancelar("iniciar_limpeza"); self.controlador.cancelar("reenviar")
+        if self.portao is not None: self.portao.definir_roi(None)
+        if self.filtro is not None: self.filtro.definir_roi(None)
+        if self.connected: self.write_cip_explicit_register(9, 0); self.write_cip_explicit_register(5, 0)
+
+    # --- (JOGO DA VELHA - Lógica) ---
+    def print_board(self, board): self._gravar("tabuleiro", tabuleiro="".join(board), fim=self.game_over, vencedor=self.winner); print(" ESTADO ATUAL:"); print(f" |{board[0]}|{board[1]}|{board[2]}|");print(" |-|-|-|");print(f" |{board[3]}|{board[4]}|{board[5]}|");print(" |-|-|-|");print(f" |{board[6]}|{board[7]}|{board[8]}|")
+    def is_winner(self, board, player): win=[[0,1,2],[3,4,5],[6,7,8],[0,3,6],[1,4,7],[2,5,8],[0,4,8],[2,4,6]]; return any(all(board[i]==player for i in c) for c in win)
+    def is_board_full(self, board): return ' ' not in board
+    def _can_win(self, board, player): opp=self.ROBOT_PLAYER_CHAR if player==self.USER_PLAYER_CHAR else self.USER_PLAYER_CHAR; win=[[0,1,2],[3,4,5],[6,7,8],[0,3,6],[1,4,7],[2,5,8],[0,4,8],[2,4,6]]; return any(opp not in [board[i] for i in c] for c in win)
+    def check_game_over(self, board):
+        if self.is_winner(board, self.USER_PLAYER_CHAR): return self.USER_PLAYER_CHAR
+        if self.is_winner(board, self.ROBOT_PLAYER_CHAR): return self.ROBOT_PLAYER_CHAR
+        uc=self._can_win(board,self.USER_PLAYER_CHAR); rc=self._can_win(board,self.ROBOT_PLAYER_CHAR)
+        if not uc and not rc: return 'Draw' # Empate por bloqueio
+        if self.is_board_full(board): return 'Draw' # Empate por preenchimento
+        return None
+    def minimax(self, board, depth, is_maximizing):
+        winner = self.check_game_over(board);
+        if winner == self.ROBOT_PLAYER_CHAR: return 10 - depth
+        if winner == self.USER_PLAYER_CHAR: return depth - 10
+        if winner == 'Draw': return 0
+        score_func = max if is_maximizing else min; best_score = -math.inf if is_maximizing else math.inf
+        player = self.ROBOT_PLAYER_CHAR if is_maximizing else self.USER_PLAYER_CHAR
+        for i in range(9):
+            if board[i] == ' ': board[i] = player; score = self.minimax(board, depth + 1, not is_maximizing); board[i] = ' '; best_score = score_func(score, best_score)
+        return best_score
+
+    # --- (CORRIGIDO) find_best_move ---
+    def find_best_move(self, board):
+        best_score = -math.inf; best_move = -1
+        for i in range(9):
+            if board[i] == ' ':
+                board[i] = self.ROBOT_PLAYER_CHAR
+                score = self.minimax(board, 0, False)
+                board[i] = ' '
+                # Linha corrigida (indentação)
+                if score > best_score: best_score = score; best_move = i
+        return best_move
+    # --- Fim da Correção ---
+
+    # --- Função para detectar blocos (Usada na Limpeza e visualização) ---
+    # segmentados: blocos já segmentados deste frame (modo processos); None = segmenta aqui
+    # forcar: ignora o filtro de mudança (detecção que vira comando ao robô)
+    def _detect_all_blocks(self, frame, quadro=None, segmentados=None, forcar=False):
+        blocos = []; cores_desenho = {1: (255,0,0), 2: (0,0,255)}
+        if segmentados is None:
+            segmentar = partial(segmentar_blocos, faixas=self.calibracao.faixas_cor, area_minima=self.calibracao.area_minima_cor, modelo=self.modelo_cor)
+            segmentados = segmentar(frame) if self.filtro is None else self.filtro.obter(frame, segmentar, forcar)
+        robo = self.aplicar_homografia_pontos([b['rect'][0] for b in segmentados]) # Todos os centros de uma vez
+        for b, (xr, yr) in zip(segmentados, robo):
+            cid = b['cor_id']; rect = b['rect']
+            if quadro is not None: quadro.caixa(cv2.boxPoints(rect), cores_desenho[cid], 2)
+            blocos.append({'x_robo': xr, 'y_robo': yr, 'cor_id': cid, 'rect': rect})
+        return blocos
+
+    # --- Função para iniciar a limpeza ---
+    def _start_cleanup_sequence(self):
+        print("\n--- INICIANDO LIMPEZA ---"); self.last_sent_coords = {}; self._pecas_na_fila = None; self._rodadas_sem_progresso = 0
+        if self.connected: print("Ligando R[9]=1"); self.write_cip_explicit_register(9, 1)
+        self._mudar_estado(LIMPEZA_BUSCA)
+
+    # --- Callback do Mouse (thread do loop): só converte para o frame original e posta o evento ---
+    def handle_click(self, event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN:
+            sx=ORIGINAL_WIDTH/DISPLAY_WIDTH; sy=ORIGINAL_HEIGHT/DISPLAY_HEIGHT; ox=int(x*sx); oy=int(y*sy); print(f"\nClique ({x},{y})->({ox},{oy})")
+            self.controlador.postar("clique", x=ox, y=oy)
+
+    # --- Teclas (thread do loop); retorna False para sair ---
+    def _tratar_tecla(self, key):
+        if key == 27: return False # ESC
+        if key == ord('t') and self.sessao is not None: self.sessao.trafego.imprimir_resumo()
+        if key in (ord('g'), ord('r')): self.controlador.postar("tecla", tecla=chr(key))
+        return True
+
+    # =========================================================
+    # --- CONTROLADOR DA CÉLULA: uma transição por evento ---
+    # Eventos: clique, tecla, robo_livre (VigiaRegistrador em R[5]), deteccao (pedida ao loop
+    # na limpeza), cena (portão de oclusão mudou) e os timers iniciar_limpeza / reenviar.
+    # Cada evento é gravado (replaysessao.py).
+    # =========================================================
+    def _tratar_evento(self, ev):
+        tipo = ev['tipo']; self._gravar(tipo, **{k: v for k, v in ev.items() if k != 'tipo'}, conectado=self.connected)
+        if tipo == "robo_livre": self._robo_livre()
+        elif tipo == "clique": self._jogada_humano(ev['x'], ev['y'])
+        elif tipo == "tecla": self._tecla(ev['tecla'])
+        elif tipo == "cena": self._cena(ev['estavel'], ev['estado'])
+        elif tipo == "deteccao" and self.estado == LIMPEZA_BUSCA: self._limpar_proxima_peca(ev['pecas'])
+        elif tipo == "iniciar_limpeza" and self.estado == ESPERA_LIMPEZA: self._start_cleanup_sequence()
+        elif tipo == "reenviar" and self.estado == VEZ_ROBO: self._jogada_robo()
+        elif tipo == "resposta_pronta" and self.estado == JOGADA_HUMANO and ev['tabuleiro'] == "".join(self.game_board): self._preparar_banco()
+
+    def _robo_livre(self):
+        print("R[5] = 0. Robô liberado."); self.last_sent_coords = {}
+        if self.estado == JOGADA_HUMANO:
+            if self.game_over: self._aguardar_limpeza()
+            else: self._mudar_estado(VEZ_ROBO); self._jogada_robo()
+        elif self.estado == JOGADA_ROBO:
+            if self.game_over: self._aguardar_limpeza()
+            else: self._mudar_estado(VEZ_HUMANO)
+        elif self.estado == LIMPEZA_PECA: self._mudar_estado(LIMPEZA_BUSCA)
+
+    def _cena(self, estavel, estado):
+        """Portão de oclusão mudou: com a cena parada, libera o que ficou esperando por ela."""
+        self.cena_estavel = estavel
+        if not estavel: return
+        if self._clique_pendente is not None and self.estado == VEZ_HUMANO:
+            ox, oy = self._clique_pendente; self._clique_pendente = None; print("Cena parada. Enviando a jogada pendente."); self._jogada_humano(ox, oy)
+        elif self.estado == VEZ_ROBO: self._jogada_robo()
+
+    def _aguardar_limpeza(self):
+        print(f"Jogo terminou ({self.winner}). Limpeza em {CLEANUP_DELAY_SECONDS:.1f} s...")
+        self._mudar_estado(ESPERA_LIMPEZA); self.controlador.agendar("iniciar_limpeza", CLEANUP_DELAY_SECONDS)
+
+    def _fim_de_jogo(self):
+        self.winner = self.check_game_over(self.game_board)
+        if self.winner: self.game_over = True; print(f"--- FIM DE JOGO! Result: {self.winner} ---")
+
+    def _jogada_humano(self, ox, oy):
+        if self.cleanup_mode: print("Limpeza."); return
+        if self.game_over: print("Jogo acabou."); return
+        if not self.grid_centers_pixel: print("Grade não calibrada."); return
+        if self.estado != VEZ_HUMANO: print("Aguarde robô."); return
+        if not self.connected: print("Robô desconectado."); return
+        if not self.cena_estavel: self._clique_pendente = (ox, oy); print("Movimento sobre o tabuleiro: a jogada sai quando a cena parar."); return
+        self._clique_pendente = None
+
+        click_pos = np.array([ox, oy]); dists = [np.linalg.norm(click_pos-np.array(c)) for c in self.grid_centers_pixel]; idx = int(np.argmin(dists))
+        if dists[idx] > 150: print(f"Clique longe (Dist: {dists[idx]:.1f})"); return
+
+        print(f"Célula: {idx + 1}")
+        if self.game_board[idx] != ' ': print("Célula ocupada."); return
+        print("Enviando jogada USR..."); (ux, uy) = self.grid_centers_robo[idx]
+        sX=self.write_cip_explicit_register(1, ux); sY=self.write_cip_explicit_register(2, uy)
+        if not (sX and sY): print("Falha envio coords (USR)."); return
+        print(f"ENVIO USR OK: X={ux:.1f}, Y={uy:.1f}"); sF = self.write_cip_explicit_register(5, 1);
+        if not sF: print("Falha LIGAR R[5] (USR)!"); return
+        print("R[5] LIGADO (USR)..."); self.game_board[idx] = self.USER_PLAYER_CHAR; self.print_board(self.game_board)
+        self._fim_de_jogo(); self._mudar_estado(JOGADA_HUMANO)
+        if not self.game_over: self._especular([self.game_board]) # Normalmente já calculada durante a jogada anterior do robô
+
+    # --- Especulação: a busca sai do caminho crítico (entre R[5]=0 e o próximo R[5]=1) ---
+    def _especular(self, tabuleiros):
+        """Calcula em segundo plano a resposta do robô para cada tabuleiro; avisa o controlador com 'resposta_pronta'."""
+        for tab in tabuleiros:
+            chave = "".join(tab)
+            if chave in self._respostas: futuro = self._respostas[chave]
+            else: futuro = self._respostas[chave] = self._especulador.submit(self.find_best_move, list(tab)) # Cópia: find_best_move altera o tabuleiro
+            if chave == "".join(self.game_board): futuro.add_done_callback(lambda f, chave=chave: self.controlador.postar("resposta_pronta", tabuleiro=chave))
+
+    def _especular_proximas(self):
+        """Com o robô colocando a própria peça: respostas para cada jogada possível do humano."""
+        proximos = []
+        for i in range(9):
+            if self.game_board[i] == ' ': tab = list(self.game_board); tab[i] = self.USER_PLAYER_CHAR; proximos.append(tab)
+        self._especular(proximos)
+
+    def _resposta_robo(self):
+        chave = "".join(self.game_board)
+        if chave not in self._respostas: self._especular([self.game_board])
+        return self._respostas[chave].result() # Quase sempre já pronta
+
+    def _preparar_banco(self):
+        """Escreve a resposta já calculada em REGS_BANCO_ROBO enquanto o braço executa a jogada do humano."""
+        if REGS_BANCO_ROBO is None: return
+        chave = "".join(self.game_board); idx = self._resposta_robo()
+        if idx == -1 or self._banco_preparado == (chave, idx): return
+        (px_r, py_r) = self.grid_centers_robo[idx]; rx, ry = REGS_BANCO_ROBO
+        if self.write_cip_explicit_register(rx, px_r) and self.write_cip_explicit_register(ry, py_r):
+            self._banco_preparado = (chave, idx); print(f"Resposta do robô pré-enviada: Célula {idx+1} em R[{rx}]/R[{ry}].")
+
+    def _jogada_robo(self):
+        if not self.cena_estavel: print("Movimento sobre o tabuleiro: jogada do robô aguardando a cena parar."); return # Segue em VEZ_ROBO
+        chave = "".join(self.game_board); idx = self._resposta_robo()
+        if idx == -1: # Empate ou erro
+            self.winner = self.check_game_over(self.game_board)
+            if self.winner == 'Draw': self.game_over = True; print("--- JOGO EMPATADO ---"); self._aguardar_limpeza()
+            else: print("ERRO: Minimax não achou jogada.")
+            return
+        if self._banco_preparado == (chave, idx): print(f"ENVIO ROBÔ (pré-enviado): Célula {idx+1}")
+        else:
+            print("Enviando jogada ROBÔ..."); (px_r, py_r) = self.grid_centers_robo[idx]; rx, ry = REGS_BANCO_ROBO or (1, 2)
+            sX_r=self.write_cip_explicit_register(rx,px_r); sY_r=self.write_cip_explicit_register(ry,py_r)
+            if not (sX_r and sY_r): print(f"Falha envio coords (Robô). Reenviando em {REENVIO_SECONDS:.0f} s."); self.controlador.agendar("reenviar", REENVIO_SECONDS); return
+            print(f"ENVIO ROBÔ OK: Célula {idx+1}")
+        sF_r = self.write_cip_explicit_register(5, 1);
+        if not sF_r: print(f"Falha R[5] (Robô)! Reenviando em {REENVIO_SECONDS:.0f} s."); self.controlador.agendar("reenviar", REENVIO_SECONDS); return
+        print("R[5] LIGADO (Robô)..."); self._banco_preparado = None; self.game_board[idx] = self.ROBOT_PLAYER_CHAR; self.print_board(self.game_board)
+        self._fim_de_jogo(); self._mudar_estado(JOGADA_ROBO)
+        if not self.game_over: self._especular_proximas() # Enquanto o braço trabalha
+
+    def _limpar_proxima_peca(self, pecas):
+        current_pieces = []
+        if self.grid_min_x is not None:
+            current_pieces = [(px, py, cid) for px, py, cid in pecas if self.grid_min_x <= px <= self.grid_max_x and self.grid_min_y <= py <= self.grid_max_y]
+        print(f"Limpando... Peças restantes: {len(current_pieces)}")
+        if not current_pieces: # Fim limpeza
+            print("Limpeza concluída."); self.last_sent_coords = {}
+            if self.connected: print("Desligando R[9]..."); self.write_cip_explicit_register(9, 0)
+            self._mudar_estado(FIM); return
+        if LIMPEZA_EM_FILA: self._limpar_em_fila(current_pieces); return
+        px, py, pcid = current_pieces[0]; coord_key = f"{px:.0f}_{py:.0f}"
+        if coord_key == self.last_sent_coords.get("key"): print("Coords iguais..."); self._mudar_estado(LIMPEZA_BUSCA); return
+        print(f"Enviando peça {('Azul' if pcid==1 else 'Vermelha')} p/ limpar...");
+        sX=self.write_cip_explicit_register(1,px); sY=self.write_cip_explicit_register(2,py); sC=self.write_cip_explicit_register(8,pcid); sM=self.write_cip_explicit_register(9,1)
+        if sX and sY and sC and sM:
+            if self.write_cip_explicit_register(5,1): self.last_sent_coords = {"key": coord_key}; self._mudar_estado(LIMPEZA_PECA); return
+            print("Falha R[5]!")
+        else: print("Falha R[1/2/8/9].")
+        self._mudar_estado(LIMPEZA_BUSCA) # Tenta de novo com a próxima detecção
+
+    def _limpar_em_fila(self, pecas):
+        """Escreve a fila com todas as peças e libera o robô; a próxima conferência é no R[5]=0 do fim da fila."""
+        if self._pecas_na_fila is not None and len(pecas) >= self._pecas_na_fila:
+            self._rodadas_sem_progresso += 1
+            if self._rodadas_sem_progresso >= MAX_RODADAS_SEM_PROGRESSO:
+                print(f"{len(pecas)} peça(s) continuam no tabuleiro após {self._rodadas_sem_progresso} filas. Limpeza interrompida.")
+                if self.connected: self.write_cip_explicit_register(9, 0)
+                self._mudar_estado(FIM); return
+        else: self._rodadas_sem_progresso = 0
+        ordem = ordem_vizinho_proximo(pecas, lambda p: p[:2])
+        print(f"Enviando fila com {min(len(ordem), self.fila.capacidade)} peça(s) p/ limpar...")
+        if self.fila.reiniciar() and self.fila.acrescentar(ordem) and self.write_cip_explicit_register(9, 2):
+            if self.write_cip_explicit_register(5, 1): self._pecas_na_fila = len(pecas); self._mudar_estado(LIMPEZA_PECA); return
+            print("Falha R[5]!")
+        else: print("Falha na fila (R[20..]/R[9]).")
+        self._mudar_estado(LIMPEZA_BUSCA) # Tenta de novo com a próxima detecção
+
+    def _tecla(self, tecla):
+        if self.estado in ESTADOS_ROBO_OCUPADO or self.estado in (VEZ_ROBO, LIMPEZA_BUSCA): print("Aguarde..."); return
+        if tecla == 'g':
+            print("\n--- CARREGANDO GRADE ---")
+            if self.load_grid_and_boundaries(): self.print_board(self.game_board)
+        elif tecla == 'r':
+            print("\n--- JOGO RESETADO ---"); self._reset_state(); self.print_board(self.game_board)
+
+    # --- LOOP PRINCIPAL ---
+    def run_vision_and_send(self):
+        global ORIGINAL_WIDTH, ORIGINAL_HEIGHT
+        if GRAVAR_SESSAO and self.gravador is None:
+            arquivo = os.path.join(PASTA_GRAVACOES, time.strftime("sessao_%Y%m%d_%H%M%S.grv"))
+            self.gravador = GravadorSessao(arquivo, FPS_QUADROS_GRAVACAO); print(f"Gravando sessão em '{arquivo}'.")
+        if not self.calibracao.carregar(): return
+        if not self.load_grid_and_boundaries(): print("AVISO: Falha ao carregar grade. 'g'.")
+
+        if MODO_PROCESSOS: cap = PipelineProcessos(self.cam_index, ORIGINAL_WIDTH, ORIGINAL_HEIGHT, arquivo_lente=self.calibracao.arquivo_lente if self.calibracao.corrige_frame else None,
+                                          funcao_segmentar=partial(segmentar_blocos, faixas=self.calibracao.faixas_cor, area_minima=self.calibracao.area_minima_cor),
+                                          filtro_mudanca=FiltroMudanca(intervalo_refresco=INTERVALO_REFRESCO_DETECCAO) if FILTRO_MUDANCA else None) # Frame inteiro (o processo não vê a grade)
+        else: cap = abrir_camera(self.cam_index, ORIGINAL_WIDTH, ORIGINAL_HEIGHT)
+        if not cap.isOpened(): print(f"Erro câmera {self.cam_index}."); return
+        aw = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)); ah = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        print(f"Resolução: {aw}x{ah}")
+        if aw!=ORIGINAL_WIDTH or ah!=ORIGINAL_HEIGHT: print("AVISO: Resolução diferente!"); ORIGINAL_WIDTH=aw; ORIGINAL_HEIGHT=ah
+        self._gravar("inicio", largura=ORIGINAL_WIDTH, altura=ORIGINAL_HEIGHT, largura_janela=DISPLAY_WIDTH, altura_janela=DISPLAY_HEIGHT, banco_robo=REGS_BANCO_ROBO, fila_limpeza=LIMPEZA_EM_FILA)
+
+        if self.display is None: self.display = Display('Jogo da Velha & Limpeza Automática', DISPLAY_WIDTH, DISPLAY_HEIGHT, FPS_EXIBICAO, HEADLESS)
+        self.display.set_mouse_callback(self.handle_click)
+        print("\n--- JOGO DA VELHA & LIMPEZA ---"); print("'g': Grade | 'r': Reset | 't': Tráfego CIP | 'ESC': Sair | CLIQUE: Jogar")
+        print("Limpeza automática no FIM DE JOGO."); print("-----------------------------")
+
+        frame = None; cena_postada = self.cena_estavel; pool = pool_da_thread()
+        current_frame_read = None; frame_corrigido = None # Reutilizados a cada frame
+        self.controlador.iniciar(); self.vigia.iniciar()
+
+        while True:
+            if not self.agendador.vencido(self.estado): # Entre frames só atende teclas e cliques
+                if not self._tratar_tecla(self.display.ler_tecla(self.agendador.espera(self.estado))): break
+                continue
+            detectar = self.agendador.iniciar(self.estado)
+            ret, current_frame_read = cap.read() if MODO_PROCESSOS else cap.read(current_frame_read) # Lê sobre o buffer do frame anterior
+            if ret:
+                frame = current_frame_read
+                if self.calibracao.corrige_frame and not MODO_PROCESSOS: frame = frame_corrigido = self.calibracao.corretor_lente.corrigir_frame(frame, dst=frame_corrigido) # No modo processos a captura já corrige
+            elif frame is None: print("Erro frame."); break
+            segmentados = cap.ultimos_blocos if MODO_PROCESSOS else None
+            if self.portao is not None: # Só as mudanças do portão viram evento
+                estavel = self.portao.atualizar(frame) == ESTAVEL
+                if estavel != cena_postada: cena_postada = estavel; self.controlador.postar("cena", estavel=estavel, estado=self.portao.estado)
+            quadro = self.display.novo_quadro() if self.display.deve_renderizar() else None # None = frame não será exibido
+            entregar_deteccao = self._pedir_deteccao.is_set() and (self.portao is None or self.portao.estavel)
+            if self.gravador is not None: self.gravador.quadro_chave(frame) # Limitado a FPS_QUADROS_GRAVACAO
+
+            # --- Desenhos (só quando o Display vai renderizar) ---
+            if quadro is not None:
+                if self.grid_centers_pixel:
+                    for i, (cx, cy) in enumerate(self.grid_centers_pixel):
+                        quadro.texto(str(i+1), (cx-10, cy+10), 1.2, (255,255,255), 3)
+                        p_char = self.game_board[i];
+                        if p_char != ' ': color = (255,100,100) if p_char=='X' else (100,100,255); (tw,th),_ = cv2.getTextSize(p_char, cv2.FONT_HERSHEY_SIMPLEX, 2.5, 5); tx=cx-tw//2; ty=cy+th//2; quadro.texto(p_char, (tx,ty), 2.5, color, 5)
+                # Desenha blocos detectados (a mesma detecção alimenta o HUD e, se pedida, a limpeza)
+                all_detected_hud = self._detect_all_blocks(frame, quadro, segmentados, forcar=entregar_deteccao) if detectar or entregar_deteccao else None
+
+                # --- HUD ---
+                current_pieces_on_board_count = "?"
+                if self.grid_min_x is not None and all_detected_hud is not None:
+                    on_board_hud = [p for p in all_detected_hud if (self.grid_min_x <= p['x_robo'] <= self.grid_max_x and self.grid_min_y <= p['y_robo'] <= self.grid_max_y)]; current_pieces_on_board_count = len(on_board_hud)
+
+                if self.cleanup_mode: status_msg = f"LIMPANDO... [{current_pieces_on_board_count} detec.]"; color = (255,165,0)
+                elif self.estado == ESPERA_LIMPEZA: status_msg = f"FIM: {self.winner}. Limpeza em {self.controlador.restante('iniciar_limpeza') or 0:.0f} s..."; color = (0, 200, 200)
+                elif self.estado == FIM: status_msg = f"FIM: {self.winner}. Tabuleiro limpo. 'r' p/ novo jogo."; color = (0, 200, 200)
+                elif self.game_over: status_msg = f"FIM: {self.winner}. Aguardando R[5]=0 p/ limpar..."; color = (0, 200, 200)
+                elif not self.grid_centers_robo: status_msg = "GRADE NAO CALIBRADA. 'g'."; color = (0,0,255)
+                elif self.robot_is_busy or self.estado == VEZ_ROBO: status_msg = "AGUARDANDO ROBO..."; color = (0,165,255)
+                else: status_msg = "Sua vez. CLIQUE."; color = (0,255,0)
+                quadro.texto(status_msg, (15, 75), 1.0, color, 3)
+                if self.portao is not None:
+                    cor_cena = (0,255,0) if self.portao.estavel else (0,0,255); x, y, w, h = self.portao.roi or (0, 0, ORIGINAL_WIDTH, ORIGINAL_HEIGHT)
+                    quadro.caixa([(x, y), (x + w, y), (x + w, y + h), (x, y + h)], cor_cena, 1)
+                    quadro.texto(f"Cena: {self.portao.estado}", (15, 110), 0.8, cor_cena, 2)
+                if self.filtro is not None: quadro.texto(f"Deteccao reaproveitada: {100 * self.filtro.fracao_reaproveitada:.0f}%", (15, 140), 0.6, (200,200,200), 1)
+                quadro.texto(f"Ritmo: {self.agendador.fps_medido:.0f} fps" + ("" if detectar else " (deteccao pausada)"), (15, 165), 0.6, (200,200,200), 1)
+                status_conn = "CONECTADO" if self.connected else "DESCONECTADO"; color_conn = (0,255,255) if self.connected else (0,0,255); quadro.texto(f"Status: {status_conn}", (15, 40), 1.0, color_conn, 2)
+
+                # --- Exibe (quando vence o ritmo do Display, reduz para DISPLAY_WIDTH x DISPLAY_HEIGHT aqui; desenho e imshow na thread do Display) ---
+                self.display.publicar(frame, quadro)
+            else: all_detected_hud = None
+
+            # --- Limpeza: entrega ao controlador a detecção que ele pediu (com a cena parada: sem mão/braço na imagem) ---
+            if entregar_deteccao:
+                self._pedir_deteccao.clear()
+                pecas = all_detected_hud if all_detected_hud is not None else self._detect_all_blocks(frame, segmentados=segmentados, forcar=True)
+                self.controlador.postar("deteccao", pecas=[[float(p['x_robo']), float(p['y_robo']), p['cor_id']] for p in pecas])
+                if self.modelo_cor is not None and self.grid_min_x is not None: # Peças na grade são peças de jogo: confirmam a cor
+                    for p in pecas:
+                        if self.grid_min_x <= p['x_robo'] <= self.grid_max_x and self.grid_min_y <= p['y_robo'] <= self.grid_max_y:
+                            self.modelo_cor.aprender(frame, p['rect'], p['cor_id'])
+
+            # --- Teclas ---
+            pool.fim_do_quadro() # Alocações do pipeline neste frame (comum/buffers.py, DEBUG_ALOCACOES)
+            if not self._tratar_tecla(self.display.ler_tecla()): break
+
+        self.vigia.parar(); self.controlador.parar(); self._especulador.shutdown(wait=False, cancel_futures=True)
+        cap.release(); self.display.fechar()
+        if self.gravador is not None: self._gravar("fim"); self.gravador.fechar(); self.gravador = None
+
+# --- PONTO DE ENTRADA ---
+if __name__ == "__main__":
+    ip_robot = "192.168.1.100"; camera_index = 1
+    game = FanucTicTacToeAndClean(ip_robot, camera_index)
+    if not game.calibracao.carregar(): sys.exit(1)
+    if not game.connect(): print("Rodando só visão até o robô responder.")
+    try: game.run_vision_and_send()
+    finally: game.disconnect()
\ No newline at end of file
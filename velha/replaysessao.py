@@ -0,0 +1,111 @@
+"""
+Replay determinístico de uma sessão gravada pelo gameplaysupremo.py (GRAVAR_SESSAO = True).
+
+Entrega ao controlador da célula, na ordem gravada, os mesmos eventos da
+partida (cliques, teclas, robo_livre, detecções, cena e timers) com a grade
+gravada no lugar do robô e da câmera, conferindo cada escrita de
+registrador e cada tabuleiro com o que foi gravado. Não há threads nem
+espera: os timers são os eventos gravados. Para na primeira divergência e
+mostra o evento.
+
+Uso (na pasta de calibração, como o gameplaysupremo.py):
+    python replaysessao.py gravacoes/sessao_AAAAMMDD_HHMMSS.grv
+    python replaysessao.py gravacoes/sessao_AAAAMMDD_HHMMSS.grv quadros   (exporta os quadros-chave JPEG)
+"""
+import os
+import sys
+
+import cv2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # Raiz do repositório (pacote 'comum')
+from comum.gravacao import LeitorSessao
+import gameplaysupremo
+
+
+# Eventos de entrada do controlador (o resto é saída, conferida)
+EVENTOS_CONTROLADOR = ("clique", "tecla", "robo_livre", "deteccao", "cena", "iniciar_limpeza", "reenviar", "resposta_pronta")
+
+
+class Divergencia(Exception):
+    pass
+
+
+class JogoReplay(gameplaysupremo.FanucTicTacToeAndClean):
+    """O jogo de verdade, com robô e câmera trocados pelos eventos gravados."""
+
+    def __init__(self, eventos):
+        super().__init__("replay")
+        self.eventos = eventos; self.i = 0
+        self._conectado = True; self.tabuleiros_conferidos = 0
+
+    @property
+    def connected(self): return self._conectado
+
+    def _consumir(self, tipo):
+        if self.i >= len(self.eventos): raise Divergencia(f"a lógica produziu '{tipo}' depois do fim da gravação")
+        ev = self.eventos[self.i]
+        if ev["tipo"] != tipo: raise Divergencia(f"a lógica produziu '{tipo}', mas o evento gravado #{self.i} é {ev}")
+        self.i += 1; return ev
+
+    def write_cip_explicit_register(self, register_index, value, forcar=False):
+        ev = self._consumir("escrita"); valor = int(round(float(value)))
+        if ev["reg"] != register_index or ev["valor"] != valor:
+            raise Divergencia(f"escrita R[{register_index}]={valor}, gravado R[{ev['reg']}]={ev['valor']} (evento #{self.i - 1})")
+        return ev["ok"]
+
+    def load_grid_and_boundaries(self):
+        ev = self._consumir("grade")
+        if ev["pixel"] is None: self._reset_state(); return False
+        self._definir_grade(ev["pixel"], ev["robo"]); return True
+
+    def print_board(self, board):
+        ev = self._consumir("tabuleiro")
+        if ev["tabuleiro"] != "".join(board) or ev["fim"] != self.game_over or ev["vencedor"] != self.winner:
+            raise Divergencia(f"tabuleiro '{''.join(board)}' (fim={self.game_over}, {self.winner}), gravado {ev}")
+        self.tabuleiros_conferidos += 1
+        super().print_board(board)
+
+
+def reproduzir(arquivo):
+    eventos = [ev for _, ev in LeitorSessao(arquivo).eventos()]
+    jogo = JogoReplay(eventos)
+    print(f"Replay de '{arquivo}': {len(eventos)} eventos.")
+    try:
+        while jogo.i < len(eventos):
+            ev = eventos[jogo.i]; tipo = ev["tipo"]
+            if tipo == "inicio":
+                jogo.i += 1
+                gameplaysupremo.ORIGINAL_WIDTH = ev["largura"]; gameplaysupremo.ORIGINAL_HEIGHT = ev["altura"]
+                gameplaysupremo.DISPLAY_WIDTH = ev["largura_janela"]; gameplaysupremo.DISPLAY_HEIGHT = ev["altura_janela"]
+                gameplaysupremo.REGS_BANCO_ROBO = tuple(ev["banco_robo"]) if ev.get("banco_robo") else None
+                gameplaysupremo.LIMPEZA_EM_FILA = ev.get("fila_limpeza", False)
+            elif tipo == "fim":
+                jogo.i += 1
+            elif tipo == "grade":
+                jogo.load_grid_and_boundaries()
+            elif tipo in EVENTOS_CONTROLADOR:
+                jogo.i += 1; jogo._conectado = ev["conectado"]
+                jogo._tratar_evento({k: v for k, v in ev.items() if k != "conectado"})
+            else: # Escritas e tabuleiros só podem ser produzidos pelo controlador
+                raise Divergencia(f"evento gravado #{jogo.i} {ev} não foi produzido pela lógica")
+    except Divergencia as e:
+        print(f"\nDIVERGÊNCIA: {e}"); return False
+    print(f"\nReplay OK: {len(eventos)} eventos, {jogo.tabuleiros_conferidos} tabuleiros conferidos.")
+    print(f"Final: tabuleiro '{''.join(jogo.game_board)}', fim={jogo.game_over}, vencedor={jogo.winner}")
+    return True
+
+
+def exportar_quadros(arquivo):
+    pasta = os.path.splitext(arquivo)[0] + "_quadros"; os.makedirs(pasta, exist_ok=True)
+    n = 0; t0 = None
+    for t, imagem in LeitorSessao(arquivo).quadros():
+        if t0 is None: t0 = t
+        cv2.imwrite(os.path.join(pasta, f"quadro_{t - t0:08.2f}s.jpg"), imagem); n += 1
+    print(f"{n} quadros-chave exportados para '{pasta}'.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2: print(__doc__); sys.exit(1)
+    ok = reproduzir(sys.argv[1])
+    if len(sys.argv) > 2 and sys.argv[2] == "quadros": exportar_quadros(sys.argv[1])
+    sys.exit(0 if ok else 1)